@@ -0,0 +1,231 @@
+"""
+Analysis Jobs
+-------------
+Background job subsystem that runs match analyses outside the request thread.
+
+Clients submit a (file, player) analysis and get a job id back immediately.
+Jobs run on a fixed number of worker threads, and admission control limits the
+work the server takes on at once:
+
+- at most ``max_workers`` analyses run concurrently,
+- at most ``max_queued`` jobs wait for a worker (further submissions are rejected),
+- the estimated memory of running jobs plus the results kept for finished jobs
+  stays within ``memory_budget`` bytes (the oldest kept results are dropped to
+  make room, jobs wait in the queue until enough memory is released, and a job
+  that could never fit is rejected outright).
+
+Finished jobs and their results are kept for ``result_ttl`` seconds, and at
+most ``max_finished`` of them, for clients polling the job status.
+
+Submitting a (file, player, options) request that is already queued or running
+returns the existing job instead of starting a duplicate.
+"""
+
+from collections import deque, OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import os
+import threading
+import time
+import uuid
+
+from match_cache import file_identity
+from match_storage import data_size
+
+# Memory reserved per job on top of the match file size (figure rendering, result dicts)
+JOB_OVERHEAD_BYTES = 64 * 1024 * 1024
+
+# Assumed bytes per dict entry, list item or scalar of a kept result, on top of its strings
+_RESULT_ITEM_BYTES = 64
+
+
+class AdmissionError(Exception):
+    """Raised when a job is rejected by admission control."""
+
+
+def estimate_job_memory(file_path: str) -> int:
+    """Rough upper bound of the memory one analysis of file_path needs."""
+    return data_size(file_path) + JOB_OVERHEAD_BYTES
+
+
+def estimate_result_size(value: Any) -> int:
+    """Rough memory footprint of a result made of dicts, lists, strings and scalars (base64 figures dominate)."""
+    if isinstance(value, (str, bytes)):
+        return len(value) + _RESULT_ITEM_BYTES
+    if isinstance(value, dict):
+        return sum(estimate_result_size(key) + estimate_result_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_result_size(item) for item in value) + _RESULT_ITEM_BYTES
+    return getattr(value, 'nbytes', _RESULT_ITEM_BYTES)
+
+
+class AnalysisJob:
+    """One queued, running or finished analysis."""
+
+    def __init__(self, key: Tuple, file_path: str, player_name: Optional[str], options: Dict[str, Any], cost: int):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.file_path = file_path
+        self.player_name = player_name
+        self.options = options
+        self.cost = cost
+        self.status = 'queued'
+        self.result = None
+        self.result_bytes = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': os.path.basename(self.file_path),
+            'player_name': self.player_name,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.error is not None:
+            data['error'] = self.error
+        if include_result and self.status == 'done':
+            data['result'] = self.result
+        return data
+
+
+class JobManager:
+    """Bounded worker pool with a job queue, memory budget and duplicate collapsing."""
+
+    def __init__(self, run: Callable[..., Dict[str, Any]], max_workers: int = 2,
+                 max_queued: int = 16, memory_budget: int = 1024 * 1024 * 1024,
+                 estimate_cost: Callable[[str], int] = estimate_job_memory, max_finished: int = 256,
+                 result_ttl: float = 600):
+        self._run = run
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.memory_budget = memory_budget
+        self._estimate_cost = estimate_cost
+        self.max_finished = max_finished
+        self.result_ttl = result_ttl
+
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._jobs = OrderedDict()  # job id -> job, oldest first
+        self._in_flight = {}  # (file identity, player, options) -> queued or running job
+        self._running = 0
+        self._reserved = 0
+        self._retained = 0  # estimated bytes of the results kept for finished jobs
+        self.rejected = 0
+        self.collapsed = 0
+
+        for i in range(max_workers):
+            threading.Thread(target=self._worker, name=f"analysis-worker-{i}", daemon=True).start()
+
+    def submit(self, file_path: str, player_name: Optional[str] = None, **options) -> AnalysisJob:
+        """Queue an analysis, or return the identical job that is already in flight.
+
+        Keyword options are passed on to the run callable and are part of the job's identity.
+        """
+        key = (file_identity(file_path), player_name, tuple(sorted(options.items())))
+        cost = self._estimate_cost(file_path)
+
+        with self._cond:
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                self.collapsed += 1
+                return existing
+
+            if cost > self.memory_budget:
+                self.rejected += 1
+                raise AdmissionError("Match is too large for the analysis memory budget")
+            if len(self._pending) >= self.max_queued:
+                self.rejected += 1
+                raise AdmissionError("Too many analyses queued, try again later")
+
+            job = AnalysisJob(key, file_path, player_name, options, cost)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            self._pending.append(job)
+            self._trim_finished()
+            self._cond.notify_all()
+            return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with self._cond:
+            self._trim_finished()
+            return self._jobs.get(job_id)
+
+    def _can_start(self, job: AnalysisJob) -> bool:
+        # Kept results give way to the job first; a job always starts when nothing else
+        # runs, so one large match can't stall the queue
+        self._trim_finished(needed=job.cost)
+        return self._running == 0 or self._reserved + self._retained + job.cost <= self.memory_budget
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not (self._pending and self._can_start(self._pending[0])):
+                    # Wake up now and then to expire kept results even when no job comes or goes
+                    self._cond.wait(self.result_ttl)
+                    self._trim_finished()
+                job = self._pending.popleft()
+                self._running += 1
+                self._reserved += job.cost
+                job.status = 'running'
+                job.started_at = time.time()
+
+            try:
+                result = self._run(job.file_path, job.player_name, **job.options)
+                if 'error' in result:
+                    job.status, job.error = 'failed', result['error']
+                else:
+                    job.status, job.result = 'done', result
+                    job.result_bytes = estimate_result_size(result)
+            except Exception as e:
+                job.status, job.error = 'failed', f"{type(e).__name__}: {e}"
+
+            with self._cond:
+                job.finished_at = time.time()
+                self._running -= 1
+                self._reserved -= job.cost
+                self._retained += job.result_bytes
+                self._in_flight.pop(job.key, None)
+                job._done.set()
+                self._trim_finished()
+                self._cond.notify_all()
+
+    def _trim_finished(self, needed: int = 0):
+        # Forget finished jobs, oldest first, that are past result_ttl, beyond max_finished,
+        # or whose results keep the budget from holding the running jobs plus `needed` bytes
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done]
+        for i, job in enumerate(finished):
+            if (len(finished) - i <= self.max_finished and now - job.finished_at <= self.result_ttl
+                    and self._reserved + self._retained + needed <= self.memory_budget):
+                break
+            del self._jobs[job.id]
+            self._retained -= job.result_bytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                'queued': len(self._pending),
+                'running': self._running,
+                'reserved_bytes': self._reserved,
+                'retained_bytes': self._retained,
+                'finished': sum(job.done for job in self._jobs.values()),
+                'memory_budget': self.memory_budget,
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'rejected': self.rejected,
+                'collapsed': self.collapsed
+            }
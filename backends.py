@@ -0,0 +1,1114 @@
+"""
+Execution Backends
+------------------
+Every statistics and filter operation of FootballMatchAnalyzer runs on one of
+three interchangeable backends, each owning one representation of a match's
+events:
+
+- ``python``: a list of projected event dicts, processed with plain loops.
+  It is the reference implementation the other backends are checked against.
+- ``numpy``: the columnar EventTable (see event_table.py), processed with
+  vectorized masks and bincount reductions; memory-maps the columnar copy
+  when one exists.
+- ``spark``: a persisted Spark DataFrame read with the declared StatsBomb
+  schema, whose statistics all come from one grouped aggregation job; only
+  available when pyspark is installed.
+
+Loaded events carry their backend (``backend.owns(events)``), so every later
+operation on a match runs where the match was loaded. Which backend loads a
+file is decided by a CostModel: predicted seconds to load and analyse a file
+of a given size, with coefficients fitted on this host by a calibration run
+instead of a fixed size threshold. Callers can override the choice per call
+or per analyzer (``backend='numpy'``).
+
+Usage:
+    python backends.py calibrate uploads/*.json [--scales 1,4,16] [--output backend_calibration.json]
+    python backends.py parity uploads/*.json     # check every backend gives identical results
+    python backends.py show                      # print the cost model and its crossover sizes
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from event_table import EventTable, iter_events, location_counts
+from match_storage import data_size, match_compression, open_match
+from timeline import MinuteTimeline
+
+BACKEND_NAMES = ('python', 'numpy', 'spark')
+AUTO = 'auto'
+
+DEFAULT_CALIBRATION_PATH = 'backend_calibration.json'
+
+# Cost model entry of the numpy backend when an up-to-date columnar copy exists
+COLUMNS_ENTRY = 'numpy+columns'
+
+# Seconds per analysis as fixed_s + per_mb_s * file size in MB, used until a
+# calibration file is written. Only the ratios matter: they keep the earlier
+# behaviour of switching to Spark at about 10MB, and Python never wins.
+DEFAULT_COEFFICIENTS = {
+    'python': {'fixed_s': 0.01, 'per_mb_s': 0.6},
+    'numpy': {'fixed_s': 0.0, 'per_mb_s': 0.2},
+    COLUMNS_ENTRY: {'fixed_s': 0.0, 'per_mb_s': 0.01},
+    'spark': {'fixed_s': 1.5, 'per_mb_s': 0.05}
+}
+
+TeamCounts = Dict[str, Dict[str, Any]]
+PlayerCounts = Dict[str, Dict[str, Any]]
+
+
+def _name(value: Optional[Dict[str, Any]], key: str) -> Optional[str]:
+    return ((value or {}).get(key) or {}).get('name')
+
+
+def _location(event: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    location = event.get('location')
+    if isinstance(location, (list, tuple)) and len(location) >= 2:
+        return location[0], location[1]
+    return None
+
+
+class EventList(list):
+    """Projected event dicts of one match, compared and hashed by identity so it can key per-match memos."""
+
+    __eq__ = object.__eq__
+    __ne__ = object.__ne__
+    __hash__ = object.__hash__
+
+
+class Backend:
+    """
+    Statistics and filter operations on the events of one match.
+
+    Every backend returns the same plain values for the same match, so the
+    analyzer assembles identical results whichever backend loaded it.
+    """
+
+    name = None  # type: str
+
+    def available(self) -> bool:
+        return True
+
+    def supports(self, file_path: str) -> bool:
+        """Whether this backend can read file_path in its storage format."""
+        return True
+
+    def owns(self, events: Any) -> bool:
+        """Whether events is in this backend's representation."""
+        raise NotImplementedError
+
+    def load(self, file_path: str) -> Any:
+        raise NotImplementedError
+
+    def event_count(self, events: Any, exact: bool = False) -> Optional[int]:
+        """Number of events, or None when counting is expensive and exact is False."""
+        return len(events)
+
+    def teams_and_formations(self, events: Any) -> Tuple[List[str], Dict[str, str]]:
+        """Teams owning events in order of first appearance, and their Starting XI formations."""
+        raise NotImplementedError
+
+    def team_counts(self, events: Any) -> Tuple[int, TeamCounts]:
+        """Event total and per-team possession, pass, shot, goal and xG totals."""
+        raise NotImplementedError
+
+    def player_counts(self, events: Any, team_name: str) -> Tuple[List[Dict[str, Any]], PlayerCounts]:
+        """Starting XI lineup of the team and per-player pass, shot, goal and xG totals."""
+        raise NotImplementedError
+
+    def player_locations(self, events: Any, player_name: str, team_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """float32 x/y arrays of a player's located events."""
+        raise NotImplementedError
+
+    def team_shots(self, events: Any, team_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """x, y, xG and goal-flag arrays of a team's located shots."""
+        raise NotImplementedError
+
+    def player_location_counts(self, events: Any, bins: Tuple[int, int],
+                               extent: Tuple[float, float]) -> Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray]:
+        """(team, player) pairs with located events, their event counts and grid cell counts."""
+        raise NotImplementedError
+
+    def minute_timeline(self, events: Any) -> MinuteTimeline:
+        """Per-minute possession, pass, shot and xG totals of every team."""
+        raise NotImplementedError
+
+    def release(self, events: Any):
+        """Free resources held by loaded events outside the Python heap."""
+
+    def close(self):
+        """Stop anything the backend started."""
+
+
+class PythonBackend(Backend):
+    """Plain loops over projected event dicts."""
+
+    name = 'python'
+
+    def owns(self, events: Any) -> bool:
+        return isinstance(events, list)
+
+    def load(self, file_path: str) -> EventList:
+        with open_match(file_path) as f:
+            return EventList(iter_events(f))
+
+    def teams_and_formations(self, events: List[Dict[str, Any]]) -> Tuple[List[str], Dict[str, str]]:
+        teams = {}
+        formations = {}
+        for event in events:
+            team_name = _name(event, 'team')
+            if team_name is None:
+                continue
+            teams.setdefault(team_name, None)
+            # The last Starting XI of a team wins
+            tactics = event.get('tactics')
+            if _name(event, 'type') == 'Starting XI' and tactics and tactics.get('formation') is not None:
+                formations[team_name] = str(tactics['formation'])
+        return list(teams), formations
+
+    def team_counts(self, events: List[Dict[str, Any]]) -> Tuple[int, TeamCounts]:
+        team_counts = {}
+        def counts_for(team_name):
+            return team_counts.setdefault(team_name, {
+                "possession": 0, "passes": 0, "completed": 0, "shots": 0, "goals": 0, "xg": 0.0
+            })
+
+        for event in events:
+            possession_team = _name(event, 'possession_team')
+            if possession_team is not None:
+                counts_for(possession_team)["possession"] += 1
+
+            team_name = _name(event, 'team')
+            event_type = _name(event, 'type')
+            if team_name is None or event_type not in ('Pass', 'Shot'):
+                continue
+            counts = counts_for(team_name)
+            if event_type == 'Pass':
+                counts["passes"] += 1
+                # A pass without an outcome is a completed pass
+                if (event.get('pass') or {}).get('outcome') is None:
+                    counts["completed"] += 1
+            else:
+                shot = event.get('shot') or {}
+                counts["shots"] += 1
+                counts["goals"] += _name(shot, 'outcome') == 'Goal'
+                counts["xg"] += shot.get('statsbomb_xg') or 0.0
+        return len(events), team_counts
+
+    def player_counts(self, events: List[Dict[str, Any]], team_name: str) -> Tuple[List[Dict[str, Any]], PlayerCounts]:
+        lineup = {}
+        player_counts = {}
+        for event in events:
+            if _name(event, 'team') != team_name:
+                continue
+            event_type = _name(event, 'type')
+            if event_type == 'Starting XI' and event.get('tactics'):
+                for player in event['tactics'].get('lineup') or []:
+                    player_name = (player.get('player') or {}).get('name', '')
+                    if player_name:
+                        lineup[player_name] = {
+                            'player_name': player_name,
+                            'position': (player.get('position') or {}).get('name', ''),
+                            'jersey': player.get('jersey_number', 0)
+                        }
+                continue
+
+            player_name = _name(event, 'player')
+            if player_name is None or event_type not in ('Pass', 'Shot'):
+                continue
+            counts = player_counts.setdefault(player_name, {
+                'passes': 0, 'successful_passes': 0, 'shots': 0, 'goals': 0, 'xg': 0.0
+            })
+            if event_type == 'Pass':
+                counts['passes'] += 1
+                if (event.get('pass') or {}).get('outcome') is None:
+                    counts['successful_passes'] += 1
+            else:
+                shot = event.get('shot') or {}
+                counts['shots'] += 1
+                counts['goals'] += _name(shot, 'outcome') == 'Goal'
+                counts['xg'] += shot.get('statsbomb_xg') or 0.0
+        return list(lineup.values()), player_counts
+
+    def player_locations(self, events: List[Dict[str, Any]], player_name: str,
+                         team_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        xs, ys = [], []
+        if player_name is not None and team_name is not None:
+            for event in events:
+                location = _location(event)
+                if location and _name(event, 'player') == player_name and _name(event, 'team') == team_name:
+                    xs.append(location[0])
+                    ys.append(location[1])
+        return np.array(xs, dtype=np.float32), np.array(ys, dtype=np.float32)
+
+    def team_shots(self, events: List[Dict[str, Any]],
+                   team_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        xs, ys, xgs, goals = [], [], [], []
+        for event in events:
+            location = _location(event)
+            if location and _name(event, 'type') == 'Shot' and team_name is not None \
+                    and _name(event, 'team') == team_name:
+                shot = event.get('shot') or {}
+                xs.append(location[0])
+                ys.append(location[1])
+                xgs.append(shot.get('statsbomb_xg') or 0.0)
+                goals.append(_name(shot, 'outcome') == 'Goal')
+        return (np.array(xs, dtype=np.float32), np.array(ys, dtype=np.float32),
+                np.array(xgs, dtype=np.float64), np.array(goals, dtype=bool))
+
+    def player_location_counts(self, events: List[Dict[str, Any]], bins: Tuple[int, int],
+                               extent: Tuple[float, float]) -> Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray]:
+        # Teams and players are numbered in first-seen order as in EventTable, so pairs
+        # come out in the same (team, player) order as the numpy backend's
+        team_codes, player_codes = {}, {}
+        keys, xs, ys = [], [], []
+        for event in events:
+            team_name = _name(event, 'team')
+            player_name = _name(event, 'player')
+            for name, codes in ((team_name, team_codes), (player_name, player_codes),
+                                (_name(event, 'possession_team'), team_codes)):
+                if name is not None:
+                    codes.setdefault(name, len(codes))
+            location = _location(event)
+            if location and team_name is not None and player_name is not None:
+                keys.append((team_codes[team_name], player_codes[player_name]))
+                xs.append(location[0])
+                ys.append(location[1])
+
+        team_names, player_names = list(team_codes), list(player_codes)
+        pair_codes = np.array([team * len(player_names) + player for team, player in keys], dtype=np.int64)
+        unique_pairs, groups = np.unique(pair_codes, return_inverse=True)
+        pairs = [(team_names[code // len(player_names)], player_names[code % len(player_names)])
+                 for code in unique_pairs.tolist()]
+        events_per_pair = np.bincount(groups, minlength=len(pairs))
+        return pairs, events_per_pair, location_counts(groups, len(pairs), np.array(xs, dtype=np.float32),
+                                                       np.array(ys, dtype=np.float32), bins, extent)
+
+
+    def minute_timeline(self, events: List[Dict[str, Any]]) -> MinuteTimeline:
+        team_codes = {}
+        def team_code(name):
+            return team_codes.setdefault(name, len(team_codes)) if name is not None else -1
+
+        columns = {name: [] for name in ('period', 'minute', 'team', 'possession_team',
+                                         'passes', 'completed', 'shots', 'xg')}
+        for event in events:
+            event_type = _name(event, 'type')
+            is_pass, is_shot = event_type == 'Pass', event_type == 'Shot'
+            period, minute = event.get('period'), event.get('minute')
+            columns['period'].append(period if period is not None else -1)
+            columns['minute'].append(minute if minute is not None else -1)
+            columns['team'].append(team_code(_name(event, 'team')))
+            columns['possession_team'].append(team_code(_name(event, 'possession_team')))
+            columns['passes'].append(is_pass)
+            columns['completed'].append(is_pass and (event.get('pass') or {}).get('outcome') is None)
+            columns['shots'].append(is_shot)
+            columns['xg'].append(((event.get('shot') or {}).get('statsbomb_xg') or 0.0) if is_shot else 0.0)
+        return MinuteTimeline.from_columns(list(team_codes), **{name: np.array(values)
+                                                                 for name, values in columns.items()})
+
+
+class NumpyBackend(Backend):
+    """Vectorized reductions over the columnar EventTable."""
+
+    name = 'numpy'
+
+    def owns(self, events: Any) -> bool:
+        return isinstance(events, EventTable)
+
+    def load(self, file_path: str) -> EventTable:
+        # Reuse the columnar copy written at upload time, skipping JSON decoding
+        table = EventTable.load_columns(file_path)
+        if table is not None:
+            return table
+        # Stream the file event by event into the columnar table
+        return EventTable.from_file(file_path)
+
+    def teams_and_formations(self, table: EventTable) -> Tuple[List[str], Dict[str, str]]:
+        # Formations were collected from the Starting XI events while building the table
+        return table.event_teams(), table.formations
+
+    def team_counts(self, table: EventTable) -> Tuple[int, TeamCounts]:
+        # Possession is the count of events by possession team
+        possession = table.team_totals(np.ones(len(table), dtype=bool), column='possession_team')
+
+        # Passes and completed passes per team
+        pass_mask = table.type_mask('Pass')
+        passes = table.team_totals(pass_mask)
+        completed = table.team_totals(pass_mask & ~table.pass_failed)
+
+        # Shots, goals and xG per team
+        shot_mask = table.type_mask('Shot')
+        shots = table.team_totals(shot_mask)
+        goals = table.team_totals(shot_mask & table.shot_goal)
+        xg = table.team_totals(shot_mask, weights=table.xg)
+
+        team_counts = {}
+        for code, team_name in enumerate(table.team_names):
+            team_counts[team_name] = {
+                "possession": int(possession[code]),
+                "passes": int(passes[code]),
+                "completed": int(completed[code]),
+                "shots": int(shots[code]),
+                "goals": int(goals[code]),
+                "xg": float(xg[code])
+            }
+        return len(table), team_counts
+
+    def player_counts(self, table: EventTable, team_name: str) -> Tuple[List[Dict[str, Any]], PlayerCounts]:
+        # Only events of this team are credited to its players
+        team_mask = table.team_mask(team_name)
+        pass_mask = team_mask & table.type_mask('Pass')
+        shot_mask = team_mask & table.type_mask('Shot')
+
+        passes = table.player_totals(pass_mask)
+        successful_passes = table.player_totals(pass_mask & ~table.pass_failed)
+        shots = table.player_totals(shot_mask)
+        goals = table.player_totals(shot_mask & table.shot_goal)
+        xg = table.player_totals(shot_mask, weights=table.xg)
+
+        # Players come from the team's Starting XI lineup
+        lineup = table.lineups.get(team_name, [])
+        player_counts = {}
+        for player in lineup:
+            code = table.player_code_of(player['player_name'])
+            if code >= 0:
+                player_counts[player['player_name']] = {
+                    'passes': int(passes[code]),
+                    'successful_passes': int(successful_passes[code]),
+                    'shots': int(shots[code]),
+                    'goals': int(goals[code]),
+                    'xg': float(xg[code])
+                }
+        return lineup, player_counts
+
+    def player_locations(self, table: EventTable, player_name: str, team_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        player_mask = table.player_mask(player_name) & table.team_mask(team_name) & table.has_location
+        return table.x[player_mask], table.y[player_mask]
+
+    def team_shots(self, table: EventTable, team_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        shot_mask = table.type_mask('Shot') & table.team_mask(team_name) & table.has_location
+        return table.x[shot_mask], table.y[shot_mask], table.xg[shot_mask], table.shot_goal[shot_mask]
+
+    def player_location_counts(self, table: EventTable, bins: Tuple[int, int],
+                               extent: Tuple[float, float]) -> Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray]:
+        return table.player_location_counts(bins, extent)
+
+    def minute_timeline(self, table: EventTable) -> MinuteTimeline:
+        pass_mask = table.type_mask('Pass')
+        shot_mask = table.type_mask('Shot')
+        return MinuteTimeline.from_columns(
+            table.team_names, table.period, table.minute, table.team, table.possession_team,
+            passes=pass_mask, completed=pass_mask & ~table.pass_failed, shots=shot_mask,
+            xg=np.where(shot_mask, table.xg, 0.0))
+
+
+class SparkBackend(Backend):
+    """Spark queries over a persisted DataFrame; the session starts on first use."""
+
+    name = 'spark'
+
+    def __init__(self):
+        self._spark = None
+        self._spark_lock = threading.Lock()
+        # Whether Hadoop's native zstd codec is loaded, checked once the session runs
+        self._zstd_codec = None
+        # Statistics totals of each loaded DataFrame (see _aggregates)
+        self._aggregates_memo = weakref.WeakKeyDictionary()
+        self._aggregates_lock = threading.Lock()
+
+    def available(self) -> bool:
+        return importlib.util.find_spec('pyspark') is not None
+
+    def supports(self, file_path: str) -> bool:
+        # Spark decompresses .json.gz itself, but .json.zst only with Hadoop's native zstd codec
+        return match_compression(file_path) != 'zstd' or self.zstd_codec()
+
+    def zstd_codec(self) -> bool:
+        """Whether Hadoop's native zstd codec is loaded in the Spark session (starts the session)."""
+        if self._zstd_codec is None:
+            try:
+                loader = self.spark._jvm.org.apache.hadoop.util.NativeCodeLoader
+                self._zstd_codec = bool(loader.isNativeCodeLoaded() and loader.buildSupportsZstd())
+            except Exception:
+                self._zstd_codec = False
+        return self._zstd_codec
+
+    @property
+    def spark(self):
+        """Spark session, started the first time a match is loaded with Spark."""
+        if self._spark is None:
+            with self._spark_lock:
+                if self._spark is None:
+                    from pyspark.sql import SparkSession
+                    spark = SparkSession.builder \
+                        .appName("FootballAnalysis") \
+                        .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
+                        .getOrCreate()
+                    # Set log level to reduce verbosity
+                    spark.sparkContext.setLogLevel("ERROR")
+                    self._spark = spark
+        return self._spark
+
+    def owns(self, events: Any) -> bool:
+        # A DataFrame can only exist once the session has been started
+        if self._spark is None or isinstance(events, (EventTable, list)):
+            return False
+        from pyspark.sql import DataFrame
+        return isinstance(events, DataFrame)
+
+    def load(self, file_path: str):
+        """
+        Read a match with Spark using the explicit schema and return the persisted DataFrame.
+
+        Spark decompresses .json.gz itself; .json.zst needs Hadoop's native zstd codec.
+        """
+        if not self.supports(file_path):
+            raise ValueError("Spark can't read .json.zst files without Hadoop's native zstd codec")
+        df = self.spark.read \
+            .schema(self._get_statsbomb_schema()) \
+            .option("multiLine", True) \
+            .json(file_path)
+
+        # Keep the parsed events around for the stages that follow
+        from pyspark import StorageLevel
+        return df.persist(StorageLevel.MEMORY_AND_DISK)
+
+    def event_count(self, events_df, exact: bool = False) -> Optional[int]:
+        # Counting a DataFrame runs a job
+        return events_df.count() if exact else None
+
+    def release(self, events_df):
+        events_df.unpersist()
+
+    def close(self):
+        if self._spark is not None:
+            self._spark.stop()
+            self._spark = None
+
+    def _get_statsbomb_schema(self):
+        """Create the schema for StatsBomb event data."""
+        from pyspark.sql.types import StructType, StructField, StringType, IntegerType, DoubleType, BooleanType, ArrayType
+
+        def id_name():
+            return StructType([
+                StructField("id", IntegerType(), True),
+                StructField("name", StringType(), True)
+            ])
+
+        def location():
+            return ArrayType(DoubleType())
+
+        lineup_player = StructType([
+            StructField("player", id_name(), True),
+            StructField("position", id_name(), True),
+            StructField("jersey_number", IntegerType(), True)
+        ])
+
+        freeze_frame_player = StructType([
+            StructField("location", location(), True),
+            StructField("player", id_name(), True),
+            StructField("position", id_name(), True),
+            StructField("teammate", BooleanType(), True)
+        ])
+
+        return StructType([
+            StructField("id", StringType(), True),
+            StructField("index", IntegerType(), True),
+            StructField("period", IntegerType(), True),
+            StructField("timestamp", StringType(), True),
+            StructField("minute", IntegerType(), True),
+            StructField("second", IntegerType(), True),
+            StructField("type", id_name(), True),
+            StructField("possession", IntegerType(), True),
+            StructField("possession_team", id_name(), True),
+            StructField("play_pattern", id_name(), True),
+            StructField("team", id_name(), True),
+            StructField("player", id_name(), True),
+            StructField("position", id_name(), True),
+            StructField("location", location(), True),
+            StructField("duration", DoubleType(), True),
+            StructField("under_pressure", BooleanType(), True),
+            StructField("off_camera", BooleanType(), True),
+            StructField("out", BooleanType(), True),
+            StructField("counterpress", BooleanType(), True),
+            StructField("related_events", ArrayType(StringType()), True),
+            StructField("tactics", StructType([
+                StructField("formation", IntegerType(), True),
+                StructField("lineup", ArrayType(lineup_player), True)
+            ]), True),
+            StructField("pass", StructType([
+                StructField("recipient", id_name(), True),
+                StructField("length", DoubleType(), True),
+                StructField("angle", DoubleType(), True),
+                StructField("height", id_name(), True),
+                StructField("end_location", location(), True),
+                StructField("body_part", id_name(), True),
+                StructField("type", id_name(), True),
+                StructField("outcome", id_name(), True),
+                StructField("technique", id_name(), True),
+                StructField("assisted_shot_id", StringType(), True),
+                StructField("shot_assist", BooleanType(), True),
+                StructField("goal_assist", BooleanType(), True),
+                StructField("cross", BooleanType(), True),
+                StructField("switch", BooleanType(), True),
+                StructField("through_ball", BooleanType(), True)
+            ]), True),
+            StructField("shot", StructType([
+                StructField("statsbomb_xg", DoubleType(), True),
+                StructField("end_location", location(), True),
+                StructField("key_pass_id", StringType(), True),
+                StructField("body_part", id_name(), True),
+                StructField("type", id_name(), True),
+                StructField("outcome", id_name(), True),
+                StructField("technique", id_name(), True),
+                StructField("first_time", BooleanType(), True),
+                StructField("freeze_frame", ArrayType(freeze_frame_player), True)
+            ]), True),
+            StructField("carry", StructType([
+                StructField("end_location", location(), True)
+            ]), True),
+            StructField("dribble", StructType([
+                StructField("outcome", id_name(), True)
+            ]), True),
+            StructField("duel", StructType([
+                StructField("type", id_name(), True),
+                StructField("outcome", id_name(), True)
+            ]), True),
+            StructField("goalkeeper", StructType([
+                StructField("type", id_name(), True),
+                StructField("outcome", id_name(), True),
+                StructField("position", id_name(), True),
+                StructField("technique", id_name(), True),
+                StructField("body_part", id_name(), True)
+            ]), True)
+        ])
+
+    def teams_and_formations(self, events_df) -> Tuple[List[str], Dict[str, str]]:
+        aggregates = self._aggregates(events_df)
+        return aggregates["teams"], aggregates["formations"]
+
+    def team_counts(self, events_df) -> Tuple[int, TeamCounts]:
+        aggregates = self._aggregates(events_df)
+        return aggregates["total_events"], aggregates["team_counts"]
+
+    def player_counts(self, events_df, team_name: str) -> Tuple[List[Dict[str, Any]], PlayerCounts]:
+        aggregates = self._aggregates(events_df)
+        return aggregates["lineups"].get(team_name, []), aggregates["player_counts"].get(team_name, {})
+
+    def _aggregates(self, events_df) -> Dict[str, Any]:
+        """
+        Every total the match statistics need, from one grouped aggregation job.
+
+        Events are grouped by (possession team, team, player, event type) with
+        the DataFrame API, so team names never end up in SQL text. The few
+        hundred resulting rows hold the event counts, completed passes, goals,
+        xG, first event index and Starting XI tactics of each group; teams,
+        formations, lineups and team and player totals are all summed from
+        them on the driver. The result is kept while the DataFrame is alive.
+        """
+        with self._aggregates_lock:
+            cached = self._aggregates_memo.get(events_df)
+        if cached is not None:
+            return cached
+
+        from pyspark.sql import functions as F
+        event_type = F.col("type.name")
+        is_pass = event_type == "Pass"
+        is_shot = event_type == "Shot"
+        rows = events_df.groupBy(
+            F.col("possession_team.name").alias("possession_team"),
+            F.col("team.name").alias("team"),
+            F.col("player.name").alias("player"),
+            event_type.alias("type")
+        ).agg(
+            F.count(F.lit(1)).alias("events"),
+            F.min("index").alias("first_index"),
+            # A pass without an outcome is a completed pass
+            F.sum(F.when(is_pass & F.col("pass.outcome").isNull(), 1).otherwise(0)).alias("completed"),
+            F.sum(F.when(is_shot & (F.col("shot.outcome.name") == "Goal"), 1).otherwise(0)).alias("goals"),
+            F.sum(F.when(is_shot, F.coalesce(F.col("shot.statsbomb_xg"), F.lit(0.0))).otherwise(0.0)).alias("xg"),
+            # collect_list skips the nulls of every other event type
+            F.collect_list(F.when(event_type == "Starting XI", F.struct("index", "tactics"))).alias("starting_xi")
+        ).collect()
+
+        aggregates = self._totals_from_groups(rows)
+        with self._aggregates_lock:
+            self._aggregates_memo[events_df] = aggregates
+        return aggregates
+
+    @staticmethod
+    def _totals_from_groups(rows: Iterable[Any]) -> Dict[str, Any]:
+        """Sum the grouped rows of _aggregates into match, team and player totals."""
+        total_events = 0
+        first_index = {}
+        starting_xi = {}
+        team_counts = {}
+        player_counts = {}
+        def counts_for(team_name):
+            return team_counts.setdefault(team_name, {
+                "possession": 0, "passes": 0, "completed": 0, "shots": 0, "goals": 0, "xg": 0.0
+            })
+
+        for row in rows:
+            total_events += row["events"]
+            if row["possession_team"] is not None:
+                counts_for(row["possession_team"])["possession"] += row["events"]
+
+            team_name = row["team"]
+            if team_name is None:
+                continue
+            index = row["first_index"] if row["first_index"] is not None else float('inf')
+            first_index[team_name] = min(first_index.get(team_name, index), index)
+            starting_xi.setdefault(team_name, []).extend(row["starting_xi"])
+
+            if row["type"] not in ("Pass", "Shot"):
+                continue
+            counts = counts_for(team_name)
+            player = None
+            if row["player"] is not None:
+                player = player_counts.setdefault(team_name, {}).setdefault(row["player"], {
+                    'passes': 0, 'successful_passes': 0, 'shots': 0, 'goals': 0, 'xg': 0.0
+                })
+            if row["type"] == "Pass":
+                counts["passes"] += row["events"]
+                counts["completed"] += row["completed"]
+                if player is not None:
+                    player['passes'] += row["events"]
+                    player['successful_passes'] += row["completed"]
+            else:
+                counts["shots"] += row["events"]
+                counts["goals"] += row["goals"]
+                counts["xg"] += float(row["xg"])
+                if player is not None:
+                    player['shots'] += row["events"]
+                    player['goals'] += row["goals"]
+                    player['xg'] += float(row["xg"])
+
+        # Starting XI events are applied in match order: the last formation wins
+        # and later lineups add to or update earlier ones, as in the other backends
+        formations = {}
+        lineups = {}
+        for team_name, entries in starting_xi.items():
+            lineup = {}
+            for entry in sorted(entries, key=lambda entry: entry["index"] if entry["index"] is not None else -1):
+                tactics = entry["tactics"]
+                if tactics is None:
+                    continue
+                if tactics["formation"] is not None:
+                    formations[team_name] = str(tactics["formation"])
+                for player in tactics["lineup"] or []:
+                    player_name = player["player"]["name"] if player["player"] is not None else None
+                    if player_name:
+                        lineup[player_name] = {
+                            'player_name': player_name,
+                            'position': (player["position"]["name"] if player["position"] is not None else None) or '',
+                            'jersey': player["jersey_number"] if player["jersey_number"] is not None else 0
+                        }
+            lineups[team_name] = list(lineup.values())
+
+        return {
+            "total_events": total_events,
+            "teams": sorted(first_index, key=first_index.get),
+            "formations": formations,
+            "lineups": lineups,
+            "team_counts": team_counts,
+            "player_counts": player_counts
+        }
+
+    def player_locations(self, events_df, player_name: str, team_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        from pyspark.sql import functions as F
+        # Only the two coordinate columns of the filtered rows reach the driver
+        rows = events_df.filter(
+            (F.col("player.name") == player_name) &
+            (F.col("team.name") == team_name) &
+            (F.size("location") >= 2)
+        ).select(F.col("location")[0].alias("x"), F.col("location")[1].alias("y")).collect()
+        return (np.array([row["x"] for row in rows], dtype=np.float32),
+                np.array([row["y"] for row in rows], dtype=np.float32))
+
+    def team_shots(self, events_df, team_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        from pyspark.sql import functions as F
+        rows = events_df.filter(
+            (F.col("type.name") == "Shot") &
+            (F.col("team.name") == team_name) &
+            (F.size("location") >= 2)
+        ).select(
+            F.col("location")[0].alias("x"),
+            F.col("location")[1].alias("y"),
+            F.coalesce(F.col("shot.statsbomb_xg"), F.lit(0.0)).alias("xg"),
+            (F.coalesce(F.col("shot.outcome.name"), F.lit("")) == "Goal").alias("goal")
+        ).collect()
+        return (np.array([row["x"] for row in rows], dtype=np.float32),
+                np.array([row["y"] for row in rows], dtype=np.float32),
+                np.array([row["xg"] for row in rows], dtype=np.float64),
+                np.array([row["goal"] for row in rows], dtype=bool))
+
+    def player_location_counts(self, events_df, bins: Tuple[int, int],
+                               extent: Tuple[float, float]) -> Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray]:
+        from pyspark.sql import functions as F
+        # One job bins the located events by player and grid cell; only the cell counts reach the driver
+        located = events_df.filter(
+            F.col("player.name").isNotNull() &
+            F.col("team.name").isNotNull() &
+            (F.size("location") >= 2)
+        )
+        rows = located.groupBy(
+            F.col("team.name").alias("team"), F.col("player.name").alias("player"),
+            self._grid_cell(F.col("location")[0], bins[0], extent[0]).alias("cell_x"),
+            self._grid_cell(F.col("location")[1], bins[1], extent[1]).alias("cell_y")
+        ).count().collect()
+
+        codes = {}
+        for row in rows:
+            codes.setdefault((row["team"], row["player"]), len(codes))
+        pairs = list(codes)
+        events_per_pair = np.zeros(len(pairs), dtype=np.int64)
+        counts = np.zeros((len(pairs), bins[0], bins[1]), dtype=np.int64)
+        for row in rows:
+            group = codes[(row["team"], row["player"])]
+            events_per_pair[group] += row["count"]
+            # Locations outside the pitch count as events but fall in no cell
+            if row["cell_x"] is not None and row["cell_y"] is not None:
+                counts[group, row["cell_x"], row["cell_y"]] += row["count"]
+        return pairs, events_per_pair, counts
+
+    @staticmethod
+    def _grid_cell(value, n_bins: int, length: float):
+        """
+        Spark expression of the grid cell of a coordinate, as in event_table.location_counts.
+
+        The cell is the number of inner np.linspace edges at or below the
+        (float32-rounded) value, so values on an edge land exactly where
+        np.searchsorted puts them; values outside [0, length] have no cell.
+        """
+        from pyspark.sql import functions as F
+        value = value.cast("float").cast("double")
+        edges = np.linspace(0, length, n_bins + 1).tolist()
+        cell = F.lit(0)
+        for edge in edges[1:-1]:
+            cell = cell + F.when(value >= F.lit(edge), 1).otherwise(0)
+        return F.when((value >= F.lit(edges[0])) & (value <= F.lit(edges[-1])), cell)
+
+    def minute_timeline(self, events_df) -> MinuteTimeline:
+        from pyspark.sql import functions as F
+        # One job: events grouped by clock minute and teams; only the group totals reach the driver
+        is_pass = F.col("type.name") == "Pass"
+        is_shot = F.col("type.name") == "Shot"
+        rows = events_df.groupBy(
+            "period", "minute",
+            F.col("team.name").alias("team"),
+            F.col("possession_team.name").alias("possession_team")
+        ).agg(
+            F.count(F.lit(1)).alias("events"),
+            F.sum(F.when(is_pass, 1).otherwise(0)).alias("passes"),
+            F.sum(F.when(is_pass & F.col("pass.outcome").isNull(), 1).otherwise(0)).alias("completed"),
+            F.sum(F.when(is_shot, 1).otherwise(0)).alias("shots"),
+            F.sum(F.when(is_shot, F.coalesce(F.col("shot.statsbomb_xg"), F.lit(0.0))).otherwise(0.0)).alias("xg")
+        ).collect()
+
+        team_codes = {}
+        def team_code(name):
+            return team_codes.setdefault(name, len(team_codes)) if name is not None else -1
+
+        def column(name, missing=0):
+            return np.array([row[name] if row[name] is not None else missing for row in rows])
+
+        team = np.array([team_code(row["team"]) for row in rows], dtype=np.int64)
+        possession_team = np.array([team_code(row["possession_team"]) for row in rows], dtype=np.int64)
+        return MinuteTimeline.from_columns(
+            list(team_codes), column("period", -1), column("minute", -1), team, possession_team,
+            column("passes"), column("completed"), column("shots"), column("xg", 0.0), events=column("events")
+        )
+
+
+def create_backends() -> Dict[str, Backend]:
+    """One instance of every backend, by name."""
+    return {backend.name: backend for backend in (PythonBackend(), NumpyBackend(), SparkBackend())}
+
+
+class CostModel:
+    """
+    Predicted seconds to load and analyse a match file with each backend.
+
+    Each backend's cost is ``fixed_s + per_mb_s * size`` with the file size in
+    MB; the numpy backend has a second entry (``numpy+columns``) for files
+    whose columnar copy is up to date. ``choose`` picks the cheapest available
+    backend that can read the file's storage format; backends without
+    coefficients (e.g. not calibrated on this host) are never chosen
+    automatically.
+    """
+
+    def __init__(self, coefficients: Optional[Dict[str, Dict[str, float]]] = None,
+                 meta: Optional[Dict[str, Any]] = None):
+        self.coefficients = dict(coefficients if coefficients is not None else DEFAULT_COEFFICIENTS)
+        self.meta = meta or {'source': 'defaults'}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CALIBRATION_PATH) -> 'CostModel':
+        """Cost model saved by a calibration run, or the defaults when there is none."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(data['coefficients'], dict(data.get('meta', {}), source=os.path.abspath(path)))
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring backend calibration {path}: {e}")
+            return cls()
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'meta': self.meta, 'coefficients': self.coefficients}, f, indent=2)
+
+    def predict(self, backend_name: str, file_bytes: int, columnar: bool = False) -> float:
+        entry = backend_name
+        if backend_name == 'numpy' and columnar and COLUMNS_ENTRY in self.coefficients:
+            entry = COLUMNS_ENTRY
+        return self._cost(entry, file_bytes)
+
+    def _cost(self, entry: str, file_bytes: int) -> float:
+        coefficients = self.coefficients[entry]
+        return coefficients['fixed_s'] + coefficients['per_mb_s'] * file_bytes / 1e6
+
+    def choose(self, file_path: str, backends: Iterable[Backend]) -> Backend:
+        """The available backend that reads file_path and is predicted to load and analyse it fastest."""
+        file_bytes = data_size(file_path)  # JSON size, also for compressed files
+        columnar = EventTable.has_columns(file_path)
+        candidates = [backend for backend in backends if backend.available() and backend.name in self.coefficients]
+        candidates.sort(key=lambda backend: self.predict(backend.name, file_bytes, columnar))
+        # Checked cheapest first, so a format check that is expensive (Spark's) only runs when it matters
+        for backend in candidates:
+            if backend.supports(file_path):
+                return backend
+        return candidates[0]
+
+    def crossover_bytes(self, small: str, large: str) -> Optional[int]:
+        """File size above which entry large becomes cheaper than entry small, or None if it never does."""
+        a, b = self.coefficients[small], self.coefficients[large]
+        if a['fixed_s'] >= b['fixed_s'] or a['per_mb_s'] <= b['per_mb_s']:
+            return None
+        return round((b['fixed_s'] - a['fixed_s']) / (a['per_mb_s'] - b['per_mb_s']) * 1e6)
+
+    def switch_points(self, columnar: bool = False) -> List[Dict[str, Any]]:
+        """File sizes at which the cheapest backend changes, starting with the one for an empty file."""
+        entries = [COLUMNS_ENTRY if name == 'numpy' and columnar and COLUMNS_ENTRY in self.coefficients else name
+                   for name in BACKEND_NAMES if name in self.coefficients]
+        if not entries:
+            return []
+        def cheapest(file_bytes):
+            return min(entries, key=lambda entry: self._cost(entry, file_bytes))
+
+        sizes = sorted({self.crossover_bytes(a, b) for a in entries for b in entries if a != b} - {None})
+        points = [{'from_bytes': 0, 'backend': cheapest(0)}]
+        for size in sizes:
+            entry = cheapest(size + 1)
+            if entry != points[-1]['backend']:
+                points.append({'from_bytes': size + 1, 'backend': entry})
+        return points
+
+    def describe(self) -> Dict[str, Any]:
+        """Coefficients and the backend chosen by file size, for JSON files and files with a columnar copy."""
+        return {
+            'meta': self.meta,
+            'coefficients': self.coefficients,
+            'choice': {'json': self.switch_points(), 'columnar': self.switch_points(columnar=True)}
+        }
+
+
+def fit_linear(sizes_mb: List[float], seconds: List[float]) -> Dict[str, float]:
+    """Least-squares fixed and per-MB cost through the measured points, clamped to be non-negative."""
+    if len(set(sizes_mb)) < 2:
+        return {'fixed_s': 0.0, 'per_mb_s': max(seconds) / max(max(sizes_mb), 1e-9)}
+    design = np.column_stack([np.ones(len(sizes_mb)), sizes_mb])
+    (fixed, per_mb), *_ = np.linalg.lstsq(design, np.array(seconds), rcond=None)
+    if per_mb < 0:
+        fixed, per_mb = float(np.mean(seconds)), 0.0
+    elif fixed < 0:
+        # Refit through the origin rather than predict negative costs for small files
+        fixed, per_mb = 0.0, float(np.dot(sizes_mb, seconds) / np.dot(sizes_mb, sizes_mb))
+    return {'fixed_s': round(float(fixed), 6), 'per_mb_s': round(float(per_mb), 6)}
+
+
+def write_tiled(sample_path: str, copies: int, output_path: str):
+    """Write the events of sample_path (plain or compressed) repeated copies times, renumbered, as a larger JSON match file."""
+    with open_match(sample_path) as f:
+        events = json.load(f)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for copy in range(copies):
+            for i, event in enumerate(events):
+                if copy or i:
+                    f.write(',\n')
+                json.dump(dict(event, index=copy * len(events) + i + 1), f)
+        f.write(']')
+
+
+def calibrate(sample_files: List[str], backends: Dict[str, Backend], analyze: Callable[[Any], Any],
+              scales: Tuple[int, ...] = (1, 4, 16), runs: int = 3,
+              log: Callable[[str], None] = print) -> CostModel:
+    """
+    Fit the cost model on this host.
+
+    Each sample match is tiled to every scale, then loaded and analysed
+    (``analyze(events)``) by every available backend; the median time of each
+    run is fitted against the file size. The numpy backend is measured both
+    from JSON and from the columnar copy.
+    """
+    points = {}  # cost model entry -> ([sizes MB], [seconds])
+    work_dir = tempfile.mkdtemp(prefix='backend_calibration_')
+
+    def measure(entry: str, backend: Backend, path: str, size_mb: float):
+        timings = []
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            events = backend.load(path)
+            analyze(events)
+            timings.append(time.perf_counter() - start)
+            backend.release(events)
+        # The first run warms up imports and, for Spark, the session
+        seconds = statistics.median(timings[1:])
+        sizes, times = points.setdefault(entry, ([], []))
+        sizes.append(size_mb)
+        times.append(seconds)
+        log(f"{entry:>14} {size_mb:8.1f}MB {seconds * 1000:10.1f}ms")
+
+    try:
+        for sample_index, sample_path in enumerate(sample_files):
+            for copies in scales:
+                path = os.path.join(work_dir, f'match_{sample_index}_x{copies}.json')
+                write_tiled(sample_path, copies, path)
+                size_mb = os.path.getsize(path) / 1e6
+                for name, backend in backends.items():
+                    if backend.available():
+                        measure(name, backend, path, size_mb)
+                if 'numpy' in backends:
+                    EventTable.from_file(path).save_columns(path)
+                    measure(COLUMNS_ENTRY, backends['numpy'], path, size_mb)
+                for name in os.listdir(work_dir):
+                    os.remove(os.path.join(work_dir, name))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    coefficients = {entry: fit_linear(sizes, times) for entry, (sizes, times) in points.items()}
+    meta = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'samples': [os.path.basename(path) for path in sample_files],
+        'scales': list(scales),
+        'runs': runs
+    }
+    return CostModel(coefficients, meta)
+
+
+def compare_results(expected: Any, actual: Any, path: str = '') -> List[str]:
+    """Differences between two results made of dicts, lists, scalars and NumPy arrays."""
+    if isinstance(expected, np.ndarray) or isinstance(actual, np.ndarray):
+        if not np.array_equal(np.asarray(expected), np.asarray(actual)):
+            return [f'{path}: arrays differ']
+        return []
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        differences = []
+        for key in sorted(set(expected) | set(actual), key=str):
+            if key not in expected or key not in actual:
+                differences.append(f'{path}/{key}: only in {"expected" if key in expected else "actual"}')
+            else:
+                differences += compare_results(expected[key], actual[key], f'{path}/{key}')
+        return differences
+    if isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple)):
+        if len(expected) != len(actual):
+            return [f'{path}: {len(expected)} items != {len(actual)}']
+        differences = []
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            differences += compare_results(a, b, f'{path}[{i}]')
+        return differences
+    if expected != actual:
+        return [f'{path}: {expected!r} != {actual!r}']
+    return []
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from football_analysis import FootballMatchAnalyzer
+
+    parser = argparse.ArgumentParser(description="Calibrate and check the analysis backends")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = subparsers.add_parser("calibrate", help="Fit the backend cost model on this host")
+    calibrate_parser.add_argument("files", nargs="+", help="Sample match files, tiled to each scale")
+    calibrate_parser.add_argument("--scales", default="1,4,16", help="Copies of each sample to time (default: 1,4,16)")
+    calibrate_parser.add_argument("--runs", type=int, default=3, help="Timed runs per size and backend (default: 3)")
+    calibrate_parser.add_argument("--backends", default=",".join(BACKEND_NAMES),
+                                  help="Backends to calibrate (default: all available)")
+    calibrate_parser.add_argument("--output", default=DEFAULT_CALIBRATION_PATH,
+                                  help=f"Calibration file to write (default: {DEFAULT_CALIBRATION_PATH})")
+
+    parity_parser = subparsers.add_parser("parity", help="Check every backend gives identical results")
+    parity_parser.add_argument("files", nargs="+", help="Match files to analyse with every backend")
+
+    show_parser = subparsers.add_parser("show", help="Print the cost model and its crossover sizes")
+    show_parser.add_argument("path", nargs="?", default=DEFAULT_CALIBRATION_PATH, help="Calibration file")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print(json.dumps(CostModel.load(args.path).describe(), indent=2))
+        sys.exit(0)
+
+    analyzer = FootballMatchAnalyzer()
+    try:
+        if args.command == "calibrate":
+            names = [name.strip() for name in args.backends.split(",") if name.strip()]
+            unknown = set(names) - set(BACKEND_NAMES)
+            if unknown:
+                parser.error(f"unknown backends {', '.join(sorted(unknown))}")
+
+            def analyze(events):
+                # The backend-dependent work of an analysis: statistics, shots and heatmap grids
+                result = analyzer.analyze_match_stats(events)
+                for side in ("home", "away"):
+                    analyzer.shot_data(events, result["match_details"][f"{side}_team"])
+                analyzer.player_grids(events)
+
+            model = calibrate(args.files, {name: analyzer.backends[name] for name in names}, analyze,
+                              scales=tuple(int(scale) for scale in args.scales.split(",")), runs=args.runs)
+            model.save(args.output)
+            print(json.dumps(model.describe()['choice'], indent=2))
+            print(f"Wrote {args.output}")
+        else:
+            failed = False
+            for file_path in args.files:
+                try:
+                    results = {name: analyzer.parity_result(file_path, name)
+                               for name, backend in analyzer.backends.items() if backend.available()}
+                except Exception as e:
+                    print(f"{file_path}: failed to analyse: {e}")
+                    failed = True
+                    continue
+                # Every backend is checked against the plain Python reference
+                expected_name = 'python'
+                for name, result in results.items():
+                    if name == expected_name:
+                        continue
+                    differences = compare_results(results[expected_name], result)
+                    status = "ok" if not differences else f"{len(differences)} differences"
+                    print(f"{file_path}: {name} vs {expected_name}: {status}")
+                    for difference in differences[:20]:
+                        print(f"    {difference}")
+                    failed = failed or bool(differences)
+            sys.exit(1 if failed else 0)
+    finally:
+        analyzer.close()
@@ -0,0 +1,117 @@
+"""
+Batch Match Analysis
+--------------------
+Analyzes a whole directory (or glob) of StatsBomb match files in parallel.
+
+Files are fanned out over a process pool, each worker keeping its own
+FootballMatchAnalyzer. Results are streamed to an NDJSON file, one line per
+match, in the order the matches finish. A file that fails to load or analyze is
+recorded as an error line and does not stop the run.
+
+This module backs the ``--batch`` option of ``football_analysis.py``.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, TextIO
+import glob
+import json
+import os
+import sys
+import time
+
+from match_storage import is_match_file
+
+# Analyzer owned by each worker process, created by _init_worker
+_worker_analyzer = None
+
+
+def find_match_files(target: str) -> List[str]:
+    """Expand a directory or glob pattern into a sorted list of match files."""
+    if os.path.isdir(target):
+        # Plain and compressed (.json.gz, .json.zst) matches
+        paths = [os.path.join(target, name) for name in os.listdir(target) if is_match_file(name)]
+    else:
+        paths = glob.glob(target)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def _init_worker(backend: str):
+    """Create the analyzer once per worker process."""
+    global _worker_analyzer
+    from football_analysis import FootballMatchAnalyzer
+    _worker_analyzer = FootballMatchAnalyzer(backend=backend)
+
+
+def _analyze_file(file_path: str, player_name: Optional[str], include_figures: bool) -> Dict[str, Any]:
+    """Analyze one file in a worker and return an NDJSON record."""
+    start = time.perf_counter()
+    try:
+        # Figures are only rendered when they are kept in the output
+        outputs = ('stats', 'figures') if include_figures else ('stats',)
+        result = _worker_analyzer.analyze_match(file_path, player_name, outputs=outputs)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    record = {"file": file_path, "seconds": round(time.perf_counter() - start, 3)}
+
+    if "error" in result:
+        record["error"] = result["error"]
+        return record
+
+    record["result"] = result
+    return record
+
+
+def run_batch(files: List[str], output: TextIO, workers: Optional[int] = None,
+              player_name: Optional[str] = None, include_figures: bool = False,
+              backend: str = 'auto', log: TextIO = sys.stderr) -> Dict[str, Any]:
+    """
+    Analyze files on a process pool, writing one NDJSON line per finished match.
+
+    Args:
+        files: Match files to analyze
+        output: Text stream receiving the NDJSON records
+        workers: Pool size (defaults to the number of CPUs)
+        player_name: Optional player to build a heatmap for in every match
+        include_figures: Keep the base64 figures in the records
+        backend: Backend every worker loads matches with ('auto' lets the cost model choose per file)
+        log: Stream for progress messages
+
+    Returns:
+        Summary with match counts, elapsed time and throughput
+    """
+    workers = workers or os.cpu_count() or 1
+    succeeded = failed = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend,)) as pool:
+        futures = {pool.submit(_analyze_file, path, player_name, include_figures): path for path in files}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                # A worker that died (e.g. out of memory) only fails its own file
+                record = {"file": futures[future], "error": f"{type(e).__name__}: {e}"}
+
+            if "error" in record:
+                failed += 1
+            else:
+                succeeded += 1
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+
+            done = succeeded + failed
+            status = "error" if "error" in record else "ok"
+            print(f"[{done}/{len(files)}] {status} {record['file']}", file=log)
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "matches": len(files),
+        "succeeded": succeeded,
+        "failed": failed,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "matches_per_second": round(len(files) / elapsed, 3) if elapsed > 0 else 0.0
+    }
+    print(f"Analyzed {len(files)} matches ({failed} failed) in {summary['seconds']}s "
+          f"with {workers} workers: {summary['matches_per_second']} matches/s", file=log)
+    return summary
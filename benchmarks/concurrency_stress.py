@@ -0,0 +1,106 @@
+"""
+Concurrency Stress Test
+-----------------------
+Runs many analyses at once on one shared FootballMatchAnalyzer, as the server
+does under a multi-threaded WSGI server, and checks that every result is
+identical to the result of the same analysis run alone. Requests alternate
+between matches and between home and away players, so any state leaking from
+one analysis into another shows up as a mismatch.
+
+It then measures throughput at increasing thread counts, separately for
+loading matches (file I/O) and for complete analyses, and checks that a shared
+MatchCache loads each match only once when many requests miss at the same time.
+
+Usage:
+    python benchmarks/concurrency_stress.py uploads/a.json uploads/b.json [--threads 1,2,4,8] [--requests 32]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from football_analysis import FootballMatchAnalyzer
+from match_cache import MatchCache
+
+
+def canonical(result) -> str:
+    """Serialize a result so two analyses can be compared exactly."""
+    return json.dumps(result, sort_keys=True, default=str)
+
+
+def build_requests(analyzer, files, count):
+    """Alternate matches and home/away players; returns the requests and their serial results."""
+    variants = []
+    for path in files:
+        result = analyzer.analyze_match(path)
+        if 'error' in result:
+            raise SystemExit(f"{path}: {result['error']}")
+        variants.append((path, None))
+        for side in ('home', 'away'):
+            players = result[f'{side}_player_stats']
+            if players:
+                variants.append((path, players[0]['player_name']))
+
+    expected = {request: canonical(analyzer.analyze_match(*request)) for request in variants}
+    requests = [variants[i % len(variants)] for i in range(count)]
+    return requests, expected
+
+
+def run_parallel(func, requests, threads):
+    """Run func over requests on a thread pool; returns the results and requests per second."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda request: func(*request), requests))
+    elapsed = time.perf_counter() - start
+    return results, len(requests) / elapsed if elapsed > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check thread safety and scaling of the analyzer')
+    parser.add_argument('files', nargs='+', help='Match files to analyze')
+    parser.add_argument('--threads', default='1,2,4,8', help='Comma-separated thread counts')
+    parser.add_argument('--requests', type=int, default=32, help='Requests per thread count')
+    args = parser.parse_args()
+    thread_counts = [int(n) for n in args.threads.split(',')]
+
+    # No caches, so every request really loads, analyzes and renders concurrently
+    analyzer = FootballMatchAnalyzer()
+    requests, expected = build_requests(analyzer, args.files, args.requests)
+
+    mismatches = 0
+    print(f"{'threads':>7}  {'load req/s':>10}  {'speedup':>7}  {'analyze req/s':>13}  {'speedup':>7}  mismatches")
+    base_load = base_analyze = None
+    for threads in thread_counts:
+        _, load_rate = run_parallel(lambda path, player: analyzer.load_data(path), requests, threads)
+        results, analyze_rate = run_parallel(analyzer.analyze_match, requests, threads)
+        bad = sum(canonical(result) != expected[request] for request, result in zip(requests, results))
+        mismatches += bad
+
+        base_load = base_load or load_rate
+        base_analyze = base_analyze or analyze_rate
+        print(f"{threads:>7}  {load_rate:>10.1f}  {load_rate / base_load:>6.2f}x  "
+              f"{analyze_rate:>13.1f}  {analyze_rate / base_analyze:>6.2f}x  {bad}")
+
+    # Many simultaneous misses on the same matches should load each match once
+    cache = MatchCache()
+    cached = FootballMatchAnalyzer(match_cache=cache)
+    run_parallel(lambda path, player: cached._load_events(path), requests, max(thread_counts))
+    loads = cache.stats()['misses']
+    print(f"Shared match cache: {loads} loads for {len(set(args.files))} matches")
+
+    analyzer.close()
+    cached.close()
+    if mismatches or loads != len(set(args.files)):
+        print(f"FAILED: {mismatches} mismatched results")
+        sys.exit(1)
+    print("OK: all concurrent results match the serial results")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Render Benchmark
+----------------
+Times the match overview, shot map and player heatmap renders of rendering.py
+against the previous rendering approach, reproduced here as the "legacy"
+functions: every figure rebuilds the pitch from individual line and patch
+artists, shots are scattered one call at a time and the PNG is saved with
+``bbox_inches='tight'``.
+
+Both variants render the same data extracted from a real match file.
+
+With ``--workers N`` it also times rendering all four figures of the match
+serially and on a RenderExecutor with N worker processes, and checks that both
+produce identical PNG bytes. The pooled time should approach that of the
+slowest single figure when N >= 4 cores are available.
+
+Usage:
+    python benchmarks/render_benchmark.py uploads/19802.json [--runs 10] [--workers 4] [--json results.json]
+"""
+
+from io import BytesIO
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import rendering
+from football_analysis import FootballMatchAnalyzer, AnalysisContext
+from render_executor import RenderExecutor
+
+
+def legacy_pitch(ax, style):
+    """Pitch drawn artist by artist, as every figure used to do."""
+    from matplotlib.patches import Circle
+    color = style['line_color']
+    ax.set_facecolor(style['pitch_color'])
+    ax.plot([0, 0, 120, 120, 0], [0, 80, 80, 0, 0], color=color)
+    ax.plot([60, 60], [0, 80], color=color)
+    ax.add_patch(Circle((60, 40), 9.15, color=color, fill=False))
+    ax.add_patch(Circle((60, 40), 0.5, color=color))
+    for goal_line, direction in ((0, 1), (120, -1)):
+        for depth, top, bottom in ((16.5, 24, 56), (5.5, 36, 44)):
+            edge = goal_line + direction * depth
+            ax.plot([edge, edge], [top, bottom], color=color)
+            ax.plot([goal_line, edge], [top, top], color=color)
+            ax.plot([goal_line, edge], [bottom, bottom], color=color)
+        ax.add_patch(Circle((goal_line + direction * 11, 40), 0.5, color=color))
+    ax.set_xlim(-5, 125)
+    ax.set_ylim(-5, 85)
+    ax.axis('off')
+
+
+def legacy_png(fig, **kwargs):
+    with BytesIO() as buffer:
+        fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight', **kwargs)
+        return buffer.getvalue()
+
+
+def legacy_overview(details, stats, style):
+    from matplotlib.figure import Figure
+    from matplotlib.lines import Line2D
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.text(0.5, 0.85, f"{details['home_team']} {stats['goals']['home']} - {stats['goals']['away']} "
+            f"{details['away_team']}", fontsize=18, weight='bold', ha='center', transform=ax.transAxes)
+    ax.text(0.5, 0.75, f"Formations: {details['home_formation']} vs {details['away_formation']}",
+            fontsize=14, ha='center', transform=ax.transAxes)
+    rows = [(key, stats[key]['home'], stats[key]['away']) for key in ('possession', 'shots', 'xg', 'passes')]
+    rows.append(('completion', stats['passes']['home_completion'], stats['passes']['away_completion']))
+    for i, (label, home_val, away_val) in enumerate(rows):
+        y_pos = 0.65 - i * 0.1
+        ax.text(0.5, y_pos, label, fontsize=12, ha='center', transform=ax.transAxes)
+        ax.text(0.3, y_pos - 0.05, str(home_val), fontsize=12, ha='center', transform=ax.transAxes,
+                color=style['home_color'])
+        ax.text(0.7, y_pos - 0.05, str(away_val), fontsize=12, ha='center', transform=ax.transAxes,
+                color=style['away_color'])
+    ax.legend(handles=[
+        Line2D([0], [0], marker='o', color='w', markerfacecolor=style['home_color'], markersize=10,
+               label=details['home_team']),
+        Line2D([0], [0], marker='o', color='w', markerfacecolor=style['away_color'], markersize=10,
+               label=details['away_team'])
+    ], loc='lower center')
+    ax.axis('off')
+    return legacy_png(fig)
+
+
+def legacy_shot_map(team_name, x, y, xg, goal, style):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 7), facecolor=style['pitch_color'])
+    ax = fig.add_subplot(1, 1, 1)
+    legacy_pitch(ax, style)
+    ax.set_title(f"{team_name} - Shot Map", color=style['text_color'], fontsize=16, fontweight='bold')
+    for sx, sy, sxg, is_goal in zip(x.tolist(), y.tolist(), xg.tolist(), goal.tolist()):
+        color = style['shot_goal_color'] if is_goal else style['shot_miss_color']
+        ax.scatter(sx, sy, s=120 + sxg * 1000, alpha=0.8, color=color, edgecolors='white', linewidths=1.5)
+        if sxg > 0.1:
+            ax.text(sx, sy, f"{sxg:.2f}", ha='center', va='center', color='white', fontsize=9, fontweight='bold')
+    fig.text(0.5, 0.02, f"Total Shots: {len(x)}", ha="center", color=style['text_color'], fontsize=12)
+    return legacy_png(fig, facecolor=style['pitch_color'], edgecolor='none')
+
+
+def legacy_heatmap(player_name, team_name, x, y, is_home, style):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 7), facecolor=style['pitch_color'])
+    ax = fig.add_subplot(1, 1, 1)
+    legacy_pitch(ax, style)
+    ax.set_title(f"{player_name} - Position Heatmap", color=style['text_color'], fontsize=16, fontweight='bold')
+    grid = rendering.heatmap_grid(x, y)
+    x_pos, y_pos = np.meshgrid(np.linspace(0, 120, grid.shape[0]), np.linspace(0, 80, grid.shape[1]))
+    contour = ax.contourf(x_pos, y_pos, grid.T, cmap=style['heatmap_home_cmap'], alpha=0.75, levels=20)
+    cbar = fig.colorbar(contour, ax=ax)
+    for label in cbar.ax.get_yticklabels():
+        label.set_color(style['text_color'])
+    ax.scatter(x, y, c=style['home_color'], s=30, alpha=0.5, edgecolors='white')
+    fig.text(0.5, 0.02, f"Events: {len(x)} | Team: {team_name}", ha="center", color=style['text_color'], fontsize=12)
+    return legacy_png(fig, facecolor=style['pitch_color'], edgecolor='none')
+
+
+def time_call(func, runs):
+    func()  # warm-up: imports, font cache and the pitch raster
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def time_figure_set(jobs, executor, runs):
+    """Median time to render every job on the executor, and the PNGs of the last run."""
+    def render_all():
+        futures = [executor.submit(func, *args) for func, args in jobs]
+        return [future.result() for future in futures]
+    pngs = render_all()  # warm-up: starts the worker processes
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        pngs = render_all()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), pngs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark figure rendering against the legacy approach')
+    parser.add_argument('file_path', help='Match file providing the rendered data')
+    parser.add_argument('--runs', type=int, default=10, help='Timed renders per figure')
+    parser.add_argument('--workers', type=int, help='Also time all figures on this many render processes')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    analyzer = FootballMatchAnalyzer()
+    events = analyzer.load_data(args.file_path)
+    if events is None:
+        raise SystemExit(f"Failed to load {args.file_path}")
+    result = analyzer.analyze_match_stats(events)
+    details, stats = result['match_details'], result['match_stats']
+    home_team = details['home_team']
+    player = max(result['home_player_stats'], key=lambda p: p['passes'])['player_name']
+    shots = analyzer._team_shots(events, home_team)
+    x, y = analyzer._player_locations(events, player, home_team)
+    style = analyzer.viz_config
+    is_home = AnalysisContext.from_details(details).is_home(home_team)
+
+    figures = {
+        'overview': (lambda: legacy_overview(details, stats, style),
+                     lambda: rendering.render_match_overview(details, stats, style)),
+        'shot_map': (lambda: legacy_shot_map(home_team, *shots, style),
+                     lambda: rendering.render_shot_map(home_team, *shots, style)),
+        'heatmap': (lambda: legacy_heatmap(player, home_team, x, y, is_home, style),
+                    lambda: rendering.render_player_heatmap(player, home_team, x, y, is_home, style))
+    }
+
+    results = {}
+    print(f"{'figure':<10} {'legacy':>9} {'current':>9} {'speedup':>8}")
+    for name, (legacy, current) in figures.items():
+        legacy_s, current_s = time_call(legacy, args.runs), time_call(current, args.runs)
+        results[name] = {'legacy_s': legacy_s, 'current_s': current_s, 'speedup': legacy_s / current_s}
+        print(f"{name:<10} {legacy_s * 1000:>7.1f}ms {current_s * 1000:>7.1f}ms {legacy_s / current_s:>7.2f}x")
+
+    figure_set = None
+    if args.workers:
+        jobs = [analyzer.figure_job(events, result, kind, player) for kind in
+                ('overview', 'home_shots', 'away_shots', 'heatmap')]
+        serial_s, serial_pngs = time_figure_set(jobs, RenderExecutor(workers=1), args.runs)
+        executor = RenderExecutor(workers=args.workers)
+        try:
+            pooled_s, pooled_pngs = time_figure_set(jobs, executor, args.runs)
+        finally:
+            executor.close()
+        identical = serial_pngs == pooled_pngs
+        figure_set = {'workers': args.workers, 'serial_s': serial_s, 'pooled_s': pooled_s, 'identical': identical}
+        print(f"all figures: serial {serial_s * 1000:.1f}ms, {args.workers} workers {pooled_s * 1000:.1f}ms "
+              f"({serial_s / pooled_s:.2f}x), identical output: {identical}")
+
+    analyzer.close()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'file': args.file_path, 'shots': int(len(shots[0])), 'heatmap_events': int(len(x)),
+                       'figures': results, 'figure_set': figure_set}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+Benchmark Suite
+---------------
+Times every FootballMatchAnalyzer stage and the main Flask endpoints on
+synthetic matches of increasing size (see synthetic_match.py), saves the
+results as JSON and compares them against a stored baseline.
+
+For each match size the suite measures:
+
+- the analysis stages on the columnar table: streaming the JSON into an
+  EventTable, writing and memory-mapping the columnar copy, match details,
+  match statistics, player statistics, heatmap grids, shot and heatmap data,
+  every figure render and analyze_match end to end;
+- the same stages on the plain Python backend (``--backends python``) and
+  on a Spark DataFrame when pyspark is installed, to compare the backends at
+  each size (the server picks between them with the cost model fitted by
+  ``python backends.py calibrate``);
+- the Flask endpoints through the test client, cold (caches cleared before
+  each request) and warm.
+
+Each timing is the median of --runs runs after one warm-up run. Comparing
+against a baseline flags a stage as a regression when its median is more than
+--tolerance slower and at least --min-delta-ms slower in absolute terms, and
+the exit status is 1 if any stage regressed.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--scales 3500,35000] [--runs 5] [--json results.json]
+    python benchmarks/run_benchmarks.py --json benchmarks/baseline.json          # record a baseline
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json      # check for regressions
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import numpy as np
+
+from event_table import EventTable, columns_path
+from backends import CostModel
+from football_analysis import FootballMatchAnalyzer, FIGURE_KINDS
+from synthetic_match import write_match
+
+DEFAULT_SCALES = '3500,35000'
+
+
+def measure(func: Callable[[], Any], runs: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """Median, min and max wall time of func over runs, after one warm-up; setup runs untimed before each call."""
+    if setup:
+        setup()
+    func()
+    timings = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {'median_s': statistics.median(timings), 'min_s': min(timings), 'max_s': max(timings), 'runs': runs}
+
+
+def match_file(data_dir: str, n_events: int, seed: int) -> str:
+    """Path of the synthetic match of this size and seed, generated on first use."""
+    path = os.path.join(data_dir, f"synthetic_{n_events}_{seed}.json")
+    if not os.path.exists(path):
+        print(f"Generating {n_events} events -> {path}", file=sys.stderr)
+        write_match(path, n_events, seed)
+    return path
+
+
+def busiest_player(match_result: Dict[str, Any]) -> str:
+    return max(match_result['home_player_stats'], key=lambda p: p['passes'])['player_name']
+
+
+def stage_timings(analyzer: FootballMatchAnalyzer, events, runs: int, prefix: str,
+                  figures: bool) -> Dict[str, Dict[str, Any]]:
+    """Time the analysis stages on already loaded events."""
+    match_result = analyzer.analyze_match_stats(events)
+    home, away = match_result['match_details']['home_team'], match_result['match_details']['away_team']
+    player = busiest_player(match_result)
+
+    def player_grids():
+        # Drop the memoized grids so every run computes them
+        analyzer._player_grids.clear()
+        analyzer.player_grids(events)
+
+    stages = {
+        'extract_match_details': lambda: analyzer.extract_match_details(events),
+        'calculate_match_stats': lambda: analyzer.calculate_match_stats(events, home, away),
+        'get_player_stats': lambda: analyzer.get_player_stats(events, home),
+        'analyze_match_stats': lambda: analyzer.analyze_match_stats(events),
+        'player_grids': player_grids,
+        'shot_data': lambda: analyzer.shot_data(events, home),
+        'heatmap_data': lambda: analyzer.heatmap_data(events, player, home)
+    }
+    if figures:
+        for kind in FIGURE_KINDS:
+            stages[f'render_{kind}'] = (lambda kind=kind: analyzer.render_figure(events, match_result, kind, player))
+
+    results = {}
+    for name, func in stages.items():
+        results[f'{prefix}.{name}'] = measure(func, runs)
+    return results
+
+
+def table_benchmarks(path: str, runs: int) -> Dict[str, Dict[str, Any]]:
+    """Loading and analysis stages on the columnar EventTable, and analyze_match end to end."""
+    analyzer = FootballMatchAnalyzer()
+    results = {'table.load_json': measure(lambda: EventTable.from_file(path), runs)}
+
+    table = EventTable.from_file(path)
+    results['table.save_columns'] = measure(lambda: table.save_columns(path), runs)
+    results['table.load_columns'] = measure(lambda: EventTable.load_columns(path), runs)
+    results.update(stage_timings(analyzer, table, runs, 'table', figures=True))
+
+    # End to end through load_data, which memory-maps the columnar copy written above
+    player = busiest_player(analyzer.analyze_match_stats(table))
+    results['table.analyze_match[stats]'] = measure(lambda: analyzer.analyze_match(path, outputs=('stats',)), runs)
+    results['table.analyze_match[all]'] = measure(lambda: analyzer.analyze_match(path, player), runs)
+    analyzer.close()
+    return results
+
+
+def python_benchmarks(path: str, runs: int) -> Dict[str, Dict[str, Any]]:
+    """Loading and analysis stages on the plain Python backend's list of event dicts."""
+    analyzer = FootballMatchAnalyzer()
+    backend = analyzer.backends['python']
+    results = {'python.load_json': measure(lambda: backend.load(path), runs)}
+    results.update(stage_timings(analyzer, backend.load(path), runs, 'python', figures=False))
+    analyzer.close()
+    return results
+
+
+def spark_benchmarks(path: str, runs: int) -> Dict[str, Dict[str, Any]]:
+    """Loading and analysis stages on a persisted Spark DataFrame."""
+    analyzer = FootballMatchAnalyzer()
+    backend = analyzer.backends['spark']
+
+    def load():
+        df = backend.load(path)
+        df.count()  # persist is lazy; materialize the cached events
+        df.unpersist()
+
+    results = {'spark.load_json': measure(load, runs)}
+    events = backend.load(path)
+    events.count()
+    results.update(stage_timings(analyzer, events, runs, 'spark', figures=False))
+    events.unpersist()
+    analyzer.close()
+    return results
+
+
+def endpoint_benchmarks(path: str, runs: int, work_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Time the main endpoints through the Flask test client, cold and warm."""
+    # The server reads its configuration at import time; keep its state out of the repository
+    os.environ.setdefault('FIGURE_CACHE_DIR', os.path.join(work_dir, 'figure_cache'))
+    os.environ.setdefault('SEASON_INDEX_DB', os.path.join(work_dir, 'season_index.sqlite'))
+    import server
+
+    server.app.config['UPLOAD_FOLDER'] = os.path.dirname(path)
+    client = server.app.test_client()
+    filename = os.path.basename(path)
+    table = EventTable.load_columns(path) or EventTable.from_file(path)
+    player = busiest_player(server.analyzer.analyze_match_stats(table))
+
+    def clear_caches():
+        server.match_cache.clear()
+        server.result_cache.clear()
+        server.figure_cache.clear()
+
+    def get(url: str, params: Optional[Dict[str, str]] = None) -> Callable[[], None]:
+        def request():
+            response = client.get(url, query_string=params)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} {params} answered {response.status_code}: {response.data[:200]!r}")
+        return request
+
+    stats = get('/api/analyze', {'filename': filename, 'outputs': 'stats'})
+    full = get('/api/analyze', {'filename': filename, 'player_name': player})
+    page = get('/analyze', {'filename': filename, 'player_name': player})
+    heatmaps = get('/api/heatmaps', {'filename': filename})
+    overview = get(f'/figure/{filename}/overview')
+
+    results = {
+        'endpoint./api/analyze[stats] cold': measure(stats, runs, setup=clear_caches),
+        'endpoint./api/analyze[stats] warm': measure(stats, runs),
+        'endpoint./api/analyze[all] cold': measure(full, runs, setup=clear_caches),
+        'endpoint./api/analyze[all] warm': measure(full, runs),
+        'endpoint./analyze warm': measure(page, runs),
+        'endpoint./api/heatmaps cold': measure(heatmaps, runs, setup=clear_caches),
+        'endpoint./api/heatmaps warm': measure(heatmaps, runs),
+        'endpoint./figure/overview cold': measure(overview, runs, setup=server.figure_cache.clear),
+        'endpoint./figure/overview warm': measure(overview, runs)
+    }
+    clear_caches()
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict[str, Dict[str, Any]]], baseline: Dict[str, Dict[str, Dict[str, Any]]],
+            tolerance: float, min_delta_s: float) -> List[Dict[str, Any]]:
+    """Pair every stage present in both runs with its baseline and flag regressions."""
+    rows = []
+    for scale, stages in results.items():
+        for stage, timing in stages.items():
+            reference = baseline.get(scale, {}).get(stage)
+            if reference is None:
+                continue
+            current, base = timing['median_s'], reference['median_s']
+            ratio = current / base if base > 0 else float('inf')
+            regressed = ratio > 1 + tolerance and current - base >= min_delta_s
+            rows.append({'scale': scale, 'stage': stage, 'baseline_s': base, 'current_s': current,
+                         'ratio': ratio, 'regressed': regressed})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark analyzer stages and endpoints on synthetic matches')
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help='Comma-separated event counts per match')
+    parser.add_argument('--runs', type=int, default=5, help='Timed runs per stage')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic matches')
+    parser.add_argument('--backends', default='table,spark',
+                        help='Analysis backends to time: table, python, spark (spark is skipped when pyspark is missing)')
+    parser.add_argument('--skip-endpoints', action='store_true', help='Do not time the Flask endpoints')
+    parser.add_argument('--data-dir', help='Directory for generated matches (reused between runs)')
+    parser.add_argument('--json', help='Write results to this JSON file (e.g. to record a baseline)')
+    parser.add_argument('--baseline', help='Compare against results previously written with --json')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown ratio before flagging')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='Ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    scales = [int(n) for n in args.scales.split(',')]
+    backends = set(args.backends.split(','))
+    spark_available = importlib.util.find_spec('pyspark') is not None
+    if 'spark' in backends and not spark_available:
+        print("pyspark is not installed; skipping the Spark backend", file=sys.stderr)
+        backends.discard('spark')
+
+    work_dir = tempfile.mkdtemp(prefix='football_benchmarks_')
+    data_dir = args.data_dir or os.path.join(work_dir, 'matches')
+    os.makedirs(data_dir, exist_ok=True)
+
+    results, files = {}, {}
+    for n_events in scales:
+        path = match_file(data_dir, n_events, args.seed)
+        # Start from the JSON alone; the table benchmarks write the columnar copy
+        if os.path.exists(columns_path(path)):
+            os.remove(columns_path(path))
+        files[str(n_events)] = {'path': path, 'bytes': os.path.getsize(path)}
+        print(f"== {n_events} events ({os.path.getsize(path) / 1e6:.1f}MB)", file=sys.stderr)
+
+        timings = {}
+        if 'table' in backends:
+            timings.update(table_benchmarks(path, args.runs))
+        if 'python' in backends:
+            timings.update(python_benchmarks(path, args.runs))
+        if 'spark' in backends:
+            timings.update(spark_benchmarks(path, args.runs))
+        if not args.skip_endpoints:
+            if not os.path.exists(columns_path(path)):
+                # As after an upload, so large files don't go to Spark
+                EventTable.from_file(path).save_columns(path)
+            timings.update(endpoint_benchmarks(path, args.runs, work_dir))
+        results[str(n_events)] = timings
+
+        for stage, timing in timings.items():
+            print(f"{n_events:>9} {stage:<42} {timing['median_s'] * 1000:>10.2f}ms")
+
+    report = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'spark': 'spark' in backends,
+            'backend_choice': CostModel.load(os.path.join(REPO_ROOT, 'backend_calibration.json')).describe()['choice'],
+            'runs': args.runs,
+            'seed': args.seed,
+            'files': files
+        },
+        'results': results
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    # Where both backends ran, show which one is faster at each size
+    for scale, timings in results.items():
+        table_s = timings.get('table.analyze_match_stats', {}).get('median_s')
+        spark_s = timings.get('spark.analyze_match_stats', {}).get('median_s')
+        if table_s and spark_s:
+            faster = 'spark' if spark_s < table_s else 'table'
+            print(f"{scale:>9} events, {files[scale]['bytes'] / 1e6:.1f}MB: table {table_s * 1000:.1f}ms, "
+                  f"spark {spark_s * 1000:.1f}ms -> {faster} is faster")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline['results'], args.tolerance, args.min_delta_ms / 1000)
+        regressions = [row for row in rows if row['regressed']]
+        print(f"\nCompared {len(rows)} stages with {args.baseline} (commit {baseline['meta'].get('commit')})")
+        for row in rows:
+            flag = 'REGRESSION' if row['regressed'] else ''
+            print(f"{row['scale']:>9} {row['stage']:<42} {row['baseline_s'] * 1000:>10.2f}ms "
+                  f"{row['current_s'] * 1000:>10.2f}ms {row['ratio']:>6.2f}x {flag}")
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
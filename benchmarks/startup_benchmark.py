@@ -0,0 +1,87 @@
+"""
+Startup Benchmark
+-----------------
+Measures cold-start time of the analyzer module, the analyzer constructor and
+the Flask server module. Each measurement runs in a fresh interpreter so module
+caches from previous runs do not hide import costs.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs N] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each snippet prints the seconds spent on the measured statement
+SCENARIOS = {
+    'import football_analysis': (
+        "import time; t = time.perf_counter(); "
+        "import football_analysis; "
+        "print(time.perf_counter() - t)"
+    ),
+    'FootballMatchAnalyzer()': (
+        "import time; t = time.perf_counter(); "
+        "from football_analysis import FootballMatchAnalyzer; FootballMatchAnalyzer(); "
+        "print(time.perf_counter() - t)"
+    ),
+    'import server': (
+        "import time; t = time.perf_counter(); "
+        "import server; "
+        "print(time.perf_counter() - t)"
+    ),
+}
+
+# Modules that should not be loaded just by starting the server or the CLI
+HEAVY_MODULES = ['pyspark', 'matplotlib', 'scipy', 'pandas']
+
+
+def time_snippet(snippet: str) -> float:
+    """Run a snippet in a fresh interpreter and return the time it reports."""
+    output = subprocess.check_output([sys.executable, '-c', snippet], cwd=REPO_ROOT, text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def heavy_modules_loaded() -> list:
+    """Return the heavy modules that are imported as a side effect of importing server."""
+    snippet = (
+        "import sys, server; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.check_output([sys.executable, '-c', snippet], cwd=REPO_ROOT, text=True)
+    loaded = output.strip().splitlines()[-1] if output.strip() else ''
+    return [m for m in loaded.split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure server and CLI cold-start time')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per scenario')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    for name, snippet in SCENARIOS.items():
+        timings = [time_snippet(snippet) for _ in range(args.runs)]
+        results[name] = {
+            'median_s': statistics.median(timings),
+            'min_s': min(timings),
+            'max_s': max(timings)
+        }
+        print(f"{name:<28} median {results[name]['median_s']:.3f}s  "
+              f"(min {results[name]['min_s']:.3f}s, max {results[name]['max_s']:.3f}s)")
+
+    loaded = heavy_modules_loaded()
+    print(f"Heavy modules loaded by 'import server': {', '.join(loaded) if loaded else 'none'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'scenarios': results, 'heavy_modules_loaded': loaded}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Synthetic Match Generator
+-------------------------
+Writes StatsBomb-shaped event files of any size for benchmarks.
+
+A generated match has what the analyzer reads from real StatsBomb data, in
+realistic proportions: two Starting XI events with formations and lineups,
+possession chains of passes (with recipients, end locations and incomplete
+outcomes), ball receipts, carries, pressures, duels and shots (with xG from
+shot distance and angle, and goals drawn from that xG), substitutions, and
+period/minute/second/timestamp fields. Players move around their formation
+position, each team attacking towards x = 120 as in StatsBomb coordinates.
+
+The output depends only on the event count and the seed, and events are
+written one at a time, so files with millions of events can be generated
+without holding them in memory.
+
+Usage:
+    python benchmarks/synthetic_match.py uploads/synthetic.json [--events 3500] [--seed 0] [--columns]
+"""
+
+from typing import Any, Dict, Iterator, List, Tuple
+import argparse
+import json
+import math
+import os
+import random
+import sys
+
+# Events in a typical real match, used as the default size
+TYPICAL_EVENTS = 3500
+
+PERIOD_SECONDS = 45 * 60
+
+# Formation -> (position id, position name, base x, base y) for each starter
+FORMATIONS = {
+    442: [(1, 'Goalkeeper', 6, 40), (2, 'Right Back', 30, 12), (3, 'Right Center Back', 22, 30),
+          (5, 'Left Center Back', 22, 50), (6, 'Left Back', 30, 68), (12, 'Right Midfield', 58, 12),
+          (13, 'Right Center Midfield', 52, 32), (15, 'Left Center Midfield', 52, 48),
+          (16, 'Left Midfield', 58, 68), (22, 'Right Center Forward', 84, 32), (24, 'Left Center Forward', 84, 48)],
+    433: [(1, 'Goalkeeper', 6, 40), (2, 'Right Back', 32, 12), (3, 'Right Center Back', 22, 30),
+          (5, 'Left Center Back', 22, 50), (6, 'Left Back', 32, 68), (10, 'Center Defensive Midfield', 44, 40),
+          (13, 'Right Center Midfield', 58, 28), (15, 'Left Center Midfield', 58, 52),
+          (17, 'Right Wing', 86, 12), (23, 'Center Forward', 92, 40), (21, 'Left Wing', 86, 68)],
+    4231: [(1, 'Goalkeeper', 6, 40), (2, 'Right Back', 32, 12), (3, 'Right Center Back', 22, 30),
+           (5, 'Left Center Back', 22, 50), (6, 'Left Back', 32, 68), (9, 'Right Defensive Midfield', 44, 32),
+           (11, 'Left Defensive Midfield', 44, 48), (17, 'Right Wing', 78, 14), (19, 'Center Attacking Midfield', 72, 40),
+           (21, 'Left Wing', 78, 66), (23, 'Center Forward', 94, 40)]
+}
+
+# Relative frequency of the open-play actions of the team in possession
+ACTIONS = [('Pass', 0.62), ('Carry', 0.24), ('Dribble', 0.03), ('Miscontrol', 0.02), ('Dispossessed', 0.02),
+           ('Clearance', 0.02), ('Shot', 0.05)]
+PASS_FAILURES = [{'id': 9, 'name': 'Incomplete'}, {'id': 75, 'name': 'Out'}, {'id': 76, 'name': 'Pass Offside'}]
+SHOT_MISSES = [{'id': 100, 'name': 'Saved'}, {'id': 98, 'name': 'Off T'}, {'id': 96, 'name': 'Blocked'},
+               {'id': 101, 'name': 'Wayward'}]
+TYPE_IDS = {'Pass': 30, 'Ball Receipt*': 42, 'Carry': 43, 'Pressure': 17, 'Duel': 4, 'Dribble': 14,
+            'Miscontrol': 38, 'Dispossessed': 3, 'Clearance': 9, 'Shot': 16, 'Starting XI': 35,
+            'Substitution': 19, 'Half Start': 18, 'Half End': 34}
+
+
+class _Team:
+    def __init__(self, team_id: int, name: str, formation: int, rng: random.Random):
+        self.ref = {'id': team_id, 'name': name}
+        self.formation = formation
+        self.starters = []
+        for number, (position_id, position, x, y) in enumerate(FORMATIONS[formation], start=1):
+            player = {'id': team_id * 1000 + number, 'name': f"{name} Player {number}"}
+            self.starters.append({'player': player, 'position': {'id': position_id, 'name': position},
+                                  'jersey_number': number, 'base': (x, y)})
+        self.bench = [{'id': team_id * 1000 + number, 'name': f"{name} Player {number}"} for number in range(12, 17)]
+        # Three outfield substitutions at random points of the second half
+        self.substitutions = sorted(
+            (PERIOD_SECONDS + rng.randint(10 * 60, 40 * 60), rng.randint(1, 10), self.bench[i]) for i in range(3))
+        self.on_pitch = list(self.starters)
+
+    def lineup(self) -> List[Dict[str, Any]]:
+        return [{key: entry[key] for key in ('player', 'position', 'jersey_number')} for entry in self.starters]
+
+
+class _Clock:
+    """Spreads a fixed number of events evenly over two halves."""
+
+    def __init__(self, total_events: int):
+        self.step = 2 * PERIOD_SECONDS / max(total_events, 1)
+        self.elapsed = 0.0
+
+    def tick(self, rng: random.Random) -> float:
+        self.elapsed += self.step * rng.uniform(0.5, 1.5)
+        return min(self.elapsed, 2 * PERIOD_SECONDS - 0.001)
+
+    @staticmethod
+    def fields(elapsed: float) -> Dict[str, Any]:
+        period = 1 if elapsed < PERIOD_SECONDS else 2
+        in_period = elapsed - (period - 1) * PERIOD_SECONDS
+        minute = int(elapsed // 60)
+        second = int(elapsed % 60)
+        timestamp = f"00:{int(in_period // 60):02d}:{in_period % 60:06.3f}"
+        return {'period': period, 'timestamp': timestamp, 'minute': minute, 'second': second}
+
+
+def _uuid(rng: random.Random) -> str:
+    value = f"{rng.getrandbits(128):032x}"
+    return f"{value[:8]}-{value[8:12]}-4{value[13:16]}-a{value[17:20]}-{value[20:]}"
+
+
+def _near(base: Tuple[float, float], spread: float, rng: random.Random) -> List[float]:
+    return [round(min(max(rng.gauss(base[0], spread), 0.1), 119.9), 1),
+            round(min(max(rng.gauss(base[1], spread * 0.8), 0.1), 79.9), 1)]
+
+
+def shot_xg(x: float, y: float) -> float:
+    """Expected goals from shot distance and goal-mouth angle, in the range of real shot models."""
+    dx, dy = 120 - x, abs(40 - y)
+    distance = math.hypot(dx, dy)
+    angle = math.atan2(7.32 * dx, dx * dx + dy * dy - (7.32 / 2) ** 2)
+    if angle < 0:
+        angle += math.pi
+    logit = -1.1 - 0.11 * distance + 1.6 * angle
+    return round(1 / (1 + math.exp(-logit)), 4)
+
+
+def generate_events(n_events: int = TYPICAL_EVENTS, seed: int = 0,
+                    home_team: str = 'Home FC', away_team: str = 'Away FC') -> Iterator[Dict[str, Any]]:
+    """Yield the events of a synthetic match with (about) n_events events."""
+    rng = random.Random(seed)
+    formations = list(FORMATIONS)
+    teams = [_Team(1, home_team, rng.choice(formations), rng), _Team(2, away_team, rng.choice(formations), rng)]
+    clock = _Clock(n_events)
+    index = 0
+    possession = 1
+
+    def event(type_name: str, team: _Team, possession_team: _Team, elapsed: float, **fields) -> Dict[str, Any]:
+        nonlocal index
+        index += 1
+        result = {'id': _uuid(rng), 'index': index}
+        result.update(_Clock.fields(elapsed))
+        result.update({'type': {'id': TYPE_IDS[type_name], 'name': type_name}, 'possession': possession,
+                       'possession_team': possession_team.ref, 'team': team.ref})
+        result.update(fields)
+        return result
+
+    for team in teams:
+        yield event('Starting XI', team, teams[0], 0.0, duration=0.0,
+                    tactics={'formation': team.formation, 'lineup': team.lineup()})
+    for team in teams:
+        yield event('Half Start', team, teams[0], 0.0, duration=0.0)
+
+    attacking = 0
+    second_half = False
+    while index < n_events:
+        team, opponent = teams[attacking], teams[1 - attacking]
+        elapsed = clock.tick(rng)
+
+        if not second_half and elapsed >= PERIOD_SECONDS:
+            second_half = True
+            for side in teams:
+                yield event('Half End', side, team, PERIOD_SECONDS - 0.001, duration=0.0)
+            for side in teams:
+                yield event('Half Start', side, teams[1], PERIOD_SECONDS, duration=0.0)
+            # The team that didn't kick off the first half starts the second
+            attacking = 1
+            team, opponent = teams[attacking], teams[0]
+
+        # Substitutions that are due replace a random outfield player
+        for side in teams:
+            while side.substitutions and side.substitutions[0][0] <= elapsed:
+                _, slot, replacement = side.substitutions.pop(0)
+                outgoing = side.on_pitch[slot]
+                yield event('Substitution', side, team, elapsed, player=outgoing['player'],
+                            position=outgoing['position'],
+                            substitution={'replacement': replacement, 'outcome': {'id': 103, 'name': 'Tactical'}})
+                side.on_pitch[slot] = dict(outgoing, player=replacement)
+
+        carrier = rng.choice(team.on_pitch[1:] if rng.random() < 0.9 else team.on_pitch)
+        chain_length = 1 + int(rng.expovariate(1 / 5))
+        for _ in range(chain_length):
+            if index >= n_events:
+                break
+            elapsed = clock.tick(rng)
+            location = _near(carrier['base'], 9, rng)
+
+            if rng.random() < 0.12:
+                presser = rng.choice(opponent.on_pitch[1:])
+                yield event('Pressure', opponent, team, elapsed, player=presser['player'],
+                            position=presser['position'], location=[round(120 - location[0], 1),
+                                                                    round(80 - location[1], 1)],
+                            duration=round(rng.uniform(0.2, 1.5), 3))
+
+            action = rng.choices([name for name, _ in ACTIONS], [weight for _, weight in ACTIONS])[0]
+            if action == 'Shot' and location[0] < 70:
+                action = 'Pass'
+            common = {'player': carrier['player'], 'position': carrier['position'], 'location': location,
+                      'duration': round(rng.uniform(0.3, 2.5), 3)}
+
+            if action == 'Pass':
+                receiver = rng.choice([p for p in team.on_pitch if p is not carrier])
+                end = _near(receiver['base'], 8, rng)
+                dx, dy = end[0] - location[0], end[1] - location[1]
+                pass_info = {'recipient': receiver['player'], 'length': round(math.hypot(dx, dy), 1),
+                             'angle': round(math.atan2(dy, dx), 3), 'end_location': end,
+                             'height': {'id': 1, 'name': 'Ground Pass'},
+                             'body_part': {'id': 40, 'name': 'Right Foot'}}
+                failed = rng.random() < 0.18
+                if failed:
+                    pass_info['outcome'] = rng.choice(PASS_FAILURES)
+                yield event('Pass', team, team, elapsed, **common, **{'pass': pass_info})
+                if failed:
+                    break
+                if index < n_events:
+                    yield event('Ball Receipt*', team, team, clock.tick(rng), player=receiver['player'],
+                                position=receiver['position'], location=end)
+                carrier = receiver
+            elif action == 'Carry':
+                end = _near((location[0] + 6, location[1]), 3, rng)
+                yield event('Carry', team, team, elapsed, **common, carry={'end_location': end})
+            elif action == 'Dribble':
+                won = rng.random() < 0.55
+                outcome = {'id': 8, 'name': 'Complete'} if won else {'id': 9, 'name': 'Incomplete'}
+                yield event('Dribble', team, team, elapsed, **common, dribble={'outcome': outcome})
+                if not won:
+                    tackler = rng.choice(opponent.on_pitch[1:])
+                    if index < n_events:
+                        yield event('Duel', opponent, team, elapsed, player=tackler['player'],
+                                    position=tackler['position'], location=[round(120 - location[0], 1),
+                                                                            round(80 - location[1], 1)],
+                                    duel={'type': {'id': 11, 'name': 'Tackle'}})
+                    break
+            elif action == 'Shot':
+                shot_location = [round(rng.uniform(94, 119), 1), round(rng.gauss(40, 8), 1)]
+                shot_location[1] = min(max(shot_location[1], 1.0), 79.0)
+                xg = shot_xg(*shot_location)
+                outcome = {'id': 97, 'name': 'Goal'} if rng.random() < xg else rng.choice(SHOT_MISSES)
+                common['location'] = shot_location
+                yield event('Shot', team, team, elapsed, **common, shot={
+                    'statsbomb_xg': xg, 'outcome': outcome, 'type': {'id': 87, 'name': 'Open Play'},
+                    'technique': {'id': 93, 'name': 'Normal'}, 'body_part': {'id': 40, 'name': 'Right Foot'},
+                    'end_location': [120.0, round(rng.uniform(36, 44), 1), round(rng.uniform(0, 2.6), 1)]})
+                break
+            else:
+                # Miscontrol, Dispossessed or Clearance ends the possession
+                yield event(action, team, team, elapsed, **common)
+                break
+
+        possession += 1
+        attacking = 1 - attacking if rng.random() < 0.85 else attacking
+
+    for team in teams:
+        yield event('Half End', team, teams[0], 2 * PERIOD_SECONDS, duration=0.0)
+
+
+def write_match(file_path: str, n_events: int = TYPICAL_EVENTS, seed: int = 0, **kwargs) -> int:
+    """Write a synthetic match as a JSON event array and return the number of events."""
+    count = 0
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for event in generate_events(n_events, seed, **kwargs):
+            f.write(',\n' if count else '\n')
+            f.write(json.dumps(event, separators=(',', ':')))
+            count += 1
+        f.write('\n]\n')
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic StatsBomb match file')
+    parser.add_argument('file_path', help='Output JSON file')
+    parser.add_argument('--events', type=int, default=TYPICAL_EVENTS, help='Approximate number of events')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed; equal seeds give identical files')
+    parser.add_argument('--columns', action='store_true', help='Also write the binary columnar copy')
+    args = parser.parse_args()
+
+    count = write_match(args.file_path, args.events, args.seed)
+    print(f"Wrote {count} events ({os.path.getsize(args.file_path) / 1e6:.1f}MB) to {args.file_path}")
+    if args.columns:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from event_table import EventTable
+        EventTable.from_file(args.file_path).save_columns(args.file_path)
+
+
+if __name__ == '__main__':
+    main()
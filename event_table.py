@@ -0,0 +1,525 @@
+"""
+Columnar Event Table
+--------------------
+Compact, column-oriented representation of a StatsBomb event list.
+
+The table is built in a single pass over the raw events and keeps one NumPy
+array per field the analyzer reads (event type, team, player, possession team,
+match clock, location, xG and outcome flags). Team, player and event type names are interned
+into small lookup lists so every column is a plain numeric array, which lets the
+analysis stages use boolean masks and ``np.bincount`` reductions instead of
+walking the list of dicts again.
+
+Files can be streamed straight into a table with ``EventTable.from_file``: the
+top-level event array is decoded one event at a time (decompressing ``.json.gz``
+and ``.json.zst`` files on the fly) and only the projected fields reach the
+builder, so peak memory follows the kept columns rather than the size of the
+raw JSON.
+
+A table can also be saved next to its source file as a binary columnar file
+(``<match>.json.cols``) and reopened memory-mapped, which skips JSON decoding
+entirely and lets several processes share the pages through the OS cache.
+"""
+
+from array import array
+from typing import Dict, Any, List, Iterable, Iterator, Optional, TextIO, Tuple
+import json
+import os
+import struct
+import numpy as np
+
+from match_storage import open_match
+
+# Binary columnar file layout: magic, header length, JSON header, aligned column data.
+# Bump COLUMNS_SCHEMA_VERSION whenever the set or meaning of the columns changes.
+COLUMNS_MAGIC = b'FBACOLS\x00'
+COLUMNS_SCHEMA_VERSION = 2
+COLUMNS_SUFFIX = '.cols'
+_COLUMN_ALIGNMENT = 64
+_COLUMN_NAMES = (
+    'type_code', 'team', 'player', 'possession_team', 'period', 'minute', 'x', 'y', 'xg', 'pass_failed', 'shot_goal'
+)
+
+# Marker used in the code columns for events without a team/player/possession team
+MISSING = -1
+
+
+def columns_path(file_path: str) -> str:
+    """Path of the binary columnar file saved alongside a match file."""
+    return file_path + COLUMNS_SUFFIX
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _COLUMN_ALIGNMENT) * _COLUMN_ALIGNMENT
+
+
+def location_counts(groups: np.ndarray, n_groups: int, x: np.ndarray, y: np.ndarray,
+                    bins: Tuple[int, int], extent: Tuple[float, float]) -> np.ndarray:
+    """
+    Count locations per group and grid cell with a single ``np.bincount``.
+
+    Returns an array of shape (n_groups, bins[0], bins[1]) holding, for every
+    group, the same counts as ``np.histogram2d`` over [0, extent[0]] x
+    [0, extent[1]]: locations outside the extent are dropped and those on the
+    far edge fall into the last cell.
+    """
+    cells = []
+    inside = np.ones(len(groups), dtype=bool)
+    for values, n_bins, length in ((x, bins[0], extent[0]), (y, bins[1], extent[1])):
+        edges = np.linspace(0, length, n_bins + 1)
+        index = np.searchsorted(edges, values.astype(np.float64), side='right')
+        index[values == edges[-1]] -= 1
+        inside &= (index >= 1) & (index <= n_bins)
+        cells.append(index - 1)
+    flat = (groups[inside] * bins[0] + cells[0][inside]) * bins[1] + cells[1][inside]
+    counts = np.bincount(flat, minlength=n_groups * bins[0] * bins[1])
+    return counts.reshape(n_groups, bins[0], bins[1])
+
+
+def project_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the fields of a raw StatsBomb event that the analyzer reads."""
+    projected = {}
+    for key in ('type', 'team', 'player', 'possession_team'):
+        value = event.get(key)
+        if value is not None:
+            projected[key] = {'name': value.get('name')}
+
+    for key in ('period', 'minute', 'location'):
+        if key in event:
+            projected[key] = event[key]
+
+    pass_info = event.get('pass')
+    if pass_info is not None:
+        projected['pass'] = {'outcome': pass_info['outcome']} if 'outcome' in pass_info else {}
+
+    shot = event.get('shot')
+    if shot is not None:
+        projected['shot'] = {
+            key: shot[key] for key in ('outcome', 'statsbomb_xg') if key in shot
+        }
+
+    # Tactics are only needed for the Starting XI lineups and formations
+    if (event.get('type') or {}).get('name') == 'Starting XI' and 'tactics' in event:
+        projected['tactics'] = event['tactics']
+    return projected
+
+
+def iter_json_array(file_obj: TextIO, chunk_size: int = 64 * 1024, strict: bool = False,
+                    max_element_size: Optional[int] = None) -> Iterator[Any]:
+    """
+    Incrementally decode the elements of a top-level JSON array.
+
+    Only the current element and one read chunk are held in memory at a time.
+    An element split across reads is retried after reading at least as much
+    again as is buffered, so a large element costs linear rather than
+    quadratic time. With ``max_element_size``, an element longer than that
+    many characters is an error. With ``strict``, the input is read to the end
+    and anything but whitespace after the array is an error.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill(size=chunk_size):
+        # Drop the consumed prefix and append the next chunk
+        nonlocal buffer, pos, eof
+        chunk = file_obj.read(size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def next_token():
+        # Skip whitespace, reading more input as needed, and return the next character
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                raise ValueError("Unexpected end of JSON event array")
+            fill()
+
+    def end_of_array():
+        nonlocal pos
+        pos += 1
+        if strict:
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer):
+                    raise ValueError(f"Unexpected data after the event array: {buffer[pos]!r}")
+                if eof:
+                    return
+                fill()
+
+    if next_token() != '[':
+        raise ValueError("Expected a JSON array of events")
+    pos += 1
+
+    if next_token() == ']':
+        end_of_array()
+        return
+
+    while True:
+        try:
+            element, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The element is split across chunks (or malformed, which the last read reveals)
+            if eof:
+                raise
+            pending = len(buffer) - pos
+            if max_element_size is not None and pending > max_element_size:
+                raise ValueError(f"JSON array element exceeds {max_element_size} characters")
+            # Doubling the buffered element on each retry keeps the total decoding work linear
+            fill(max(chunk_size, pending))
+            continue
+        pos = end
+        yield element
+
+        token = next_token()
+        if token == ']':
+            end_of_array()
+            return
+        if token != ',':
+            raise ValueError(f"Expected ',' or ']' in event array, found {token!r}")
+        pos += 1
+        next_token()
+
+
+def iter_events(file_obj: TextIO, project: bool = True) -> Iterator[Dict[str, Any]]:
+    """Stream the events of a StatsBomb file, optionally projected to the fields we use."""
+    for event in iter_json_array(file_obj):
+        yield project_event(event) if project else event
+
+
+class _Interner:
+    """Assign consecutive integer codes to names in first-seen order."""
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def code(self, name) -> int:
+        if name is None:
+            return MISSING
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.codes[name] = code
+            self.names.append(name)
+        return code
+
+
+class EventTableBuilder:
+    """Accumulate events one at a time and freeze them into an EventTable."""
+
+    def __init__(self):
+        self._types = _Interner()
+        self._teams = _Interner()
+        self._players = _Interner()
+        # Typed buffers keep each column compact while events are streamed in
+        self._type_code = array('h')
+        self._team = array('h')
+        self._player = array('i')
+        self._possession_team = array('h')
+        self._period = array('b')
+        self._minute = array('h')
+        self._x = array('f')
+        self._y = array('f')
+        self._xg = array('d')
+        self._pass_failed = array('b')
+        self._shot_goal = array('b')
+        self.lineups = {}
+        self.formations = {}
+
+    def add(self, event: Dict[str, Any]):
+        """Append one raw StatsBomb event to the table."""
+        event_type = (event.get('type') or {}).get('name')
+        team_name = (event.get('team') or {}).get('name')
+
+        self._type_code.append(self._types.code(event_type))
+        self._team.append(self._teams.code(team_name))
+        self._player.append(self._players.code((event.get('player') or {}).get('name')))
+        self._possession_team.append(self._teams.code((event.get('possession_team') or {}).get('name')))
+
+        # Match clock; events without one are left out of timelines
+        period, minute = event.get('period'), event.get('minute')
+        self._period.append(period if period is not None else MISSING)
+        self._minute.append(minute if minute is not None else MISSING)
+
+        location = event.get('location')
+        if isinstance(location, (list, tuple)) and len(location) >= 2:
+            self._x.append(location[0])
+            self._y.append(location[1])
+        else:
+            self._x.append(float('nan'))
+            self._y.append(float('nan'))
+
+        # A pass without an outcome is a completed pass in StatsBomb data
+        self._pass_failed.append(event_type == 'Pass' and (event.get('pass') or {}).get('outcome') is not None)
+
+        shot = event.get('shot') or {}
+        self._shot_goal.append((shot.get('outcome') or {}).get('name') == 'Goal')
+        self._xg.append(shot.get('statsbomb_xg') or 0.0)
+
+        if event_type == 'Starting XI' and team_name is not None and event.get('tactics'):
+            self._add_tactics(team_name, event['tactics'])
+
+    def _add_tactics(self, team_name: str, tactics: Dict[str, Any]):
+        """Record the formation and lineup of a Starting XI event."""
+        if tactics.get('formation') is not None:
+            self.formations[team_name] = str(tactics['formation'])
+
+        lineup = self.lineups.setdefault(team_name, {})
+        for player in tactics.get('lineup') or []:
+            player_name = (player.get('player') or {}).get('name', '')
+            if player_name:
+                lineup[player_name] = {
+                    'player_name': player_name,
+                    'position': (player.get('position') or {}).get('name', ''),
+                    'jersey': player.get('jersey_number', 0)
+                }
+
+    def build(self) -> 'EventTable':
+        """Freeze the accumulated columns into NumPy arrays."""
+        # np.frombuffer wraps the typed buffers without copying them
+        return EventTable(
+            type_code=np.frombuffer(self._type_code, dtype=np.int16),
+            team=np.frombuffer(self._team, dtype=np.int16),
+            player=np.frombuffer(self._player, dtype=np.int32),
+            possession_team=np.frombuffer(self._possession_team, dtype=np.int16),
+            period=np.frombuffer(self._period, dtype=np.int8),
+            minute=np.frombuffer(self._minute, dtype=np.int16),
+            x=np.frombuffer(self._x, dtype=np.float32),
+            y=np.frombuffer(self._y, dtype=np.float32),
+            xg=np.frombuffer(self._xg, dtype=np.float64),
+            pass_failed=np.frombuffer(self._pass_failed, dtype=np.int8).view(bool),
+            shot_goal=np.frombuffer(self._shot_goal, dtype=np.int8).view(bool),
+            type_names=self._types.names,
+            team_names=self._teams.names,
+            player_names=self._players.names,
+            lineups={team: list(players.values()) for team, players in self.lineups.items()},
+            formations=dict(self.formations)
+        )
+
+
+class EventTable:
+    """Column-oriented StatsBomb events with interned team/player/type names."""
+
+    def __init__(self, type_code: np.ndarray, team: np.ndarray, player: np.ndarray,
+                 possession_team: np.ndarray, period: np.ndarray, minute: np.ndarray,
+                 x: np.ndarray, y: np.ndarray, xg: np.ndarray, pass_failed: np.ndarray, shot_goal: np.ndarray,
+                 type_names: List[str], team_names: List[str], player_names: List[str],
+                 lineups: Dict[str, List[Dict]], formations: Dict[str, str]):
+        self.type_code = type_code
+        self.team = team
+        self.player = player
+        self.possession_team = possession_team
+        self.period = period
+        self.minute = minute
+        self.x = x
+        self.y = y
+        self.xg = xg
+        self.pass_failed = pass_failed
+        self.shot_goal = shot_goal
+        self.type_names = type_names
+        self.team_names = team_names
+        self.player_names = player_names
+        self.lineups = lineups
+        self.formations = formations
+
+        self._type_index = {name: code for code, name in enumerate(type_names)}
+        self._team_index = {name: code for code, name in enumerate(team_names)}
+        self._player_index = {name: code for code, name in enumerate(player_names)}
+
+    @classmethod
+    def from_events(cls, events: Iterable[Dict[str, Any]]) -> 'EventTable':
+        """Build a table from raw StatsBomb event dicts in one pass."""
+        builder = EventTableBuilder()
+        for event in events:
+            builder.add(event)
+        return builder.build()
+
+    @classmethod
+    def from_file(cls, file_path: str) -> 'EventTable':
+        """Stream a StatsBomb event file into a table without materializing the whole JSON."""
+        with open_match(file_path) as f:
+            return cls.from_events(iter_events(f))
+
+    def __len__(self) -> int:
+        return len(self.type_code)
+
+    @classmethod
+    def load_columns(cls, file_path: str) -> Optional['EventTable']:
+        """
+        Open the binary columnar file saved for file_path, memory-mapped.
+
+        Returns None when there is no columnar file, or when it was written by
+        another schema version or for a different version of the source file.
+        """
+        header = cls._columns_header(file_path)
+        if header is None:
+            return None
+        path = columns_path(file_path)
+
+        data_start = _aligned(len(COLUMNS_MAGIC) + 4 + header['header_length'])
+        columns = {}
+        for name in _COLUMN_NAMES:
+            spec = header['columns'][name]
+            if header['length'] == 0:
+                # np.memmap cannot map an empty region
+                columns[name] = np.empty(0, dtype=spec['dtype'])
+            else:
+                columns[name] = np.memmap(path, dtype=spec['dtype'], mode='r',
+                                          offset=data_start + spec['offset'], shape=(header['length'],))
+
+        return cls(type_names=header['type_names'], team_names=header['team_names'],
+                   player_names=header['player_names'], lineups=header['lineups'],
+                   formations=header['formations'], **columns)
+
+    @staticmethod
+    def _columns_header(file_path: str) -> Optional[Dict[str, Any]]:
+        """Header of the columnar file of file_path, or None when it is missing or stale."""
+        path = columns_path(file_path)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            if f.read(len(COLUMNS_MAGIC)) != COLUMNS_MAGIC:
+                return None
+            header_length, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+
+        if header.get('schema_version') != COLUMNS_SCHEMA_VERSION:
+            return None
+        stat = os.stat(file_path)
+        if header['source'] != {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}:
+            return None
+        header['header_length'] = header_length
+        return header
+
+    @classmethod
+    def has_columns(cls, file_path: str) -> bool:
+        """Whether an up-to-date columnar file exists for file_path."""
+        return cls._columns_header(file_path) is not None
+
+    def save_columns(self, file_path: str):
+        """Write the table next to file_path as a versioned binary columnar file."""
+        stat = os.stat(file_path)
+        columns = {name: np.ascontiguousarray(getattr(self, name)) for name in _COLUMN_NAMES}
+
+        # Column offsets are relative to the (aligned) end of the header
+        specs = {}
+        offset = 0
+        for name, column in columns.items():
+            offset = _aligned(offset)
+            specs[name] = {'dtype': column.dtype.str, 'offset': offset}
+            offset += column.nbytes
+
+        header = json.dumps({
+            'schema_version': COLUMNS_SCHEMA_VERSION,
+            'source': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns},
+            'length': len(self),
+            'columns': specs,
+            'type_names': self.type_names,
+            'team_names': self.team_names,
+            'player_names': self.player_names,
+            'lineups': self.lineups,
+            'formations': self.formations
+        }).encode('utf-8')
+        data_start = _aligned(len(COLUMNS_MAGIC) + 4 + len(header))
+
+        # Write to a temporary file and rename, so readers never see a partial file
+        path = columns_path(file_path)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(COLUMNS_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for name in _COLUMN_NAMES:
+                f.seek(data_start + specs[name]['offset'])
+                f.write(columns[name].tobytes())
+        os.replace(tmp_path, path)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the numeric columns."""
+        return sum(getattr(self, name).nbytes for name in _COLUMN_NAMES)
+
+    @property
+    def has_location(self) -> np.ndarray:
+        return ~np.isnan(self.x)
+
+    def type_code_of(self, name: str) -> int:
+        return self._type_index.get(name, MISSING)
+
+    def team_code_of(self, name: Optional[str]) -> int:
+        return self._team_index.get(name, MISSING)
+
+    def player_code_of(self, name: Optional[str]) -> int:
+        return self._player_index.get(name, MISSING)
+
+    def _code_mask(self, column: np.ndarray, code: int) -> np.ndarray:
+        # Unknown names must not match the events that have no value at all
+        if code == MISSING:
+            return np.zeros(len(self), dtype=bool)
+        return column == code
+
+    def type_mask(self, name: str) -> np.ndarray:
+        return self._code_mask(self.type_code, self.type_code_of(name))
+
+    def team_mask(self, name: Optional[str]) -> np.ndarray:
+        return self._code_mask(self.team, self.team_code_of(name))
+
+    def player_mask(self, name: Optional[str]) -> np.ndarray:
+        return self._code_mask(self.player, self.player_code_of(name))
+
+    def event_teams(self) -> List[str]:
+        """Names of teams that own at least one event, in order of first appearance."""
+        codes, first_seen = np.unique(self.team, return_index=True)
+        ordered = codes[np.argsort(first_seen)]
+        return [self.team_names[code] for code in ordered if code != MISSING]
+
+    def team_totals(self, mask: np.ndarray, weights: Optional[np.ndarray] = None,
+                    column: str = 'team') -> np.ndarray:
+        """Sum ``weights`` (or count events) per team code over the masked rows."""
+        codes = getattr(self, column)
+        mask = mask & (codes != MISSING)
+        return np.bincount(codes[mask], weights=None if weights is None else weights[mask],
+                           minlength=len(self.team_names))
+
+    def player_location_counts(self, bins: Tuple[int, int],
+                               extent: Tuple[float, float]) -> Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray]:
+        """
+        Occupancy grids of every (team, player) pair with located events, in one pass.
+
+        Returns the pairs, their located event counts and their location counts
+        per grid cell (see ``location_counts``), all in the same order.
+        """
+        mask = self.has_location & (self.player != MISSING) & (self.team != MISSING)
+        pair_codes = self.team[mask].astype(np.int64) * len(self.player_names) + self.player[mask]
+        unique_pairs, groups = np.unique(pair_codes, return_inverse=True)
+        pairs = [(self.team_names[code // len(self.player_names)], self.player_names[code % len(self.player_names)])
+                 for code in unique_pairs.tolist()]
+        events = np.bincount(groups, minlength=len(pairs))
+        return pairs, events, location_counts(groups, len(pairs), self.x[mask], self.y[mask], bins, extent)
+
+    def player_totals(self, mask: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+        """Sum ``weights`` (or count events) per player code over the masked rows."""
+        mask = mask & (self.player != MISSING)
+        return np.bincount(self.player[mask], weights=None if weights is None else weights[mask],
+                           minlength=len(self.player_names))
+
+
+if __name__ == "__main__":
+    # Convert existing match files to the binary columnar format
+    # Usage: python event_table.py uploads/*.json
+    import sys
+
+    for file_path in sys.argv[1:]:
+        table = EventTable.from_file(file_path)
+        table.save_columns(file_path)
+        print(f"Wrote {columns_path(file_path)} ({len(table)} events)")
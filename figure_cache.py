@@ -0,0 +1,199 @@
+"""
+Figure Cache
+------------
+On-disk cache of rendered figure PNGs for the web server.
+
+A figure is identified by the content hash of its match file, the figure kind,
+the player (for heatmaps) and a hash of the visual style, so a re-uploaded
+match or a style change never serves a stale image while identical content
+uploaded under another name reuses the same files. The key doubles as the
+HTTP ETag of the image.
+
+The cache is bounded by total file size and evicts the least recently used
+figures. Entries survive restarts: the directory is scanned on startup and
+file modification times record recency. Concurrent requests for the same
+missing figure share one render.
+"""
+
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Dict, Optional
+import hashlib
+import os
+import tempfile
+import threading
+
+from match_cache import file_identity
+
+FIGURE_SUFFIX = '.png'
+
+# Content hashes remembered per file identity, so each file is hashed once
+_MAX_HASHES = 1024
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def figure_key(content_hash: str, kind: str, player_name: Optional[str], style_hash: str) -> str:
+    """Cache key (and ETag) of one figure."""
+    parts = (content_hash, kind, player_name or '', style_hash)
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:40]
+
+
+class FigureCache:
+    """Size-bounded LRU directory of rendered PNGs, safe to use from several threads."""
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._rendering = {}  # key -> Event set once the in-progress render finishes
+        self._hashes = OrderedDict()  # file identity -> content hash
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        existing = []
+        for name in os.listdir(self.directory):
+            if name.endswith(FIGURE_SUFFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                existing.append((stat.st_mtime, name[:-len(FIGURE_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + FIGURE_SUFFIX)
+
+    def content_hash(self, file_path: str) -> str:
+        """Content hash of a match file, computed once per file identity."""
+        identity = file_identity(file_path)
+        with self._lock:
+            content_hash = self._hashes.get(identity)
+            if content_hash is not None:
+                self._hashes.move_to_end(identity)
+                return content_hash
+
+        content_hash = hash_file(file_path)
+        with self._lock:
+            self._hashes[identity] = content_hash
+            while len(self._hashes) > _MAX_HASHES:
+                self._hashes.popitem(last=False)
+        return content_hash
+
+    def contains(self, key: str) -> bool:
+        """Whether a figure is cached, without counting a hit or changing its recency."""
+        with self._lock:
+            return key in self._entries
+
+    def get_or_render(self, key: str, render: Callable[[], Optional[bytes]]) -> Optional[BinaryIO]:
+        """
+        Open the cached figure for reading, rendering and storing it on a miss.
+
+        The file is opened while the cache lock is held, so a concurrent
+        eviction can't remove it first (and an evicted file stays readable
+        through the open handle). The caller closes it. Returns None when
+        render returns None (e.g. an unknown player).
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    try:
+                        figure = open(self.path(key), 'rb')
+                    except FileNotFoundError:
+                        # Removed behind our back; forget it and render it again below
+                        self._bytes -= self._entries.pop(key)
+                    else:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        break
+                pending = self._rendering.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._rendering[key] = threading.Event()
+                    figure = None
+                    break
+            # Another thread is rendering this figure; wait for it instead of rendering twice
+            pending.wait()
+
+        if figure is not None:
+            # Record recency on disk so the LRU order survives a restart
+            try:
+                os.utime(figure.fileno())
+            except OSError:
+                pass
+            return figure
+
+        try:
+            png = render()
+            if png is None:
+                return None
+            path = self.path(key)
+            self._write(path, png)
+            with self._lock:
+                self._entries[key] = len(png)
+                self._bytes += len(png)
+                figure = open(path, 'rb')
+                self._evict(keep=key)
+            return figure
+        finally:
+            with self._lock:
+                del self._rendering[key]
+            pending.set()
+
+    def _write(self, path: str, data: bytes):
+        # Write to a temporary file first so readers never see a partial PNG
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _evict(self, keep: Optional[str] = None):
+        # Remove least recently used figures until we are back under budget (callers hold the lock)
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._bytes -= self._entries.pop(key)
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for key in self._entries:
+                try:
+                    os.remove(self.path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current disk usage."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -1,31 +1,79 @@
-import json
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 import numpy as np
-from scipy.ndimage import gaussian_filter
-import base64
-from io import BytesIO
-from typing import Dict, Any, List, Optional
+from typing import BinaryIO, Dict, Any, Callable, List, Optional, Tuple
 import os
-from pyspark.sql import SparkSession
-from pyspark.sql import functions as F
-from pyspark.sql.types import StructType, StructField, StringType, IntegerType, FloatType, ArrayType, MapType
-import json
-import pandas as pd
-import matplotlib
+import threading
+import weakref
+from concurrent.futures import Future
+from backends import AUTO, BACKEND_NAMES, Backend, CostModel, create_backends
+from match_cache import file_identity
+from match_storage import is_match_file
+from figure_cache import figure_key
+from render_executor import RenderExecutor
+from timeline import MinuteTimeline
+from instrumentation import stage, tracing, set_engine, active as instrumentation_active
+import rendering
+
+# matplotlib, scipy and pyspark are imported where they are first needed, so the
+# server and CLI start quickly and Spark is only started for large matches.
+# Figures are drawn by rendering.py from the plain arrays extracted here, and the
+# statistics and filters run on the backend that loaded the match (see backends.py).
+
+# Figures that can be rendered on their own, and the analysis result field holding each one
+FIGURE_KINDS = ('overview', 'home_shots', 'away_shots', 'heatmap')
+FIGURE_FIELDS = {
+    'match_visualization': 'overview',
+    'home_shot_map': 'home_shots',
+    'away_shot_map': 'away_shots',
+    'player_heatmap': 'heatmap'
+}
+
+# Parts of an analysis result that can be requested: statistics, shot coordinates,
+# the player's binned heatmap, and rendered figures (the only output using matplotlib)
+OUTPUTS = ('stats', 'shots', 'heatmap', 'figures')
+DEFAULT_OUTPUTS = ('stats', 'figures')
+
+# Decimal places kept for coordinates, xG and heatmap densities in data outputs
+COORD_DECIMALS = 1
+VALUE_DECIMALS = 3
+
+class AnalysisContext:
+    """Per-call state of one analysis, passed explicitly instead of stored on the analyzer."""
+    
+    def __init__(self, home_team: str, away_team: str):
+        self.home_team = home_team
+        self.away_team = away_team
+    
+    @classmethod
+    def from_details(cls, match_details: Dict[str, Any]) -> 'AnalysisContext':
+        return cls(match_details["home_team"], match_details["away_team"])
+    
+    def is_home(self, team_name: str) -> bool:
+        return team_name == self.home_team
 
 class FootballMatchAnalyzer:
-    def __init__(self):
-        # Initialize Spark session
-        self.spark = SparkSession.builder \
-            .appName("FootballAnalysis") \
-            .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
-            .getOrCreate()
-        # Set log level to reduce verbosity
-        self.spark.sparkContext.setLogLevel("ERROR")
+    def __init__(self, match_cache=None, result_cache=None, figure_cache=None, render_executor=None,
+                 backend: str = AUTO, cost_model: Optional[CostModel] = None):
+        # Optional MatchCache/ResultCache shared by every analysis (see match_cache.py)
+        self.match_cache = match_cache
+        self.result_cache = result_cache
+        # Optional on-disk FigureCache of rendered PNGs (see figure_cache.py)
+        self.figure_cache = figure_cache
+        # Figures render on this RenderExecutor's worker processes (serially in-process by default)
+        self.render_executor = render_executor if render_executor is not None else RenderExecutor(workers=1)
+        
+        # Backends by name; matches load on `backend`, or on the one the cost model
+        # (calibrated with `python backends.py calibrate`) predicts is fastest
+        self.backends = create_backends()
+        self.backend = self.check_backend(backend)
+        self.cost_model = cost_model if cost_model is not None else CostModel.load()
+        
+        # Smoothed heatmap grids of every player, per loaded match and grid size; entries
+        # live exactly as long as the match itself (e.g. until the match cache evicts it)
+        self._player_grids = weakref.WeakKeyDictionary()
+        self._player_grids_lock = threading.Lock()
+        # Per-minute team totals of every loaded match, kept the same way
+        self._timelines = weakref.WeakKeyDictionary()
+        self._timelines_lock = threading.Lock()
         
         # Enhanced visualization settings with better contrast
         self.viz_config = {
@@ -40,7 +88,8 @@ class FootballMatchAnalyzer:
             'text_color': 'white'  # White text for better readability
         }
         
-        # Update config with visualization settings
+        # Update config with visualization settings (read-only once constructed;
+        # per-analysis values such as the team names live in an AnalysisContext)
         self.config = {
             'pitch_color': self.viz_config['pitch_color'],
             'line_color': self.viz_config['line_color'],
@@ -48,264 +97,102 @@ class FootballMatchAnalyzer:
             'away_color': self.viz_config['away_color']
         }
         
-    def load_data(self, file_path: str) -> Dict:
-        """Load StatsBomb JSON data, And using Spark for large files."""
+    @property
+    def spark(self):
+        """Spark session of the Spark backend, started on first use."""
+        return self.backends['spark'].spark
+    
+    def check_backend(self, backend: Optional[str]) -> Optional[str]:
+        """Validate a backend override: None, "auto" or an available backend name."""
+        if backend is None or backend == AUTO:
+            return backend
+        if backend not in self.backends:
+            raise ValueError(f"Unknown backend '{backend}', expected {AUTO} or one of {', '.join(BACKEND_NAMES)}")
+        if not self.backends[backend].available():
+            raise ValueError(f"Backend '{backend}' is not available on this host")
+        return backend
+    
+    def select_backend(self, file_path: str, backend: Optional[str] = None) -> Backend:
+        """The backend that loads file_path: the override if given, else the cost model's choice."""
+        backend = self.check_backend(backend) or self.backend
+        if backend and backend != AUTO:
+            return self.backends[backend]
+        return self.cost_model.choose(file_path, self.backends.values())
+    
+    def backend_for(self, events) -> Backend:
+        """The backend whose representation events are in."""
+        for backend in self.backends.values():
+            if backend.owns(events):
+                return backend
+        raise TypeError(f"No backend handles events of type {type(events).__name__}")
+        
+    def load_data(self, file_path: str, backend: Optional[str] = None):
+        """
+        Load StatsBomb JSON data.
+        
+        The match is loaded by the backend given, or by the analyzer's default
+        backend, or else by the one the cost model predicts is fastest for the
+        file's size: a columnar EventTable (memory-mapping the binary columnar
+        copy saved next to the match when it is up to date), a list of event
+        dicts, or a persisted Spark DataFrame read with the declared StatsBomb
+        schema. Every later stage works on the loaded events directly.
+        """
+        backend = self.check_backend(backend)
         try:
-            # Check file size to determine whether to use Spark Or Pandas.
-            file_size = os.path.getsize(file_path)
-            use_spark = file_size > 10 * 1024 * 1024  # Use Spark for files larger than 10MB
-            
-            if use_spark:
-                # Define schema for StatsBomb data
-                events_schema = self._get_statsbomb_schema()
-                
-                # Read JSON with Spark
-                df = self.spark.read.json(file_path)
-                
-                # Convert to Python objects for compatibility with existing code
-                events = df.rdd.collect()
-                events = [event.asDict() for event in events]
-                return events
-            else:
-                # Use regular Python for smaller files
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                return data
+            return self.select_backend(file_path, backend).load(file_path)
         except Exception as e:
             print(f"Error loading data: {e}")
             return None
-    
-    def _get_statsbomb_schema(self):
-        """Create a simplified schema for StatsBomb data."""
-        # This is a simplified schema - the actual StatsBomb data is more complex
-        # We'll let Spark infer the schema for most parts, but define this for reference
-        return StructType([
-            StructField("id", StringType(), True),
-            StructField("index", IntegerType(), True),
-            StructField("period", IntegerType(), True),
-            StructField("timestamp", StringType(), True),
-            StructField("minute", IntegerType(), True),
-            StructField("second", IntegerType(), True),
-            StructField("type", StructType([
-                StructField("id", IntegerType(), True),
-                StructField("name", StringType(), True)
-            ]), True),
-            StructField("possession", IntegerType(), True),
-            StructField("possession_team", StructType([
-                StructField("id", IntegerType(), True),
-                StructField("name", StringType(), True)
-            ]), True),
-            StructField("team", StructType([
-                StructField("id", IntegerType(), True),
-                StructField("name", StringType(), True)
-            ]), True),
-            StructField("location", ArrayType(FloatType()), True),
-        ])
-        
-    def extract_match_details(self, events: List[Dict]) -> Dict[str, Any]:
+        
+    def extract_match_details(self, events) -> Dict[str, Any]:
         """Extract basic match details (teams, formations)."""
-        # Consider using Spark for this if events is large
-        if len(events) > 10000:  # Arbitrary threshold
-            # Convert to Spark DataFrame
-            events_df = self.spark.createDataFrame(events)
-            
-            # Find unique teams
-            teams_df = events_df.select("team.name").distinct()
-            team_names = [row["name"] for row in teams_df.collect() if row["name"] is not None]
-            
-            if len(team_names) != 2:
-                team_names = ["Team A", "Team B"] if len(team_names) < 2 else team_names[:2]
-                
-            home_team, away_team = team_names
-            
-            # Extract formations from Starting XI events
-            home_formation = "Unknown"
-            away_formation = "Unknown"
-            
-            # Filter for Starting XI events
-            starting_xi_df = events_df.filter(
-                (events_df["type.name"] == "Starting XI") & 
-                events_df["tactics"].isNotNull()
-            )
-            
-            for row in starting_xi_df.collect():
-                team_name = row["team"]["name"] if row["team"] and "name" in row["team"] else None
-                if team_name == home_team and row["tactics"] and "formation" in row["tactics"]:
-                    home_formation = str(row["tactics"]["formation"])
-                elif team_name == away_team and row["tactics"] and "formation" in row["tactics"]:
-                    away_formation = str(row["tactics"]["formation"])
-        else:
-            # Use the original code for smaller datasets
-            # Find unique teams
-            teams = set()
-            for event in events:
-                if 'team' in event and 'name' in event['team'] is not None:
-                    teams.add(event['team']['name'])
-            
-            team_names = list(teams)
-            if len(team_names) != 2:
-                team_names = ["Team A", "Team B"] if len(team_names) < 2 else team_names[:2]
-                
-            home_team, away_team = team_names
-            
-            # Extract formations from Starting XI events
-            home_formation = "Unknown"
-            away_formation = "Unknown"
+        return self.match_details_from(*self.backend_for(events).teams_and_formations(events))
+    
+    @staticmethod
+    def match_details_from(team_names: List[str], formations: Dict[str, str]) -> Dict[str, Any]:
+        """Match details from the teams in order of first appearance and their formations."""
+        # Teams are listed in order of first appearance
+        if len(team_names) != 2:
+            team_names = ["Team A", "Team B"] if len(team_names) < 2 else team_names[:2]
             
-            for event in events:
-                if event.get('type', {}).get('name') == "Starting XI" and 'tactics' in event:
-                    team_name = event.get('team', {}).get('name') if event.get('team', {}).get('name') is not None else None
-                    if team_name == home_team and 'formation' in event['tactics']:
-                        home_formation = str(event['tactics']['formation'])
-                    elif team_name == away_team and 'formation' in event['tactics']:
-                        away_formation = str(event['tactics']['formation'])
+        home_team, away_team = team_names
         
         return {
             "home_team": home_team,
             "away_team": away_team,
-            "home_formation": home_formation,
-            "away_formation": away_formation
+            "home_formation": formations.get(home_team, "Unknown"),
+            "away_formation": formations.get(away_team, "Unknown")
         }
     
-    def calculate_match_stats(self, events: List[Dict], home_team: str, away_team: str) -> Dict[str, Any]:
-        """Calculate key match statistics using PySpark for large datasets."""
-        # Using PySpark for processing if the dataset is large
-        if len(events) > 10000:  # Arbitrary threshold for using Spark
-            # Convert events to DataFrame
-            events_df = self.spark.createDataFrame(events)
-            
-            # Register as temporary view for SQL queries
-            events_df.createOrReplaceTempView("events")
-            
-            # Calculate possession (count of events by possession team)
-            possession_df = self.spark.sql(f"""
-                SELECT 
-                    possession_team.name as team_name, 
-                    COUNT(*) as possession_count 
-                FROM events 
-                WHERE possession_team.name IS NOT NULL
-                GROUP BY possession_team.name
-            """)
-            
-            # Get possession counts
-            possession_counts = {row["team_name"]: row["possession_count"] 
-                               for row in possession_df.collect()}
-            
-            total_events = len(events)
-            home_possession = possession_counts.get(home_team, 0)
-            away_possession = possession_counts.get(away_team, 0)
-            
-            # Calculate passes and pass completion
-            passes_df = self.spark.sql(f"""
-                SELECT 
-                    team.name as team_name,
-                    COUNT(*) as passes,
-                    SUM(CASE WHEN pass.outcome IS NULL THEN 1 ELSE 0 END) as completed_passes
-                FROM events
-                WHERE type.name = 'Pass' AND team.name IS NOT NULL
-                GROUP BY team.name
-            """)
-            
-            # Get pass statistics
-            pass_stats = {row["team_name"]: {"passes": row["passes"], "completed": row["completed_passes"]} 
-                         for row in passes_df.collect()}  
-            #To return the teams passes as a one dictionary
-            # Like this {home_team: {"passes": 0, "completed": 0}, away_team: {"passes": 0, "completed": 0}}
-
-            home_passes = pass_stats.get(home_team, {"passes": 0, "completed": 0})["passes"]
-            away_passes = pass_stats.get(away_team, {"passes": 0, "completed": 0})["passes"]
-            home_completed_passes = pass_stats.get(home_team, {"passes": 0, "completed": 0})["completed"]
-            away_completed_passes = pass_stats.get(away_team, {"passes": 0, "completed": 0})["completed"]
-            
-            # Calculate shots and goals
-            shots_df = self.spark.sql(f"""
-                SELECT 
-                    team.name as team_name,
-                    COUNT(*) as shots,
-                    SUM(CASE WHEN shot.outcome.name = 'Goal' THEN 1 ELSE 0 END) as goals,
-                    SUM(COALESCE(shot.statsbomb_xg, 0)) as xg
-                FROM events
-                WHERE type.name = 'Shot' AND team.name IS NOT NULL
-                GROUP BY team.name
-            """)
-            
-            # Get shot statistics
-            shot_stats = {row["team_name"]: {"shots": row["shots"], "goals": row["goals"], "xg": row["xg"]} 
-                         for row in shots_df.collect()}
-            
-            home_shots = shot_stats.get(home_team, {"shots": 0, "goals": 0, "xg": 0.0})["shots"]
-            away_shots = shot_stats.get(away_team, {"shots": 0, "goals": 0, "xg": 0.0})["shots"]
-            home_goals = shot_stats.get(home_team, {"shots": 0, "goals": 0, "xg": 0.0})["goals"]
-            away_goals = shot_stats.get(away_team, {"shots": 0, "goals": 0, "xg": 0.0})["goals"]
-            home_xg = shot_stats.get(home_team, {"shots": 0, "goals": 0, "xg": 0.0})["xg"]
-            away_xg = shot_stats.get(away_team, {"shots": 0, "goals": 0, "xg": 0.0})["xg"]
-        else:
-            # Use original implementation for smaller datasets
-            # Initialize counters
-            total_events = len(events)
-            home_possession = 0
-            away_possession = 0
-            home_passes = 0
-            away_passes = 0
-            home_completed_passes = 0
-            away_completed_passes = 0
-            home_shots = 0
-            away_shots = 0
-            home_goals = 0
-            away_goals = 0
-            home_xg = 0.0
-            away_xg = 0.0
-            
-            # Process events
-            for event in events:
-                # Count possession
-                possession_team = event.get('possession_team', {}).get('name')
-                if possession_team == home_team:
-                    home_possession += 1
-                elif possession_team == away_team:
-                    away_possession += 1
-                    
-                # Process by event type
-                event_type = event.get('type', {}).get('name')
-                team_name = event.get('team', {}).get('name')
-                
-                if event_type == 'Pass' and team_name:
-                    # Count passes
-                    if team_name == home_team:
-                        home_passes += 1
-                        if 'outcome' not in event.get('pass', {}):
-                            home_completed_passes += 1
-                    elif team_name == away_team:
-                        away_passes += 1
-                        if 'outcome' not in event.get('pass', {}):
-                            away_completed_passes += 1
-                
-                elif event_type == 'Shot' and team_name:
-                    # Count shots and goals
-                    if team_name == home_team:
-                        home_shots += 1
-                        if event.get('shot', {}).get('outcome', {}).get('name') == 'Goal':
-                            home_goals += 1
-                        home_xg += event.get('shot', {}).get('statsbomb_xg', 0)
-                    elif team_name == away_team:
-                        away_shots += 1
-                        if event.get('shot', {}).get('outcome', {}).get('name') == 'Goal':
-                            away_goals += 1
-                        away_xg += event.get('shot', {}).get('statsbomb_xg', 0)
+    def calculate_match_stats(self, events, home_team: str, away_team: str) -> Dict[str, Any]:
+        """Calculate key match statistics from the per-team totals of the match's backend."""
+        total_events, team_counts = self.backend_for(events).team_counts(events)
+        return self.match_stats_from(total_events, team_counts, home_team, away_team)
+    
+    @staticmethod
+    def match_stats_from(total_events: int, team_counts: Dict[str, Dict[str, Any]],
+                         home_team: str, away_team: str) -> Dict[str, Any]:
+        """Match statistics from the event total and per-team totals of ``Backend.team_counts``."""
+        empty = {"possession": 0, "passes": 0, "completed": 0, "shots": 0, "goals": 0, "xg": 0.0}
+        home = team_counts.get(home_team, empty)
+        away = team_counts.get(away_team, empty)
         
         # Calculate percentages
-        home_possession_pct = round(home_possession / total_events * 100, 1) if total_events > 0 else 50
-        away_possession_pct = round(away_possession / total_events * 100, 1) if total_events > 0 else 50
+        home_possession_pct = round(home["possession"] / total_events * 100, 1) if total_events > 0 else 50
+        away_possession_pct = round(away["possession"] / total_events * 100, 1) if total_events > 0 else 50
         
         # Ensure they sum to 100%
         total = home_possession_pct + away_possession_pct
-        if total != 100:
+        if total == 0:
+            # No events in either team's possession yet (e.g. the first events of a live match)
+            home_possession_pct = away_possession_pct = 50
+        elif total != 100:
             home_possession_pct = round(home_possession_pct * 100 / total, 1)
             away_possession_pct = round(100 - home_possession_pct, 1)
         
         # Calculate pass completion percentages
-        home_pass_completion = round(home_completed_passes / home_passes * 100, 1) if home_passes > 0 else 0
-        away_pass_completion = round(away_completed_passes / away_passes * 100, 1) if away_passes > 0 else 0
+        home_pass_completion = round(home["completed"] / home["passes"] * 100, 1) if home["passes"] > 0 else 0
+        away_pass_completion = round(away["completed"] / away["passes"] * 100, 1) if away["passes"] > 0 else 0
         
         return {
             "possession": {
@@ -313,471 +200,253 @@ class FootballMatchAnalyzer:
                 "away": away_possession_pct
             },
             "passes": {
-                "home": home_passes, 
-                "away": away_passes,
+                "home": home["passes"], 
+                "away": away["passes"],
+                "home_completed": home["completed"],
+                "away_completed": away["completed"],
                 "home_completion": home_pass_completion,
                 "away_completion": away_pass_completion
             },
             "shots": {
-                "home": home_shots, 
-                "away": away_shots
+                "home": home["shots"], 
+                "away": away["shots"]
             },
             "goals": {
-                "home": home_goals, 
-                "away": away_goals
+                "home": home["goals"], 
+                "away": away["goals"]
             },
             "xg": {
-                "home": round(home_xg, 2), 
-                "away": round(away_xg, 2)
+                "home": round(home["xg"], 2), 
+                "away": round(away["xg"], 2)
             }
         }
     
-    def get_player_stats(self, events: List[Dict], team_name: str) -> List[Dict]:
-        """Extract player-level statistics using PySpark for large datasets."""
-        # Use Spark for large datasets
-        if len(events) > 10000:  # Arbitrary threshold
-            # Convert to Spark DataFrame
-            events_df = self.spark.createDataFrame(events)
-            events_df.createOrReplaceTempView("events")
-            
-            # Find players from starting XI
-            lineup_df = self.spark.sql(f"""
-                SELECT 
-                    tactics.lineup 
-                FROM events
-                WHERE type.name = 'Starting XI' 
-                AND team.name = '{team_name}'
-                AND tactics.lineup IS NOT NULL
-                LIMIT 1
-            """)
-            
-            # Check if we found the lineup
-            if lineup_df.count() > 0:
-                # Extract player info from lineup
-                lineup_row = lineup_df.collect()[0]
-                if "lineup" in lineup_row and lineup_row["lineup"]:
-                    player_info = {}
-                    for player in lineup_row["lineup"]:
-                        player_name = player.get("player", {}).get("name")
-                        if player_name:
-                            player_info[player_name] = {
-                                'player_name': player_name,
-                                'position': player.get("position", {}).get("name", ""),
-                                'jersey': player.get("jersey_number", 0),
-                                'passes': 0,
-                                'successful_passes': 0,
-                                'pass_completion': 0,
-                                'shots': 0,
-                                'goals': 0,
-                                'xg': 0.0
-                            }
-                    
-                    # Get pass statistics
-                    pass_stats_df = self.spark.sql(f"""
-                        SELECT 
-                            player.name as player_name,
-                            COUNT(*) as passes,
-                            SUM(CASE WHEN pass.outcome IS NULL THEN 1 ELSE 0 END) as completed_passes
-                        FROM events
-                        WHERE type.name = 'Pass' 
-                        AND team.name = '{team_name}'
-                        AND player.name IS NOT NULL
-                        GROUP BY player.name
-                    """)
-                    
-                    # Update player info with pass statistics
-                    for row in pass_stats_df.collect():
-                        player_name = row["player_name"]
-                        if player_name in player_info:
-                            player_info[player_name]["passes"] = row["passes"]
-                            player_info[player_name]["successful_passes"] = row["completed_passes"]
-                    
-                    # Get shot statistics
-                    shot_stats_df = self.spark.sql(f"""
-                        SELECT 
-                            player.name as player_name,
-                            COUNT(*) as shots,
-                            SUM(CASE WHEN shot.outcome.name = 'Goal' THEN 1 ELSE 0 END) as goals,
-                            SUM(COALESCE(shot.statsbomb_xg, 0)) as xg
-                        FROM events
-                        WHERE type.name = 'Shot' 
-                        AND team.name = '{team_name}'
-                        AND player.name IS NOT NULL
-                        GROUP BY player.name
-                    """)
-                    
-                    # Update player info with shot statistics
-                    for row in shot_stats_df.collect():
-                        player_name = row["player_name"]
-                        if player_name in player_info:
-                            player_info[player_name]["shots"] = row["shots"]
-                            player_info[player_name]["goals"] = row["goals"]
-                            player_info[player_name]["xg"] = row["xg"]
-                    
-                    # Calculate pass completion percentages
-                    for player_name, stats in player_info.items():
-                        if stats["passes"] > 0:
-                            stats["pass_completion"] = round(stats["successful_passes"] / stats["passes"] * 100, 1)
-                        stats["xg"] = round(stats["xg"], 2)  # Round xG
-                    
-                    return list(player_info.values())
-            
-            # If we couldn't get the lineup or process with Spark, fall back to the original method
-        
-        # Original method for smaller datasets or if Spark processing failed
-        # Get player info from starting XI
-        player_info = {}
-        
-        # Find the starting XI event for this team
-        for event in events:
-            if event.get('type', {}).get('name') == "Starting XI" and event.get('team', {}).get('name') == team_name:
-                if 'tactics' in event and 'lineup' in event['tactics']:
-                    for player in event['tactics']['lineup']:
-                        player_name = player.get('player', {}).get('name', '')
-                        if player_name:
-                            player_info[player_name] = {
-                                'player_name': player_name,
-                                'position': player.get('position', {}).get('name', ''),
-                                'jersey': player.get('jersey_number', 0),
-                                'passes': 0,
-                                'successful_passes': 0,
-                                'pass_completion': 0,
-                                'shots': 0,
-                                'goals': 0,
-                                'xg': 0.0
-                            }
-        
-        # Process individual events
-        for event in events:
-            if event.get('team', {}).get('name') != team_name:
-                continue
-                
-            player_name = event.get('player', {}).get('name')
-            if not player_name or player_name not in player_info:
-                continue
-                
-            event_type = event.get('type', {}).get('name')
-            
-            if event_type == 'Pass':
-                player_info[player_name]['passes'] += 1
-                if 'outcome' not in event.get('pass', {}):
-                    player_info[player_name]['successful_passes'] += 1
-            
-            elif event_type == 'Shot':
-                player_info[player_name]['shots'] += 1
-                if event.get('shot', {}).get('outcome', {}).get('name') == 'Goal':
-                    player_info[player_name]['goals'] += 1
-                player_info[player_name]['xg'] += event.get('shot', {}).get('statsbomb_xg', 0)
-        
-        # Calculate pass completion percentages
-        for player_name, stats in player_info.items():
+    def get_player_stats(self, events, team_name: str) -> List[Dict]:
+        """Extract player-level statistics for the team's Starting XI."""
+        return self.player_stats_from(*self.backend_for(events).player_counts(events, team_name))
+    
+    @staticmethod
+    def player_stats_from(lineup: List[Dict[str, Any]], player_counts: Dict[str, Dict[str, Any]]) -> List[Dict]:
+        """Player table rows from a team's lineup and per-player totals of ``Backend.player_counts``."""
+        player_stats = []
+        for player in lineup:
+            counts = player_counts.get(player['player_name'], {})
+            stats = dict(player)
+            stats.update({
+                'passes': counts.get('passes', 0),
+                'successful_passes': counts.get('successful_passes', 0),
+                'pass_completion': 0,
+                'shots': counts.get('shots', 0),
+                'goals': counts.get('goals', 0),
+                'xg': counts.get('xg', 0.0)
+            })
+            
+            # Calculate pass completion percentage
             if stats['passes'] > 0:
                 stats['pass_completion'] = round(stats['successful_passes'] / stats['passes'] * 100, 1)
             stats['xg'] = round(stats['xg'], 2)  # Round xG to 2 decimal places
+            player_stats.append(stats)
+        
+        return player_stats
+    
+    def _player_locations(self, events, player_name: str, team_name: str):
+        """x/y arrays of a player's events that carry location data."""
+        return self.backend_for(events).player_locations(events, player_name, team_name)
+    
+    def _team_shots(self, events, team_name: str):
+        """x, y, xG and goal-flag arrays of a team's shots that carry location data."""
+        return self.backend_for(events).team_shots(events, team_name)
+    
+    def player_grids(self, events,
+                     bins: Tuple[int, int] = rendering.HEATMAP_BINS) -> Dict[Tuple[str, str], Tuple[np.ndarray, int]]:
+        """
+        Smoothed heatmap grid and located event count of every (team, player) pair.
+        
+        All pairs are binned in one grouped ``np.bincount`` pass and smoothed in one
+        batched filter, instead of one scan, histogram and filter per player. The
+        result is computed once per match and grid size and reused while the match
+        is loaded; grids are identical to ``rendering.heatmap_grid`` of the player's
+        locations.
+        """
+        bins = (int(bins[0]), int(bins[1]))
+        with self._player_grids_lock:
+            cached = self._player_grids.get(events, {}).get(bins)
+        if cached is not None:
+            return cached
+        
+        extent = (rendering.PITCH_LENGTH, rendering.PITCH_WIDTH)
+        pairs, events_per_pair, counts = self.backend_for(events).player_location_counts(events, bins, extent)
+        
+        grids = rendering.smooth_grids(counts)
+        result = {pair: (grids[i], int(events_per_pair[i])) for i, pair in enumerate(pairs)}
+        with self._player_grids_lock:
+            self._player_grids.setdefault(events, {})[bins] = result
+        return result
+    
+    def player_grid(self, events, player_name: str, team_name: str,
+                    bins: Tuple[int, int] = rendering.HEATMAP_BINS) -> np.ndarray:
+        """A player's smoothed heatmap grid from the precomputed grids (all zeros without located events)."""
+        entry = self.player_grids(events, bins).get((team_name, player_name))
+        return entry[0] if entry is not None else np.zeros(bins)
+    
+    def player_grids_data(self, file_path: str, player_names: Optional[List[str]] = None,
+                          team_name: Optional[str] = None,
+                          bins: Tuple[int, int] = rendering.HEATMAP_BINS) -> Optional[Dict[str, Any]]:
+        """
+        Precomputed heatmap grids of a match's players as compact JSON-ready data.
+        
+        Returns every player with located events, or only the given players and/or
+        team, in the layout of ``heatmap_data``; None if the match can't be loaded.
+        """
+        events = self._load_events(file_path)
+        if events is None:
+            return None
+        players = [self.grid_data(team, player, grid, count)
+                   for (team, player), (grid, count) in self.player_grids(events, bins).items()
+                   if not (player_names and player not in player_names) and not (team_name and team != team_name)]
+        return {
+            "pitch": [rendering.PITCH_LENGTH, rendering.PITCH_WIDTH],
+            "bins": list(bins),
+            "players": players
+        }
+    
+    def minute_timeline(self, events) -> MinuteTimeline:
+        """
+        Per-minute possession, pass, shot and xG totals of both teams.
+        
+        Binned in one vectorized pass and summed cumulatively once per match, so
+        series of any window size are served from the cumulative sums.
+        """
+        with self._timelines_lock:
+            cached = self._timelines.get(events)
+        if cached is not None:
+            return cached
+        
+        timeline = self.backend_for(events).minute_timeline(events)
+        with self._timelines_lock:
+            self._timelines[events] = timeline
+        return timeline
+    
+    def timeline_data(self, events, home_team: str, away_team: str, window: int = 1) -> Dict[str, Any]:
+        """
+        Both teams' statistics per window of `window` minutes as parallel arrays.
+        
+        Windows start at each period's first minute and cover the minutes
+        ``[start_minute, end_minute)``. Possession is the team's share of the
+        events in possession during the window (None when there were none).
+        """
+        timeline = self.minute_timeline(events)
+        periods, start_minutes, starts, ends = timeline.windows(window)
+        series = {side: timeline.series(team, window) for side, team in (("home", home_team), ("away", away_team))}
+        in_possession = series["home"]["possession"] + series["away"]["possession"]
+        
+        def side_data(side, team_name):
+            values = series[side]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                share = np.round(100.0 * values["possession"] / in_possession, 1)
+            return {
+                "team": team_name,
+                "possession": [None if np.isnan(value) else float(value) for value in share],
+                "passes": values["passes"].tolist(),
+                "completed": values["completed"].tolist(),
+                "shots": values["shots"].tolist(),
+                "xg": self._rounded(values["xg"], VALUE_DECIMALS),
+                "cumulative_xg": self._rounded(values["cumulative_xg"], VALUE_DECIMALS)
+            }
         
-        return list(player_info.values())
+        return {
+            "window": window,
+            "period": periods.tolist(),
+            "start_minute": start_minutes.tolist(),
+            "end_minute": (start_minutes + (ends - starts)).tolist(),
+            "home": side_data("home", home_team),
+            "away": side_data("away", away_team)
+        }
+    
+    def match_timeline(self, file_path: str, window: int = 1) -> Optional[Dict[str, Any]]:
+        """``timeline_data`` of a match file; None if the match can't be loaded."""
+        events = self._load_events(file_path)
+        if events is None:
+            return None
+        match_result = self._match_result(file_path, lambda: events)
+        match_details = match_result["match_details"]
+        return self.timeline_data(events, match_details["home_team"], match_details["away_team"], window)
+    
+    @classmethod
+    def grid_data(cls, team_name: str, player_name: str, grid: np.ndarray, count: int) -> Dict[str, Any]:
+        """One player's smoothed grid and located event count in the layout of ``player_grids_data``."""
+        return {
+            "player": player_name,
+            "team": team_name,
+            "events": int(count),
+            "grid": cls._rounded(grid, VALUE_DECIMALS),
+            "max": round(float(grid.max()), VALUE_DECIMALS) if grid.size else 0.0
+        }
+    
+    @staticmethod
+    def _rounded(values: np.ndarray, decimals: int) -> List[float]:
+        # float32 coordinates are widened first so the JSON holds e.g. 86.1, not 86.0999984741211
+        return np.round(np.asarray(values, dtype=np.float64), decimals).tolist()
+    
+    def shot_data(self, events, team_name: str) -> Dict[str, Any]:
+        """A team's shots as compact parallel arrays (x, y, xG, goal flag) for client-side drawing."""
+        shot_x, shot_y, shot_xg, shot_goal = self._team_shots(events, team_name)
+        return {
+            "team": team_name,
+            "x": self._rounded(shot_x, COORD_DECIMALS),
+            "y": self._rounded(shot_y, COORD_DECIMALS),
+            "xg": self._rounded(shot_xg, VALUE_DECIMALS),
+            "goal": shot_goal.astype(np.int8).tolist()
+        }
+    
+    def heatmap_data(self, events, player_name: str, team_name: str) -> Dict[str, Any]:
+        """
+        A player's event locations and the smoothed density grid the heatmap figure is drawn from.
+        
+        ``grid[i][j]`` covers the i-th of ``bins[0]`` columns along the pitch length
+        and the j-th of ``bins[1]`` rows across its width, starting at (0, 0).
+        """
+        x_coords, y_coords = self._player_locations(events, player_name, team_name)
+        grid = self.player_grid(events, player_name, team_name)
+        return {
+            "player": player_name,
+            "team": team_name,
+            "pitch": [rendering.PITCH_LENGTH, rendering.PITCH_WIDTH],
+            "bins": list(grid.shape),
+            "grid": self._rounded(grid, VALUE_DECIMALS),
+            "max": round(float(grid.max()), VALUE_DECIMALS) if grid.size else 0.0,
+            "x": self._rounded(x_coords, COORD_DECIMALS),
+            "y": self._rounded(y_coords, COORD_DECIMALS)
+        }
     
     def create_match_visualization(self, match_details: Dict, match_stats: Dict) -> str:
         """Create a simple visualization of match statistics"""
-        home_team = match_details["home_team"]
-        away_team = match_details["away_team"]
-        
-        # Create figure
-        plt.figure(figsize=(10, 6))
-        ax = plt.subplot(1, 1, 1)
-        
-        # Set background color
-        ax.set_facecolor('#f8f9fa')
-        
-        # Add match score
-        plt.text(0.5, 0.85, 
-                f"{home_team} {match_stats['goals']['home']} - {match_stats['goals']['away']} {away_team}",
-                fontsize=18, weight='bold', ha='center', transform=ax.transAxes)
-        
-        # Add formations
-        plt.text(0.5, 0.75, 
-                f"Formations: {match_details['home_formation']} vs {match_details['away_formation']}",
-                fontsize=14, ha='center', transform=ax.transAxes)
-        
-        # Add key stats
-        stats = [
-            ("Possession", f"{match_stats['possession']['home']}%", f"{match_stats['possession']['away']}%", 0.65),
-            ("Shots", str(match_stats['shots']['home']), str(match_stats['shots']['away']), 0.55),
-            ("Expected Goals (xG)", f"{match_stats['xg']['home']}", f"{match_stats['xg']['away']}", 0.45),
-            ("Total Passes", str(match_stats['passes']['home']), str(match_stats['passes']['away']), 0.35),
-            ("Pass Completion", f"{match_stats['passes']['home_completion']}%", f"{match_stats['passes']['away_completion']}%", 0.25)
-        ]
-        
-        # Draw stats
-        for label, home_val, away_val, y_pos in stats:
-            plt.text(0.5, y_pos, label, fontsize=12, ha='center', transform=ax.transAxes)
-            plt.text(0.3, y_pos - 0.05, home_val, fontsize=12, ha='center', transform=ax.transAxes, 
-                    color=self.config['home_color'])
-            plt.text(0.7, y_pos - 0.05, away_val, fontsize=12, ha='center', transform=ax.transAxes, 
-                    color=self.config['away_color'])
-        
-        # Add legend
-        plt.legend(handles=[
-            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor=self.config['home_color'], 
-                    markersize=10, label=home_team),
-            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor=self.config['away_color'], 
-                    markersize=10, label=away_team)
-        ], loc='lower center')
-        
-        # Remove axes
-        plt.axis('off')
-        
-        # Save figure as base64 for HTML embedding
-        with BytesIO() as buffer:
-            plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-            plt.close()
-            return base64.b64encode(buffer.getvalue()).decode('utf-8')
-    
-    def create_player_heatmap(self, events: List[Dict], player_name: str, team_name: str) -> str:
+        return rendering.png_to_base64(rendering.render_match_overview(match_details, match_stats, self.viz_config))
+    
+    def create_player_heatmap(self, events, player_name: str, team_name: str,
+                              context: Optional[AnalysisContext] = None) -> str:
         """Create a heatmap showing the positions of a specific player on the pitch."""
-        # Use Spark to filter events for large datasets
-        if len(events) > 10000:
-            # Convert to Spark DataFrame
-            events_df = self.spark.createDataFrame(events)
-            
-            # Filter for player events with location data
-            player_events_df = events_df.filter(
-                (events_df["player.name"] == player_name) & 
-                (events_df["team.name"] == team_name) &
-                events_df["location"].isNotNull()
-            )
-            
-            # Convert back to Python for visualization
-            player_events = [event.asDict() for event in player_events_df.collect()]
-        else:
-            # Use original implementation for smaller datasets
-            # Filter events for the specific player
-            player_events = []
-            for event in events:
-                if (event.get('player', {}).get('name') == player_name and 
-                    event.get('team', {}).get('name') == team_name and
-                    'location' in event):
-                    player_events.append(event)
-        
-        if not player_events:
-            # If no events found, create empty visualization with a message
-            plt.figure(figsize=(10, 7), facecolor=self.viz_config['pitch_color'])
-            ax = plt.subplot(1, 1, 1)
-            self.draw_pitch(ax)
-            plt.text(60, 40, f"No position data for {player_name}", 
-                     ha='center', va='center', color=self.viz_config['text_color'], fontsize=16)
-            
-            # Save figure as base64 for HTML embedding
-            with BytesIO() as buffer:
-                plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight', facecolor=self.viz_config['pitch_color'])
-                plt.close()
-                return base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        # Extract x, y coordinates
-        x_coords = []
-        y_coords = []
-        for event in player_events:
-            if isinstance(event['location'], list) and len(event['location']) >= 2:
-                x_coords.append(event['location'][0])
-                y_coords.append(event['location'][1])
-        
-        # Create figure
-        plt.figure(figsize=(10, 7), facecolor=self.viz_config['pitch_color'])
-        ax = plt.subplot(1, 1, 1)
-        
-        # Draw the football pitch
-        self.draw_pitch(ax)
-        
-        # Add title
-        plt.title(f"{player_name} - Position Heatmap", color=self.viz_config['text_color'], fontsize=16, fontweight='bold')
-        
-        # If we have enough points, create a heatmap
-        if len(x_coords) > 5:
-            # Create a 2D histogram
-            heatmap, xedges, yedges = np.histogram2d(
-                x_coords, y_coords, bins=(12, 8), 
-                range=[[0, 120], [0, 80]]
-            )
-            
-            # Smooth the heatmap
-            heatmap = gaussian_filter(heatmap, sigma=1.5)
-            
-            # Create event coordinates for contourf plotting
-            x_pos, y_pos = np.meshgrid(
-                np.linspace(0, 120, heatmap.shape[0]),
-                np.linspace(0, 80, heatmap.shape[1])
-            )
-            
-            # Use better colormaps for the heatmap based on team
-            cmap = self.viz_config['heatmap_home_cmap'] if team_name == self.config['home_team'] else self.viz_config['heatmap_away_cmap']
-            
-            # Plot the heatmap with enhanced colors
-            contour = ax.contourf(
-                x_pos, y_pos, heatmap.T, 
-                cmap=cmap,
-                alpha=0.75, levels=20
-            )
-            
-            # Add colorbar with better styling
-            cbar = plt.colorbar(contour, ax=ax)
-            cbar.set_label('Event Density', color=self.viz_config['text_color'])
-            cbar.ax.yaxis.set_tick_params(color=self.viz_config['text_color'])
-            plt.setp(plt.getp(cbar.ax, 'yticklabels'), color=self.viz_config['text_color'])
-        else:
-            # If not enough points, just scatter plot them
-            team_color = self.viz_config['home_color'] if team_name == self.config['home_team'] else self.viz_config['away_color']
-            ax.scatter(x_coords, y_coords, c=team_color, s=100, alpha=0.7, edgecolors='white')
-            
-            plt.text(60, 10, f"Limited data points ({len(x_coords)})", 
-                     ha='center', va='center', color=self.viz_config['text_color'], fontsize=10)
-        
-        # Plot event points
-        team_color = self.viz_config['home_color'] if team_name == self.config['home_team'] else self.viz_config['away_color']
-        ax.scatter(x_coords, y_coords, c=team_color, s=30, alpha=0.5, edgecolors='white')
-                   
-        # Add player info
-        plt.figtext(0.5, 0.02, f"Events: {len(player_events)} | Team: {team_name}",
-                    ha="center", color=self.viz_config['text_color'], fontsize=12)
-                    
-        # Save figure as base64 for HTML embedding with better background
-        with BytesIO() as buffer:
-            plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight', 
-                       facecolor=self.viz_config['pitch_color'], edgecolor='none')
-            plt.close()
-            return base64.b64encode(buffer.getvalue()).decode('utf-8')
+        # Team colors depend on whether the player's team is at home
+        if context is None:
+            context = AnalysisContext.from_details(self.extract_match_details(events))
+        
+        # Select the player's events that carry location data
+        x_coords, y_coords = self._player_locations(events, player_name, team_name)
+        png = rendering.render_player_heatmap(player_name, team_name, x_coords, y_coords,
+                                              context.is_home(team_name), self.viz_config,
+                                              self.player_grid(events, player_name, team_name))
+        return rendering.png_to_base64(png)
     
     def draw_pitch(self, ax):
         """Draw a football pitch on the matplotlib axis."""
-        pitch_length, pitch_width = 120, 80
-        ax.set_facecolor(self.config['pitch_color'])
-        
-        # Draw the outline
-        ax.plot([0, 0, pitch_length, pitch_length, 0], 
-                [0, pitch_width, pitch_width, 0, 0], 
-                color=self.config['line_color'])
-        
-        # Draw halfway line
-        ax.plot([pitch_length/2, pitch_length/2], 
-                [0, pitch_width], 
-                color=self.config['line_color'])
-        
-        # Draw center circle
-        center_circle = plt.Circle((pitch_length/2, pitch_width/2), 9.15, 
-                             color=self.config['line_color'], fill=False)
-        ax.add_patch(center_circle)
-        
-        # Draw center spot
-        center_spot = plt.Circle((pitch_length/2, pitch_width/2), 0.5, 
-                           color=self.config['line_color'])
-        ax.add_patch(center_spot)
-        
-        # Draw penalty areas
-        ax.plot([16.5, 16.5], [24, 56], color=self.config['line_color'])
-        ax.plot([0, 16.5], [24, 24], color=self.config['line_color'])
-        ax.plot([0, 16.5], [56, 56], color=self.config['line_color'])
-        
-        ax.plot([pitch_length-16.5, pitch_length-16.5], [24, 56], color=self.config['line_color'])
-        ax.plot([pitch_length, pitch_length-16.5], [24, 24], color=self.config['line_color'])
-        ax.plot([pitch_length, pitch_length-16.5], [56, 56], color=self.config['line_color'])
-        
-        # Draw goal areas
-        ax.plot([5.5, 5.5], [36, 44], color=self.config['line_color'])
-        ax.plot([0, 5.5], [36, 36], color=self.config['line_color'])
-        ax.plot([0, 5.5], [44, 44], color=self.config['line_color'])
-        
-        ax.plot([pitch_length-5.5, pitch_length-5.5], [36, 44], color=self.config['line_color'])
-        ax.plot([pitch_length, pitch_length-5.5], [36, 36], color=self.config['line_color'])
-        ax.plot([pitch_length, pitch_length-5.5], [44, 44], color=self.config['line_color'])
-        
-        # Draw penalty spots
-        penalty_spot1 = plt.Circle((11, pitch_width/2), 0.5, color=self.config['line_color'])
-        penalty_spot2 = plt.Circle((pitch_length-11, pitch_width/2), 0.5, color=self.config['line_color'])
-        ax.add_patch(penalty_spot1)
-        ax.add_patch(penalty_spot2)
-        
-        # Set limits and hide axes
-        ax.set_xlim(-5, pitch_length+5)
-        ax.set_ylim(-5, pitch_width+5)
-        ax.axis('off')
-        
-        return ax
-    
-    def create_shot_map(self, events: List[Dict], team_name: str) -> str:
+        return rendering.draw_pitch(ax, self.config['pitch_color'], self.config['line_color'])
+    
+    def create_shot_map(self, events, team_name: str) -> str:
         """Create a shot map visualization for a team."""
-        # Use Spark for large datasets
-        if len(events) > 10000:
-            # Convert to Spark DataFrame
-            events_df = self.spark.createDataFrame(events)
-            
-            # Filter for shots by the team
-            shot_events_df = events_df.filter(
-                (events_df["type.name"] == "Shot") & 
-                (events_df["team.name"] == team_name) &
-                events_df["location"].isNotNull()
-            )
-            
-            # Convert back to Python for visualization
-            shots = [event.asDict() for event in shot_events_df.collect()]
-        else:
-            # Use original implementation for smaller datasets
-            # Filter shot events for the team
-            shots = []
-            for event in events:
-                if (event.get('type', {}).get('name') == 'Shot' and 
-                    event.get('team', {}).get('name') == team_name and
-                    'location' in event):
-                    shots.append(event)
-                
-        # Create figure with enhanced background
-        plt.figure(figsize=(10, 7), facecolor=self.viz_config['pitch_color'])
-        ax = plt.subplot(1, 1, 1)
-        
-        # Draw the football pitch
-        self.draw_pitch(ax)
-        
-        # Add title with enhanced styling
-        plt.title(f"{team_name} - Shot Map", color=self.viz_config['text_color'], 
-                 fontsize=16, fontweight='bold')
-        
-        # Add shots to the plot with enhanced colors
-        for shot in shots:
-            x, y = shot['location'][0], shot['location'][1]
-            is_goal = shot.get('shot', {}).get('outcome', {}).get('name') == 'Goal'
-            xg = shot.get('shot', {}).get('statsbomb_xg', 0)
-            
-            # Size based on xG (slightly larger for better visibility)
-            size = 120 + (xg * 1000)
-            
-            # Color based on outcome with enhanced colors
-            color = self.viz_config['shot_goal_color'] if is_goal else self.viz_config['shot_miss_color']
-            
-            # Plot the shot with white border for better visibility
-            ax.scatter(x, y, s=size, alpha=0.8, color=color, edgecolors='white', linewidths=1.5)
-            
-            # Add xG label if significant with improved visibility
-            if xg > 0.1:
-                plt.text(x, y, f"{xg:.2f}", ha='center', va='center', 
-                         color='white', fontsize=9, fontweight='bold')
-                
-        # Add legend with enhanced styling
-        goal_marker = plt.Line2D([0], [0], marker='o', color='w', markerfacecolor=self.viz_config['shot_goal_color'], 
-                                markersize=10, label='Goal')
-        miss_marker = plt.Line2D([0], [0], marker='o', color='w', markerfacecolor=self.viz_config['shot_miss_color'], 
-                                markersize=10, label='No Goal')
-        legend = ax.legend(handles=[goal_marker, miss_marker], loc='lower center')
-        plt.setp(legend.get_texts(), color=self.viz_config['text_color'])
-        
-        # Add shot count with enhanced styling
-        goals = sum(1 for s in shots if s.get('shot', {}).get('outcome', {}).get('name') == 'Goal')
-        plt.figtext(0.5, 0.02, f"Total Shots: {len(shots)} | Goals: {goals}",
-                    ha="center", color=self.viz_config['text_color'], fontsize=12)
-                    
-        # Save figure as base64 for HTML embedding with enhanced background
-        with BytesIO() as buffer:
-            plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight',
-                       facecolor=self.viz_config['pitch_color'], edgecolor='none')
-            plt.close()
-            return base64.b64encode(buffer.getvalue()).decode('utf-8')
+        # Filter shot events for the team
+        shot_x, shot_y, shot_xg, shot_goal = self._team_shots(events, team_name)
+        png = rendering.render_shot_map(team_name, shot_x, shot_y, shot_xg, shot_goal, self.viz_config)
+        return rendering.png_to_base64(png)
     
     def get_player_summary(self, player_stats: List[Dict]) -> str:
         """Create a simple text summary of player performance."""
@@ -806,90 +475,352 @@ class FootballMatchAnalyzer:
             
         return "\n".join(summary) if summary else "No significant statistics to highlight."
         
-    def analyze_match(self, file_path: str, player_name: str = None):
-        """Perform complete match analysis and return results."""
-        # Load data
-        events = self.load_data(file_path)
-        if events is None:
-            return {"error": "Failed to load match data."}
-            
+    def _stage_info(self, events) -> Tuple[str, Optional[int]]:
+        """Backend name and event count recorded for a stage (Spark frames aren't counted, as that runs a job)."""
+        backend = self.backend_for(events)
+        return backend.name, backend.event_count(events)
+    
+    def _load_events(self, file_path: str, backend: Optional[str] = None):
+        """Load a match, reusing an already parsed one when a match cache is configured."""
+        if self.match_cache is not None:
+            # Matches loaded for different backend overrides are cached separately
+            return self.match_cache.get_or_load(file_path, lambda path: self.load_data(path, backend),
+                                                variant=backend or self.backend)
+        return self.load_data(file_path, backend)
+    
+    def analyze_match_stats(self, events) -> Dict[str, Any]:
+        """Compute match details, statistics, player tables and summaries without rendering figures."""
+        engine, event_count = self._stage_info(events)
+        
         # Extract match details
-        match_details = self.extract_match_details(events)
+        with stage("match_details", engine, event_count):
+            match_details = self.extract_match_details(events)
         home_team = match_details["home_team"]
         away_team = match_details["away_team"]
         
-        # Store team names for other methods to use
-        self.config['home_team'] = home_team
-        self.config['away_team'] = away_team
-        
         # Calculate match statistics
-        match_stats = self.calculate_match_stats(events, home_team, away_team)
+        with stage("match_stats", engine, event_count):
+            match_stats = self.calculate_match_stats(events, home_team, away_team)
         
         # Get player statistics
-        home_player_stats = self.get_player_stats(events, home_team)
-        away_player_stats = self.get_player_stats(events, away_team)
-        
-        # Create visualization
-        match_visualization = self.create_match_visualization(match_details, match_stats)
-        
-        # Create shot maps
-        home_shot_map = self.create_shot_map(events, home_team)
-        away_shot_map = self.create_shot_map(events, away_team)
-        
-        # Create player heatmap if requested
-        player_heatmap = None
-        player_team = None
-        if player_name:
-            # Determine which team the player is on
-            home_players = [p['player_name'] for p in home_player_stats]
-            away_players = [p['player_name'] for p in away_player_stats]
-            
-            if player_name in home_players:
-                player_heatmap = self.create_player_heatmap(events, player_name, home_team)
-                player_team = home_team
-            elif player_name in away_players:
-                player_heatmap = self.create_player_heatmap(events, player_name, away_team)
-                player_team = away_team
+        with stage("player_stats", engine, event_count):
+            home_player_stats = self.get_player_stats(events, home_team)
+            away_player_stats = self.get_player_stats(events, away_team)
         
         # Generate player summaries
-        home_summary = self.get_player_summary(home_player_stats)
-        away_summary = self.get_player_summary(away_player_stats)
+        with stage("summaries", "python"):
+            home_summary = self.get_player_summary(home_player_stats)
+            away_summary = self.get_player_summary(away_player_stats)
         
-        # Return analysis results
         return {
             "match_details": match_details,
             "match_stats": match_stats,
             "home_player_stats": home_player_stats,
             "away_player_stats": away_player_stats,
             "home_summary": home_summary,
-            "away_summary": away_summary,
-            "match_visualization": match_visualization,
-            "home_shot_map": home_shot_map,
-            "away_shot_map": away_shot_map,
-            "player_heatmap": player_heatmap,
-            "player_name": player_name,
-            "player_team": player_team
+            "away_summary": away_summary
         }
     
+    def player_team(self, match_result: Dict[str, Any], player_name: str) -> Optional[str]:
+        """Team whose Starting XI includes the player, or None."""
+        for side in ("home", "away"):
+            if any(p['player_name'] == player_name for p in match_result[f"{side}_player_stats"]):
+                return match_result["match_details"][f"{side}_team"]
+        return None
+    
+    def figure_job(self, events, match_result: Dict[str, Any], kind: str,
+                   player_name: str = None) -> Optional[Tuple[Callable[..., bytes], tuple]]:
+        """
+        The render function and arguments of one figure (None for a player not in the lineups).
+        
+        Only the figure's own filtered arrays are extracted from the events, so the
+        job is small enough to send to a render worker process.
+        """
+        match_details = match_result["match_details"]
+        if kind == 'overview':
+            return rendering.render_match_overview, (match_details, match_result["match_stats"], self.viz_config)
+        
+        if kind in ('home_shots', 'away_shots'):
+            team_name = match_details["home_team" if kind == 'home_shots' else "away_team"]
+            shot_x, shot_y, shot_xg, shot_goal = self._team_shots(events, team_name)
+            return rendering.render_shot_map, (team_name, shot_x, shot_y, shot_xg, shot_goal, self.viz_config)
+        
+        if kind == 'heatmap':
+            team_name = self.player_team(match_result, player_name)
+            if team_name is None:
+                return None
+            # Team colors are picked from this call's context, not shared analyzer state
+            context = AnalysisContext.from_details(match_details)
+            x_coords, y_coords = self._player_locations(events, player_name, team_name)
+            grid = self.player_grid(events, player_name, team_name)
+            return rendering.render_player_heatmap, (player_name, team_name, x_coords, y_coords,
+                                                     context.is_home(team_name), self.viz_config, grid)
+        
+        raise ValueError(f"Unknown figure kind '{kind}', expected one of {', '.join(FIGURE_KINDS)}")
+    
+    def render_figure(self, events, match_result: Dict[str, Any], kind: str,
+                      player_name: str = None) -> Optional[bytes]:
+        """Render one figure of an analysed match as PNG bytes (None for a player not in the lineups)."""
+        with stage(f"render:{kind}", *self._stage_info(events)):
+            job = self.figure_job(events, match_result, kind, player_name)
+            if job is None:
+                return None
+            render, args = job
+            return self.render_executor.run(render, *args)
+    
+    def figure_file(self, file_path: str, kind: str, player_name: str = None) -> Optional[BinaryIO]:
+        """The cached PNG of one figure opened for reading, rendered on a miss (requires a figure cache; the caller closes it)."""
+        return self._cached_figure(file_path, kind, player_name, lambda: self._load_events(file_path), None)
+    
+    def figure_png(self, file_path: str, kind: str, player_name: str = None) -> Optional[bytes]:
+        """PNG bytes of one figure of a match file, from the figure cache when one is configured."""
+        return self._figure_png(file_path, kind, player_name, lambda: self._load_events(file_path), None)
+    
+    def _figure_key(self, file_path: str, kind: str, player_name: Optional[str]) -> str:
+        if kind not in FIGURE_KINDS:
+            raise ValueError(f"Unknown figure kind '{kind}', expected one of {', '.join(FIGURE_KINDS)}")
+        return figure_key(self.figure_cache.content_hash(file_path), kind,
+                          player_name if kind == 'heatmap' else None, rendering.style_hash(self.viz_config))
+    
+    def _cached_figure(self, file_path: str, kind: str, player_name: Optional[str],
+                       load_events: Callable[[], Any], match_result: Optional[Dict[str, Any]],
+                       render: Optional[Callable[[], Optional[bytes]]] = None) -> Optional[BinaryIO]:
+        key = self._figure_key(file_path, kind, player_name)
+        # Events are only loaded when the figure actually has to be rendered
+        render = render or (lambda: self._render_from_file(file_path, kind, player_name, load_events, match_result))
+        return self.figure_cache.get_or_render(key, render)
+    
+    def _figure_png(self, file_path: str, kind: str, player_name: Optional[str],
+                    load_events: Callable[[], Any], match_result: Optional[Dict[str, Any]],
+                    render: Optional[Callable[[], Optional[bytes]]] = None) -> Optional[bytes]:
+        if self.figure_cache is None:
+            return render() if render else self._render_from_file(file_path, kind, player_name,
+                                                                  load_events, match_result)
+        figure = self._cached_figure(file_path, kind, player_name, load_events, match_result, render)
+        if figure is None:
+            return None
+        with figure:
+            return figure.read()
+    
+    def _render_from_file(self, file_path: str, kind: str, player_name: Optional[str],
+                          load_events: Callable[[], Any], match_result: Optional[Dict[str, Any]]) -> Optional[bytes]:
+        events = load_events()
+        if events is None:
+            raise ValueError(f"Failed to load match data from {file_path}")
+        if match_result is None:
+            match_result = self._match_result(file_path, lambda: events)
+        return self.render_figure(events, match_result, kind, player_name)
+    
+    def _start_renders(self, file_path: str, kinds: List[str], player_name: Optional[str],
+                       load_events: Callable[[], Any], match_result: Dict[str, Any]) -> Dict[str, Future]:
+        """Submit every figure missing from the figure cache to the render executor at once."""
+        renders = {}
+        for kind in kinds:
+            cached = self.figure_cache is not None and \
+                self.figure_cache.contains(self._figure_key(file_path, kind, player_name))
+            if cached:
+                continue
+            job = self.figure_job(load_events(), match_result, kind, player_name)
+            if job is not None:
+                render, args = job
+                renders[kind] = self.render_executor.submit(render, *args)
+        return renders
+    
+    def _match_result(self, file_path: str, load_events: Callable[[], Any]) -> Optional[Dict[str, Any]]:
+        """Statistics of a match, from the result cache when one is configured (None if loading fails)."""
+        identity = file_identity(file_path) if self.result_cache is not None else None
+        match_result = self.result_cache.get_match(identity) if identity else None
+        if match_result is None:
+            events = load_events()
+            if events is None:
+                return None
+            match_result = self.analyze_match_stats(events)
+            if identity:
+                self.result_cache.put_match(identity, match_result)
+        return match_result
+        
+    def analyze_match(self, file_path: str, player_name: str = None, outputs=DEFAULT_OUTPUTS,
+                      timings: bool = False, backend: Optional[str] = None):
+        """
+        Perform match analysis and return the requested outputs (see OUTPUTS).
+        
+        ``stats`` adds the match details, statistics, player tables and summaries;
+        ``shots`` adds both teams' shots and ``heatmap`` the player's heatmap grid
+        as plain arrays; ``figures`` adds the rendered figures as base64 PNGs.
+        Only ``figures`` renders anything. With ``timings`` the result also has a
+        ``timings`` block with the wall time, engine, event count and memory peak
+        of every stage (see instrumentation.py). ``backend`` overrides the
+        backend the match is loaded with (see backends.py); statistics are the
+        same on every backend, so cached results are shared between them.
+        """
+        unknown = set(outputs) - set(OUTPUTS)
+        if unknown:
+            raise ValueError(f"Unknown outputs {', '.join(sorted(unknown))}, expected some of {', '.join(OUTPUTS)}")
+        backend = self.check_backend(backend)
+        if not timings:
+            return self._analyze_match(file_path, player_name, outputs, backend)
+        
+        with tracing() as trace:
+            result = self._analyze_match(file_path, player_name, outputs, backend)
+        result["timings"] = trace.to_dict()
+        return result
+    
+    def _analyze_match(self, file_path: str, player_name: Optional[str], outputs,
+                       backend: Optional[str]) -> Dict[str, Any]:
+        # Events are loaded at most once, and only if statistics or an output must be computed
+        loaded = []
+        def load_events():
+            if not loaded:
+                with stage("load") as record:
+                    events = self._load_events(file_path, backend)
+                    if events is not None:
+                        # Counting a Spark frame runs a job, so only do it when the count is recorded
+                        events_backend = self.backend_for(events)
+                        engine = events_backend.name
+                        record.engine = engine
+                        record.events = events_backend.event_count(events, exact=instrumentation_active())
+                        set_engine(engine)
+                loaded.append(events)
+            return loaded[0]
+        
+        def events_engine():
+            # Backend of the loaded events, or "cache" when everything so far came from caches
+            if loaded and loaded[0] is not None:
+                return self.backend_for(loaded[0]).name
+            return "cache"
+        
+        # Statistics come from the result cache when possible; figures from the figure cache
+        with stage("statistics") as record:
+            match_result = self._match_result(file_path, load_events)
+            record.engine = events_engine()
+        if match_result is None:
+            return {"error": "Failed to load match data."}
+        
+        result = dict(match_result) if 'stats' in outputs else {}
+        result["player_name"] = player_name
+        result["player_team"] = self.player_team(match_result, player_name) if player_name else None
+        
+        # Raw data for drawing shot maps and heatmaps on the client
+        match_details = match_result["match_details"]
+        if 'shots' in outputs:
+            events = load_events()
+            with stage("shots", *self._stage_info(events)):
+                result["shots"] = {side: self.shot_data(events, match_details[f"{side}_team"])
+                                   for side in ("home", "away")}
+        if 'heatmap' in outputs:
+            if result["player_team"] is None:
+                result["heatmap"] = None
+            else:
+                events = load_events()
+                with stage("heatmap", *self._stage_info(events)):
+                    result["heatmap"] = self.heatmap_data(events, player_name, result["player_team"])
+        
+        # Create the figures (and the player heatmap if requested) as base64 PNGs; the
+        # missing ones render side by side when the render executor has several workers
+        if 'figures' in outputs:
+            fields = {field: kind for field, kind in FIGURE_FIELDS.items()
+                      if kind != 'heatmap' or result["player_team"] is not None}
+            renders = {}
+            if self.render_executor.parallel:
+                with stage("figure_jobs") as record:
+                    renders = self._start_renders(file_path, list(fields.values()), player_name,
+                                                  load_events, match_result)
+                    record.engine = events_engine()
+            for field in FIGURE_FIELDS:
+                if field not in fields:
+                    result[field] = None
+                    continue
+                kind = fields[field]
+                render = renders[kind].result if kind in renders else None
+                with stage(f"figure:{kind}") as record:
+                    png = self._figure_png(file_path, kind, player_name, load_events, match_result, render)
+                    record.engine = events_engine()
+                result[field] = rendering.png_to_base64(png) if png is not None else None
+        
+        # A match that isn't kept in the cache can release what it holds (e.g. a persisted DataFrame) now
+        if loaded and loaded[0] is not None and self.match_cache is None:
+            self.backend_for(loaded[0]).release(loaded[0])
+        
+        return result
+    
+    def parity_result(self, file_path: str, backend: str) -> Dict[str, Any]:
+        """
+        Everything a backend computes for a match, loaded with that backend and no caches.
+        
+        Used by ``python backends.py parity`` to check that all backends agree:
+        statistics, both teams' shots, every player's heatmap grid and the
+        per-minute timeline.
+        """
+        events = self.backends[self.check_backend(backend)].load(file_path)
+        try:
+            match_result = self.analyze_match_stats(events)
+            match_details = match_result["match_details"]
+            return {
+                "stats": match_result,
+                "shots": {side: self._team_shots(events, match_details[f"{side}_team"]) for side in ("home", "away")},
+                "grids": {f"{team}/{player}": grid for (team, player), grid in self.player_grids(events).items()},
+                "timeline": self.minute_timeline(events).to_dict()
+            }
+        finally:
+            self.backend_for(events).release(events)
+    
+    def close(self):
+        """Stop anything the backends started, such as the Spark session."""
+        for backend in getattr(self, 'backends', {}).values():
+            backend.close()
+    
     def __del__(self):
         """Clean up resources when the object is destroyed."""
         # Stop Spark session when the analyzer is destroyed
-        if hasattr(self, 'spark'):
-            self.spark.stop()
+        self.close()
     
 if __name__ == "__main__":
     # This is a standalone test mode for the analyzer
     # For web application usage, the analyzer is called via server.py
+    import argparse
     import sys
     
-    analyzer = FootballMatchAnalyzer()
+    parser = argparse.ArgumentParser(description="Analyze StatsBomb match files")
+    parser.add_argument("file_path", nargs="?", help="Match file to analyze (defaults to the first file in uploads/)")
+    parser.add_argument("player_name", nargs="?", help="Optional player to build a heatmap for")
+    parser.add_argument("--batch", metavar="DIR_OR_GLOB",
+                        help="Analyze every match in a directory or glob pattern in parallel")
+    parser.add_argument("--output", default="-", help="NDJSON output file for --batch (default: stdout)")
+    parser.add_argument("--workers", type=int, help="Worker processes for --batch (default: CPU count)")
+    parser.add_argument("--figures", action="store_true", help="Include base64 figures in --batch output")
+    parser.add_argument("--backend", default=AUTO, choices=(AUTO,) + BACKEND_NAMES,
+                        help="Backend that loads and analyses the match (default: chosen by the cost model)")
+    args = parser.parse_args()
+    
+    if args.batch:
+        from batch_analysis import find_match_files, run_batch
+        
+        # Workers load with this backend, so an unavailable one is reported once here
+        if args.backend != AUTO and not create_backends()[args.backend].available():
+            parser.error(f"Backend '{args.backend}' is not available on this host")
+        
+        files = find_match_files(args.batch)
+        if not files:
+            print(f"No JSON files found for {args.batch}", file=sys.stderr)
+            sys.exit(1)
+        
+        output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            summary = run_batch(files, output, workers=args.workers, player_name=args.player_name,
+                                include_figures=args.figures, backend=args.backend)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        sys.exit(1 if summary["failed"] else 0)
+    
+    analyzer = FootballMatchAnalyzer(backend=args.backend)
     
     # Allow file path as command line argument
-    if len(sys.argv) > 1:
-        file_path = sys.argv[1]
+    if args.file_path:
+        file_path = args.file_path
     else:
         # Default to an example file in the uploads folder if available
-        available_files = [f for f in os.listdir('uploads') if f.endswith('.json')]
+        available_files = [f for f in os.listdir('uploads') if is_match_file(f)]
         if available_files:
             file_path = os.path.join('uploads', available_files[0])
             print(f"Using default file: {file_path}")
@@ -898,7 +829,7 @@ if __name__ == "__main__":
             sys.exit(1)
     
     # Optional player name as second argument
-    player_name = sys.argv[2] if len(sys.argv) > 2 else None
+    player_name = args.player_name
     
     print(f"Analyzing match file: {file_path}{' for player: ' + player_name if player_name else ''}")
     analysis_results = analyzer.analyze_match(file_path, player_name)
@@ -915,4 +846,4 @@ if __name__ == "__main__":
         print(f"Error: {analysis_results['error']}")
     
     # Clean up Spark session
-    analyzer.spark.stop()
+    analyzer.close()
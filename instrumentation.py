@@ -0,0 +1,264 @@
+"""
+Instrumentation
+---------------
+Per-stage timing of analyses and Prometheus metrics for the server.
+
+Analysis code wraps each stage in ``stage(name)``. A stage records its wall
+time, the engine that ran it (the backend of the loaded match: ``python``,
+``numpy`` or ``spark``, see backends.py), the number of events it worked on
+and the process memory high-water mark. Records go to:
+
+- the Trace active in the current context, if any (``with tracing() as
+  trace``), which is how ``analyze_match(timings=True)`` returns a timings
+  block with the result;
+- the module-level ``metrics`` registry when it is enabled, which keeps
+  per-stage histograms and counters and renders them in the Prometheus text
+  format for the server's /metrics endpoint.
+
+When neither is active, ``stage()`` returns a shared no-op context manager,
+so the instrumented code pays one context variable lookup per stage.
+
+Memory is the peak resident set size of the whole process (getrusage), which
+is cheap to read but shared by concurrent analyses; ``rss_growth_bytes`` is
+how far a stage raised that peak.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = 'football_analysis'
+
+_current_trace = ContextVar('football_analysis_trace', default=None)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, or None where getrusage is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageRecord:
+    """Measurements of one stage; engine and events may be filled in while the stage runs."""
+
+    __slots__ = ('name', 'engine', 'events', 'seconds', 'peak_rss_bytes', 'rss_growth_bytes', 'error')
+
+    def __init__(self, name: str, engine: Optional[str] = None, events: Optional[int] = None):
+        self.name = name
+        self.engine = engine
+        self.events = events
+        self.seconds = 0.0
+        self.peak_rss_bytes = None
+        self.rss_growth_bytes = None
+        self.error = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {
+            'stage': self.name,
+            'seconds': round(self.seconds, 6),
+            'engine': self.engine,
+            'events': self.events,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'rss_growth_bytes': self.rss_growth_bytes
+        }
+        if self.error:
+            record['error'] = self.error
+        return record
+
+
+class _NullStage:
+    """Stand-in record while instrumentation is off; attribute writes are ignored."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Trace:
+    """Stage records of one analysis, in the order the stages finished."""
+
+    def __init__(self):
+        self.records = []  # type: List[StageRecord]
+        self.engine = None  # engine of the loaded events, used for stages that don't set one
+        self._start = time.perf_counter()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total_seconds': round(time.perf_counter() - self._start, 6),
+            'engine': self.engine,
+            'stages': [record.to_dict() for record in self.records]
+        }
+
+
+@contextmanager
+def tracing() -> Iterator[Trace]:
+    """Collect the stages run in this context (and this thread) into a new Trace."""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def active() -> bool:
+    """Whether stages are being recorded, e.g. to skip computing values only a record needs."""
+    return metrics.enabled or _current_trace.get() is not None
+
+
+def set_engine(engine: str):
+    """Record the engine of the events the current trace works on."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.engine = engine
+
+
+def stage(name: str, engine: Optional[str] = None, events: Optional[int] = None):
+    """Context manager timing one stage; a no-op unless a trace or the metrics registry is active."""
+    trace = _current_trace.get()
+    if trace is None and not metrics.enabled:
+        return _NULL_STAGE
+    return _stage(name, engine, events, trace)
+
+
+@contextmanager
+def _stage(name: str, engine: Optional[str], events: Optional[int],
+           trace: Optional[Trace]) -> Iterator[StageRecord]:
+    record = StageRecord(name, engine, events)
+    rss_before = peak_rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record.error = type(e).__name__
+        raise
+    finally:
+        record.seconds = time.perf_counter() - start
+        record.peak_rss_bytes = peak_rss_bytes()
+        if rss_before is not None:
+            record.rss_growth_bytes = record.peak_rss_bytes - rss_before
+        if record.engine is None and trace is not None:
+            record.engine = trace.engine
+        if trace is not None:
+            trace.records.append(record)
+        if metrics.enabled:
+            metrics.observe(record)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def format_metric(name: str, kind: str, help_text: str,
+                  samples: Dict[Tuple[Tuple[str, Any], ...], float]) -> List[str]:
+    """
+    Prometheus text lines of a gauge or counter (kind) with one sample per label set.
+
+    Label sets are tuples of (label, value) pairs; ``{(): value}`` is a single unlabelled sample.
+    """
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for labels, value in samples.items():
+        lines.append(f'{name}{_labels(dict(labels))} {value}')
+    return lines
+
+
+class MetricsRegistry:
+    """Thread-safe per-stage duration histograms and counters, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.enabled = False
+        self.buckets = buckets
+        self._histograms = {}  # (stage, engine) -> [bucket counts..., sum, count]
+        self._events = {}  # (stage, engine) -> events processed
+        self._errors = {}  # (stage, engine) -> failed stages
+        self._lock = threading.Lock()
+
+    def observe(self, record: StageRecord):
+        key = (record.name, record.engine or 'none')
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            # Counted in every bucket the duration fits, so bucket counts are cumulative as in Prometheus
+            for i, bound in enumerate(self.buckets):
+                if record.seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += record.seconds
+            histogram[-1] += 1
+            if record.events:
+                self._events[key] = self._events.get(key, 0) + record.events
+            if record.error:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._events.clear()
+            self._errors.clear()
+
+    def render(self) -> List[str]:
+        """Prometheus text lines of every metric recorded so far."""
+        duration = f'{METRIC_PREFIX}_stage_duration_seconds'
+        events = f'{METRIC_PREFIX}_stage_events_total'
+        errors = f'{METRIC_PREFIX}_stage_errors_total'
+        with self._lock:
+            lines = [f'# HELP {duration} Wall time of analysis stages', f'# TYPE {duration} histogram']
+            for (name, engine), histogram in sorted(self._histograms.items()):
+                labels = {'stage': name, 'engine': engine}
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'{duration}_bucket{_labels(dict(labels, le=repr(bound)))} {count}')
+                lines.append(f'{duration}_bucket{_labels(dict(labels, le="+Inf"))} {histogram[-1]}')
+                lines.append(f'{duration}_sum{_labels(labels)} {histogram[-2]}')
+                lines.append(f'{duration}_count{_labels(labels)} {histogram[-1]}')
+
+            lines += [f'# HELP {events} Events processed by analysis stages', f'# TYPE {events} counter']
+            for (name, engine), count in sorted(self._events.items()):
+                lines.append(f'{events}{_labels({"stage": name, "engine": engine})} {count}')
+
+            lines += [f'# HELP {errors} Analysis stages that raised', f'# TYPE {errors} counter']
+            for (name, engine), count in sorted(self._errors.items()):
+                lines.append(f'{errors}{_labels({"stage": name, "engine": engine})} {count}')
+
+        peak = peak_rss_bytes()
+        if peak is not None:
+            lines += format_metric(f'{METRIC_PREFIX}_process_peak_rss_bytes', 'gauge',
+                                   'Peak resident set size of the process', {(): peak})
+        return lines
+
+
+# Process-wide registry; the server enables it (METRICS_ENABLED)
+metrics = MetricsRegistry()
@@ -0,0 +1,486 @@
+"""
+Live Matches
+------------
+Incremental statistics of matches that are still being played.
+
+Events of a live match arrive in batches (e.g. NDJSON posted to the server
+every few seconds) instead of as one finished file. A ``LiveMatch`` keeps the
+running totals the analyzer would compute from the full event list, namely
+the teams, formations and lineups, per-team and per-player pass and shot
+totals, and every player's location counts on the heatmap grid. Each batch
+updates them in time proportional to the batch, never the whole match.
+
+Every batch produces a delta holding the new event count, the match
+statistics, the player table rows and the smoothed heatmap grids of the
+players the batch touched. The delta is pushed to the match's subscribers,
+e.g. Server-Sent Event streams. Slow subscribers are dropped rather than
+allowed to hold up ingestion; they reconnect and start from a fresh snapshot.
+
+Usage (replays a finished match and checks the live totals against a full analysis):
+    python live_matches.py replay uploads/match.json --batch 100
+    python live_matches.py replay uploads/match.json --url http://localhost:5000 --delay 1
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+
+from backends import _name, _location
+from event_table import location_counts, project_event
+from football_analysis import FootballMatchAnalyzer
+from match_storage import open_match
+import rendering
+
+# Deltas a subscriber may fall behind by before it is dropped
+SUBSCRIBER_QUEUE_SIZE = 64
+
+
+class LiveMatchError(Exception):
+    """Raised when a batch of live events is malformed."""
+
+
+class LiveMatchLimitError(LiveMatchError):
+    """Raised when a new live match would exceed the registry's limit."""
+
+
+def parse_ndjson(lines: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Parse newline-delimited JSON events (str or bytes lines); blank lines are skipped."""
+    events = []
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError as e:
+            raise LiveMatchError(f"Line {number} is not valid JSON: {e}")
+        if not isinstance(event, dict):
+            raise LiveMatchError(f"Line {number} is not a JSON object")
+        events.append(event)
+    return events
+
+
+def project_live_event(event: Dict[str, Any], number: int) -> Dict[str, Any]:
+    """
+    Project a raw event, checking the fields the totals read so a bad event can't half-apply a batch.
+
+    Raises:
+        LiveMatchError: If a name, location or xG value has the wrong type
+    """
+    try:
+        projected = project_event(event)
+    except (AttributeError, TypeError, KeyError):
+        raise LiveMatchError(f"Event {number} is not a StatsBomb event")
+    for key in ('type', 'team', 'player', 'possession_team'):
+        if not isinstance(_name(projected, key), (str, type(None))):
+            raise LiveMatchError(f"Event {number} has a non-string {key} name")
+    location = _location(projected)
+    if location and not all(isinstance(value, (int, float)) for value in location):
+        raise LiveMatchError(f"Event {number} has a non-numeric location")
+    xg = (projected.get('shot') or {}).get('statsbomb_xg')
+    if xg is not None and not isinstance(xg, (int, float)):
+        raise LiveMatchError(f"Event {number} has a non-numeric statsbomb_xg")
+    tactics = projected.get('tactics')
+    if tactics is not None and not (isinstance(tactics, dict) and
+                                    all(isinstance(player, dict) for player in tactics.get('lineup') or [])):
+        raise LiveMatchError(f"Event {number} has malformed tactics")
+    return projected
+
+
+class LiveMatch:
+    """Running totals of one match, updated batch by batch, and the subscribers to its deltas."""
+
+    def __init__(self, match_id: str, bins: Tuple[int, int] = rendering.HEATMAP_BINS):
+        self.match_id = match_id
+        self.bins = (int(bins[0]), int(bins[1]))
+        self.seq = 0  # batches applied so far
+        self.total_events = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.teams = OrderedDict()  # team names in order of first appearance
+        self.formations = {}
+        self.lineups = {}  # team -> player name -> lineup entry
+        self.team_counts = {}
+        self.player_counts = {}  # team -> player name -> totals
+        self.location_counts = {}  # (team, player) -> unsmoothed counts per grid cell
+        self.located_events = {}  # (team, player) -> events with a location
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def _team_totals(self, team_name: str) -> Dict[str, Any]:
+        return self.team_counts.setdefault(team_name, {
+            "possession": 0, "passes": 0, "completed": 0, "shots": 0, "goals": 0, "xg": 0.0
+        })
+
+    def _player_totals(self, team_name: str, player_name: str) -> Dict[str, Any]:
+        return self.player_counts.setdefault(team_name, {}).setdefault(player_name, {
+            'passes': 0, 'successful_passes': 0, 'shots': 0, 'goals': 0, 'xg': 0.0
+        })
+
+    def _add_event(self, event: Dict[str, Any], touched_players: set, lineup_teams: set):
+        """Fold one projected event into the totals (the same rules as the python backend)."""
+        possession_team = _name(event, 'possession_team')
+        if possession_team is not None:
+            self._team_totals(possession_team)["possession"] += 1
+
+        team_name = _name(event, 'team')
+        if team_name is None:
+            return
+        self.teams.setdefault(team_name, None)
+        event_type = _name(event, 'type')
+
+        if event_type == 'Starting XI':
+            tactics = event.get('tactics')
+            if tactics and tactics.get('formation') is not None:
+                self.formations[team_name] = str(tactics['formation'])
+            if tactics:
+                lineup = self.lineups.setdefault(team_name, {})
+                for player in tactics.get('lineup') or []:
+                    player_name = (player.get('player') or {}).get('name', '')
+                    if player_name:
+                        lineup[player_name] = {
+                            'player_name': player_name,
+                            'position': (player.get('position') or {}).get('name', ''),
+                            'jersey': player.get('jersey_number', 0)
+                        }
+                lineup_teams.add(team_name)
+                return
+
+        player_name = _name(event, 'player')
+        if event_type in ('Pass', 'Shot'):
+            team_totals = self._team_totals(team_name)
+            player_totals = self._player_totals(team_name, player_name) if player_name is not None else {}
+            if event_type == 'Pass':
+                completed = (event.get('pass') or {}).get('outcome') is None
+                team_totals["passes"] += 1
+                team_totals["completed"] += completed
+                if player_name is not None:
+                    player_totals['passes'] += 1
+                    player_totals['successful_passes'] += completed
+            else:
+                shot = event.get('shot') or {}
+                goal = _name(shot, 'outcome') == 'Goal'
+                xg = shot.get('statsbomb_xg') or 0.0
+                team_totals["shots"] += 1
+                team_totals["goals"] += goal
+                team_totals["xg"] += xg
+                if player_name is not None:
+                    player_totals['shots'] += 1
+                    player_totals['goals'] += goal
+                    player_totals['xg'] += xg
+            if player_name is not None:
+                touched_players.add((team_name, player_name))
+
+    def _add_locations(self, events: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+        """Bin the batch's located events into the per-player grids; returns the pairs touched."""
+        pair_codes, xs, ys = {}, [], []
+        groups = []
+        for event in events:
+            team_name, player_name = _name(event, 'team'), _name(event, 'player')
+            location = _location(event)
+            if location and team_name is not None and player_name is not None:
+                groups.append(pair_codes.setdefault((team_name, player_name), len(pair_codes)))
+                xs.append(location[0])
+                ys.append(location[1])
+        if not pair_codes:
+            return []
+
+        groups = np.array(groups, dtype=np.int64)
+        extent = (rendering.PITCH_LENGTH, rendering.PITCH_WIDTH)
+        counts = location_counts(groups, len(pair_codes), np.array(xs, dtype=np.float32),
+                                 np.array(ys, dtype=np.float32), self.bins, extent)
+        located = np.bincount(groups, minlength=len(pair_codes))
+        for pair, code in pair_codes.items():
+            grid = self.location_counts.get(pair)
+            self.location_counts[pair] = counts[code] if grid is None else grid + counts[code]
+            self.located_events[pair] = self.located_events.get(pair, 0) + int(located[code])
+        return list(pair_codes)
+
+    def _grids(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Smoothed grids of the given (team, player) pairs, smoothed together in one call."""
+        if not pairs:
+            return []
+        grids = rendering.smooth_grids(np.stack([self.location_counts[pair] for pair in pairs]))
+        return [FootballMatchAnalyzer.grid_data(team, player, grids[i], self.located_events[(team, player)])
+                for i, (team, player) in enumerate(pairs)]
+
+    def _match_details(self) -> Dict[str, Any]:
+        return FootballMatchAnalyzer.match_details_from(list(self.teams), self.formations)
+
+    def _player_rows(self, team_name: str, players: Optional[set] = None) -> List[Dict]:
+        """Player table rows of a team's lineup, or only of the given players in it."""
+        lineup = [entry for name, entry in self.lineups.get(team_name, {}).items()
+                  if players is None or name in players]
+        return FootballMatchAnalyzer.player_stats_from(lineup, self.player_counts.get(team_name, {}))
+
+    def _state(self) -> Dict[str, Any]:
+        match_details = self._match_details()
+        home_team, away_team = match_details["home_team"], match_details["away_team"]
+        return {
+            "match_id": self.match_id,
+            "seq": self.seq,
+            "events": self.total_events,
+            "match_details": match_details,
+            "match_stats": FootballMatchAnalyzer.match_stats_from(self.total_events, self.team_counts,
+                                                                  home_team, away_team)
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything known about the match: statistics, both player tables and all heatmap grids."""
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Any]:
+        state = self._state()
+        match_details = state["match_details"]
+        state.update({
+            "home_player_stats": self._player_rows(match_details["home_team"]),
+            "away_player_stats": self._player_rows(match_details["away_team"]),
+            "bins": list(self.bins),
+            "grids": self._grids(list(self.location_counts))
+        })
+        return state
+
+    def append(self, raw_events: List[Dict[str, Any]], projected: bool = False) -> Dict[str, Any]:
+        """
+        Add a batch of raw StatsBomb events and push the resulting delta to subscribers.
+
+        The whole batch is checked before any of it is applied (LiveMatchError if
+        an event is malformed); ``projected`` skips this for events that already
+        went through ``project_live_event``.
+
+        The delta holds the match details and statistics, the player rows and
+        heatmap grids of the players the batch touched (``players`` lists whole
+        lineups when a team's lineup or the home/away assignment changed), and
+        the new event count and batch sequence number.
+        """
+        events = raw_events if projected else [project_live_event(event, number)
+                                               for number, event in enumerate(raw_events, 1)]
+        touched_players, lineup_teams = set(), set()
+        with self._lock:
+            previous_details = self._match_details() if self.seq else None
+            for event in events:
+                self._add_event(event, touched_players, lineup_teams)
+            touched_pairs = self._add_locations(events)
+            self.total_events += len(events)
+            self.seq += 1
+            self.updated_at = time.time()
+
+            delta = self._state()
+            delta["batch"] = len(events)
+            match_details = delta["match_details"]
+            full_tables = match_details != previous_details
+            delta["players"] = {}
+            for side in ("home", "away"):
+                team_name = match_details[f"{side}_team"]
+                if full_tables or team_name in lineup_teams:
+                    delta["players"][side] = self._player_rows(team_name)
+                else:
+                    players = {player for team, player in touched_players if team == team_name}
+                    delta["players"][side] = self._player_rows(team_name, players) if players else []
+            delta["grids"] = self._grids(touched_pairs)
+            self._publish("delta", delta)
+        return delta
+
+    def subscribe(self) -> 'queue.Queue':
+        """
+        Register a subscriber; its queue starts with a snapshot and then receives every delta.
+
+        Messages are (event, seq, data) tuples, and None once the match ends or
+        the subscriber fell too far behind and was dropped.
+        """
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            subscriber.put(("snapshot", self.seq, self._snapshot()))
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: 'queue.Queue'):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def is_subscribed(self, subscriber: 'queue.Queue') -> bool:
+        with self._lock:
+            return subscriber in self._subscribers
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _publish(self, event: str, data: Optional[Dict[str, Any]]):
+        """Queue a message for every subscriber (lock held), dropping those that are full."""
+        message = (event, self.seq, data) if data is not None else None
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self._subscribers.remove(subscriber)
+
+    def close(self):
+        """End the match for all subscribers."""
+        with self._lock:
+            self._publish("end", None)
+            self._subscribers.clear()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "match_id": self.match_id,
+                "seq": self.seq,
+                "events": self.total_events,
+                "teams": list(self.teams),
+                "subscribers": len(self._subscribers),
+                "created_at": self.created_at,
+                "updated_at": self.updated_at
+            }
+
+
+class LiveMatchRegistry:
+    """The live matches of a server, created on their first batch, up to ``max_matches`` at once."""
+
+    def __init__(self, max_matches: int = 16, bins: Tuple[int, int] = rendering.HEATMAP_BINS):
+        self.max_matches = max_matches
+        self.bins = bins
+        self._matches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, match_id: str) -> Optional[LiveMatch]:
+        with self._lock:
+            return self._matches.get(match_id)
+
+    def get_or_create(self, match_id: str) -> LiveMatch:
+        with self._lock:
+            match = self._matches.get(match_id)
+            if match is None:
+                if len(self._matches) >= self.max_matches:
+                    raise LiveMatchLimitError(f"Too many live matches (limit {self.max_matches}); end one first")
+                match = self._matches[match_id] = LiveMatch(match_id, self.bins)
+            return match
+
+    def append(self, match_id: str, raw_events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Check a batch and append it to a live match, creating the match only for a valid batch."""
+        events = [project_live_event(event, number) for number, event in enumerate(raw_events, 1)]
+        return self.get_or_create(match_id).append(events, projected=True)
+
+    def remove(self, match_id: str) -> bool:
+        """End a live match and disconnect its subscribers; False if it doesn't exist."""
+        with self._lock:
+            match = self._matches.pop(match_id, None)
+        if match is None:
+            return False
+        match.close()
+        return True
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            matches = list(self._matches.values())
+        return [match.info() for match in matches]
+
+
+def sse_message(event: str, seq: int, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events message."""
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def sse_stream(match: LiveMatch, keepalive_seconds: float = 15.0):
+    """
+    Yield a match's snapshot and then its deltas as Server-Sent Events.
+
+    A comment line is sent after ``keepalive_seconds`` without deltas so proxies
+    keep the connection open. The stream ends with an ``end`` event when the
+    match ends, or silently when the subscriber was dropped for falling behind.
+    """
+    subscriber = match.subscribe()
+    try:
+        while True:
+            try:
+                message = subscriber.get(timeout=keepalive_seconds)
+            except queue.Empty:
+                if not match.is_subscribed(subscriber):
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                yield sse_message("end", match.seq, {"match_id": match.match_id})
+                return
+            yield sse_message(*message)
+    finally:
+        match.unsubscribe(subscriber)
+
+
+def replay_batches(file_path: str, batch_size: int) -> Iterable[List[Dict[str, Any]]]:
+    """The raw events of a match file in batches of batch_size."""
+    with open_match(file_path) as f:
+        events = json.load(f)
+    for start in range(0, len(events), batch_size):
+        yield events[start:start + batch_size]
+
+
+def compare_with_analysis(snapshot: Dict[str, Any], file_path: str) -> List[str]:
+    """Differences between a live snapshot and a full analysis of the same file (empty if they agree)."""
+    analyzer = FootballMatchAnalyzer(backend='python')
+    events = analyzer.backends['python'].load(file_path)
+    expected = analyzer.analyze_match_stats(events)
+    problems = []
+    for key in ("match_details", "match_stats", "home_player_stats", "away_player_stats"):
+        if snapshot[key] != expected[key]:
+            problems.append(f"{key} differs")
+    grids = {(entry["team"], entry["player"]): entry for entry in snapshot["grids"]}
+    expected_grids = analyzer.player_grids(events, tuple(snapshot["bins"]))
+    if set(grids) != set(expected_grids):
+        problems.append("heatmap players differ")
+    for (team, player), (grid, count) in expected_grids.items():
+        entry = grids.get((team, player))
+        if entry is not None and entry != FootballMatchAnalyzer.grid_data(team, player, grid, count):
+            problems.append(f"heatmap grid of {player} ({team}) differs")
+    return problems
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import urllib.request
+
+    parser = argparse.ArgumentParser(description="Replay finished matches as live event batches")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    replay = subparsers.add_parser('replay', help="Feed a match file to a live match batch by batch")
+    replay.add_argument('file', help="StatsBomb events JSON file")
+    replay.add_argument('--batch', type=int, default=100, help="Events per batch")
+    replay.add_argument('--delay', type=float, default=0.0, help="Seconds to wait between batches")
+    replay.add_argument('--url', help="Post the batches to a running server instead of replaying in-process")
+    replay.add_argument('--match-id', help="Live match id (default: the file name without extension)")
+    args = parser.parse_args()
+
+    match_id = args.match_id or os.path.splitext(os.path.basename(args.file))[0]
+    if args.url:
+        endpoint = f"{args.url.rstrip('/')}/api/live/{match_id}/events"
+        for batch in replay_batches(args.file, args.batch):
+            body = "\n".join(json.dumps(event) for event in batch).encode('utf-8')
+            request = urllib.request.Request(endpoint, data=body, method='POST',
+                                             headers={'Content-Type': 'application/x-ndjson'})
+            with urllib.request.urlopen(request) as response:
+                delta = json.load(response)
+            print(f"batch {delta['seq']}: {delta['events']} events")
+            time.sleep(args.delay)
+    else:
+        match = LiveMatch(match_id)
+        timings = []
+        for batch in replay_batches(args.file, args.batch):
+            start = time.perf_counter()
+            match.append(batch)
+            timings.append(time.perf_counter() - start)
+            time.sleep(args.delay)
+        print(f"{match.total_events} events in {match.seq} batches, "
+              f"{1000 * np.mean(timings):.2f} ms mean / {1000 * np.max(timings):.2f} ms max per batch")
+        problems = compare_with_analysis(match.snapshot(), args.file)
+        print("live totals match full analysis" if not problems else "\n".join(problems))
+        raise SystemExit(1 if problems else 0)
@@ -0,0 +1,218 @@
+"""
+Match Cache
+-----------
+In-process LRU cache of loaded matches for the web server.
+
+Entries are keyed on the file identity (absolute path, size and modification
+time), so a file that is replaced on disk is never served from a stale entry.
+The cache is bounded by a memory budget rather than an entry count because
+match sizes vary widely, and it keeps hit/miss counters for monitoring.
+Concurrent requests for the same uncached match share a single load.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import os
+import threading
+
+from match_storage import data_size
+
+
+def file_identity(file_path: str) -> Tuple[str, int, int]:
+    """Return the (path, size, mtime) key that identifies a file's current contents."""
+    stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+
+def release(value: Any):
+    """Free resources held outside the Python heap, such as a persisted Spark DataFrame."""
+    unpersist = getattr(value, 'unpersist', None)
+    if unpersist is not None:
+        unpersist()
+
+
+# Python heap bytes of parsed (projected) event dicts per byte of match JSON; measured at
+# 3-5x, the upper end for matches with few fields beyond those the analyzer keeps
+PARSED_EVENTS_RATIO = 5
+
+
+def estimate_size(value: Any, file_path: str) -> int:
+    """
+    Estimate the memory held by a cached value.
+
+    Columnar tables report their own size; event dict lists (the python
+    backend) are charged PARSED_EVENTS_RATIO times the match's JSON size, and
+    anything else (e.g. a Spark DataFrame, held by the JVM) the JSON size.
+    """
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, list):
+        return data_size(file_path) * PARSED_EVENTS_RATIO
+    return data_size(file_path)
+
+
+class MatchCache:
+    """Thread-safe LRU cache of loaded matches bounded by a memory budget."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (identity..., variant) -> (value, size)
+        self._loading = {}  # (identity..., variant) -> Event set once the in-progress load finishes
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, file_path: str, loader: Callable[[str], Any], variant: Optional[str] = None) -> Any:
+        """
+        Return the cached match for file_path, loading it with loader on a miss.
+
+        Loads of the same file that produce different values (e.g. on different
+        backends) are told apart by variant.
+        """
+        key = file_identity(file_path) + (variant,)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                loading = self._loading.get(key)
+                if loading is None:
+                    self.misses += 1
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Another thread is already loading this match; wait for it instead of parsing it twice
+            loading.wait()
+
+        # Load outside the lock so a slow parse doesn't block other matches
+        try:
+            value = loader(file_path)
+            if value is not None:
+                size = estimate_size(value, file_path)
+                with self._lock:
+                    if size <= self.max_bytes:
+                        self._entries[key] = (value, size)
+                        self._bytes += size
+                        self._evict()
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+        return value
+
+    def invalidate(self, file_path: str):
+        """Drop every cached version of file_path."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                value, size = self._entries.pop(key)
+                self._bytes -= size
+                release(value)
+
+    def clear(self):
+        with self._lock:
+            for value, _ in self._entries.values():
+                release(value)
+            self._entries.clear()
+            self._bytes = 0
+
+    def _evict(self):
+        # Drop least recently used entries until we are back under budget
+        while self._bytes > self.max_bytes and self._entries:
+            _, (value, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            release(value)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current memory usage."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+class _LRUTier:
+    """Entry-count bounded LRU mapping with hit/miss counters (callers hold the lock)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def drop_path(self, path: str):
+        # Keys start with the file identity, whose first element is the path
+        for key in [k for k in self.entries if k[0][0] == path]:
+            del self.entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries
+        }
+
+
+class ResultCache:
+    """
+    Cache of analysis statistics.
+
+    Holds everything that analyze_match computes apart from the figures
+    (details, stats, player tables and summaries), keyed by file identity.
+    Rendered figures are cached on disk by figure_cache.FigureCache.
+    """
+
+    def __init__(self, max_matches: int = 32):
+        self._matches = _LRUTier(max_matches)
+        self._lock = threading.Lock()
+
+    def get_match(self, identity: Tuple[str, int, int]):
+        with self._lock:
+            return self._matches.get((identity,))
+
+    def put_match(self, identity: Tuple[str, int, int], result: Dict[str, Any]):
+        with self._lock:
+            self._matches.put((identity,), result)
+
+    def invalidate(self, file_path: str):
+        """Drop every cached version of file_path."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            self._matches.drop_path(path)
+
+    def clear(self):
+        with self._lock:
+            self._matches.entries.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {'match': self._matches.stats()}
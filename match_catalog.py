@@ -0,0 +1,372 @@
+"""
+Match Catalog
+-------------
+Persistent SQLite catalog of the match files in the uploads folder.
+
+Every match is described once, when it is uploaded or found by a rescan: its
+teams, formations, score, xG, event count, content hash and lineups are stored
+along with the file's size and modification time. Listing, searching (by team,
+player, date or season), sorting and paging then read indexed rows only, so the
+index page and ``/list_files`` cost the same however many matches are stored,
+and never open a match file.
+
+StatsBomb event files carry no match date, so a match's date is the one given
+at upload and defaults to the day the file was stored.
+
+Rebuild or refresh the catalog from the files on disk (unchanged files are
+skipped unless ``--full`` is given; files that disappeared are dropped):
+    python match_catalog.py rescan uploads/ --workers 8 [--db match_catalog.sqlite] [--full]
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
+from typing import Any, Dict, Optional, TextIO
+import datetime
+import os
+import sqlite3
+import sys
+import time
+
+from figure_cache import hash_file
+from match_storage import is_match_file, match_name
+from season_index import DEFAULT_SEASON
+
+# Sort keys accepted by search() and the SQL they order by
+SORT_COLUMNS = {
+    'date': 'match_date',
+    'filename': 'filename',
+    'home_team': 'home_team',
+    'away_team': 'away_team',
+    'events': 'events',
+    'goals': 'home_goals + away_goals',
+    'xg': 'home_xg + away_xg',
+    'indexed': 'indexed_at'
+}
+DEFAULT_SORT = 'date'
+MAX_PAGE_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (
+    filename TEXT PRIMARY KEY,
+    match_name TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    file_mtime_ns INTEGER NOT NULL,
+    file_hash TEXT,
+    season TEXT NOT NULL,
+    match_date TEXT,
+    home_team TEXT COLLATE NOCASE,
+    away_team TEXT COLLATE NOCASE,
+    home_formation TEXT,
+    away_formation TEXT,
+    home_goals INTEGER,
+    away_goals INTEGER,
+    home_xg REAL,
+    away_xg REAL,
+    events INTEGER,
+    error TEXT,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS catalog_players (
+    filename TEXT NOT NULL,
+    team TEXT NOT NULL,
+    player TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (filename, team, player)
+);
+CREATE INDEX IF NOT EXISTS catalog_home_team ON catalog (home_team);
+CREATE INDEX IF NOT EXISTS catalog_away_team ON catalog (away_team);
+CREATE INDEX IF NOT EXISTS catalog_match_date ON catalog (match_date);
+CREATE INDEX IF NOT EXISTS catalog_season ON catalog (season, match_date);
+CREATE INDEX IF NOT EXISTS catalog_players_player ON catalog_players (player);
+"""
+
+_LISTED_COLUMNS = (
+    'filename', 'match_name', 'file_size', 'file_hash', 'season', 'match_date', 'home_team', 'away_team',
+    'home_formation', 'away_formation', 'home_goals', 'away_goals', 'home_xg', 'away_xg', 'events', 'error',
+    'indexed_at'
+)
+
+
+def parse_date(value: Optional[str]) -> Optional[str]:
+    """
+    Normalize a YYYY-MM-DD date (None or '' pass through as None).
+
+    Raises:
+        ValueError: If the value isn't a valid date
+    """
+    if not value:
+        return None
+    return datetime.date.fromisoformat(value).isoformat()
+
+
+def file_date(file_path: str) -> str:
+    """The (UTC) day a file was last modified, as YYYY-MM-DD."""
+    return datetime.datetime.fromtimestamp(os.path.getmtime(file_path), datetime.timezone.utc).date().isoformat()
+
+
+def describe_match(analyzer, file_path: str, events=None, analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Catalog fields of one match file: teams, formations, score, xG, event count, lineups and content hash.
+
+    Uses already loaded events and/or their analyze_match_stats result when
+    given. A file that can't be loaded is described with an ``error`` only.
+    """
+    record = {'file_hash': hash_file(file_path)}
+    if events is None:
+        events = analyzer.load_data(file_path)
+        if events is None:
+            record['error'] = "Failed to load match data"
+            return record
+    if analysis is None:
+        analysis = analyzer.analyze_match_stats(events)
+
+    details = analysis["match_details"]
+    stats = analysis["match_stats"]
+    record.update({
+        'home_team': details["home_team"],
+        'away_team': details["away_team"],
+        'home_formation': details["home_formation"],
+        'away_formation': details["away_formation"],
+        'home_goals': stats["goals"]["home"],
+        'away_goals': stats["goals"]["away"],
+        'home_xg': stats["xg"]["home"],
+        'away_xg': stats["xg"]["away"],
+        'events': analyzer.backend_for(events).event_count(events, exact=True),
+        'players': [(details[f"{side}_team"], player["player_name"])
+                    for side in ("home", "away") for player in analysis[f"{side}_player_stats"]]
+    })
+    return record
+
+
+class MatchCatalog:
+    """Indexed metadata of every stored match, for listing and search without opening match files."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation keeps the catalog safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add_match(self, file_path: str, record: Dict[str, Any], season: Optional[str] = None,
+                  match_date: Optional[str] = None):
+        """
+        Store (or replace) the catalog entry of a match file.
+
+        Args:
+            file_path: The stored match file; the entry is keyed by its file name
+            record: Output of describe_match
+            season: Season label (default: the existing entry's, or DEFAULT_SEASON)
+            match_date: YYYY-MM-DD (default: the existing entry's, or the file's date)
+        """
+        filename = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        with closing(self._connect()) as conn, conn:
+            existing = conn.execute("SELECT season, match_date FROM catalog WHERE filename = ?",
+                                    (filename,)).fetchone()
+            season = season or (existing["season"] if existing else DEFAULT_SEASON)
+            match_date = match_date or (existing["match_date"] if existing else file_date(file_path))
+            self._delete(conn, filename)
+            conn.execute(
+                f"INSERT INTO catalog VALUES ({', '.join('?' * 18)})",
+                (filename, match_name(filename), stat.st_size, stat.st_mtime_ns, record.get('file_hash'),
+                 season, match_date, record.get('home_team'), record.get('away_team'),
+                 record.get('home_formation'), record.get('away_formation'),
+                 record.get('home_goals'), record.get('away_goals'), record.get('home_xg'), record.get('away_xg'),
+                 record.get('events'), record.get('error'), time.time())
+            )
+            conn.executemany("INSERT OR IGNORE INTO catalog_players VALUES (?, ?, ?)",
+                             [(filename, team, player) for team, player in record.get('players', [])])
+
+    def move_match(self, filename: str, file_path: str) -> bool:
+        """
+        Point the entry of a match file at the same match stored under another name (e.g. compressed).
+
+        The statistics, season and date are kept; the file's name, size,
+        modification time and hash are updated. Returns False if the old file
+        had no entry.
+        """
+        new_filename = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        file_hash = hash_file(file_path)
+        with closing(self._connect()) as conn, conn:
+            if conn.execute("SELECT 1 FROM catalog WHERE filename = ?", (filename,)).fetchone() is None:
+                return False
+            if new_filename != filename:
+                self._delete(conn, new_filename)
+            conn.execute(
+                "UPDATE catalog SET filename = ?, match_name = ?, file_size = ?, file_mtime_ns = ?, file_hash = ? "
+                "WHERE filename = ?",
+                (new_filename, match_name(new_filename), stat.st_size, stat.st_mtime_ns, file_hash, filename)
+            )
+            conn.execute("UPDATE catalog_players SET filename = ? WHERE filename = ?", (new_filename, filename))
+        return True
+
+    def remove_match(self, filename: str):
+        """Drop the entry of a match file."""
+        with closing(self._connect()) as conn, conn:
+            self._delete(conn, filename)
+
+    def _delete(self, conn: sqlite3.Connection, filename: str):
+        for table in ("catalog", "catalog_players"):
+            conn.execute(f"DELETE FROM {table} WHERE filename = ?", (filename,))
+
+    def file_states(self) -> Dict[str, tuple]:
+        """(size, mtime_ns) of every catalogued file, to find files that changed on disk."""
+        with closing(self._connect()) as conn:
+            return {row["filename"]: (row["file_size"], row["file_mtime_ns"])
+                    for row in conn.execute("SELECT filename, file_size, file_mtime_ns FROM catalog")}
+
+    def search(self, team: Optional[str] = None, player: Optional[str] = None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None, season: Optional[str] = None,
+               sort: str = DEFAULT_SORT, descending: bool = True, page: int = 1,
+               per_page: int = 50) -> Dict[str, Any]:
+        """
+        One page of catalogued matches, filtered and sorted.
+
+        ``team`` and ``player`` match names exactly but case-insensitively, and
+        dates are inclusive YYYY-MM-DD bounds; every filter uses an index.
+
+        Returns:
+            Dict with the page's matches, the total number of matches found,
+            and the page, page size and page count
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort '{sort}', expected one of {', '.join(SORT_COLUMNS)}")
+        page = max(int(page), 1)
+        per_page = min(max(int(per_page), 1), MAX_PAGE_SIZE)
+
+        conditions, params = [], []
+        if team:
+            conditions.append("(home_team = ? OR away_team = ?)")
+            params += [team, team]
+        if player:
+            conditions.append("filename IN (SELECT filename FROM catalog_players WHERE player = ?)")
+            params.append(player)
+        if date_from:
+            conditions.append("match_date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("match_date <= ?")
+            params.append(date_to)
+        if season:
+            conditions.append("season = ?")
+            params.append(season)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # sort is validated above, so its column expression is safe to place in the query
+        direction = "DESC" if descending else "ASC"
+        query = f"""
+            SELECT {', '.join(_LISTED_COLUMNS)} FROM catalog {where}
+            ORDER BY {SORT_COLUMNS[sort]} {direction}, filename {direction} LIMIT ? OFFSET ?
+        """
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM catalog {where}", params).fetchone()[0]
+            matches = [dict(row) for row in conn.execute(query, params + [per_page, (page - 1) * per_page])]
+        return {
+            'matches': matches,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': -(-total // per_page)
+        }
+
+
+# Analyzer owned by each rescan worker process, created by _init_worker
+_worker_analyzer = None
+
+
+def _init_worker():
+    global _worker_analyzer
+    from football_analysis import FootballMatchAnalyzer
+    _worker_analyzer = FootballMatchAnalyzer()
+
+
+def _describe_file(file_path: str, analyzer=None) -> Dict[str, Any]:
+    """describe_match on a worker's analyzer (or the given one), with failures recorded as errors."""
+    try:
+        return describe_match(analyzer or _worker_analyzer, file_path)
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+
+
+def rescan(catalog: MatchCatalog, directory: str, analyzer=None, workers: int = 1, full: bool = False,
+           log: Optional[TextIO] = sys.stderr) -> Dict[str, int]:
+    """
+    Bring the catalog in line with the match files in a directory.
+
+    Files whose size and modification time match their entry are skipped
+    (all are described again with ``full``), new and changed files are
+    described on ``workers`` processes (or with ``analyzer`` in this process
+    when workers is 1), and entries of files that no longer exist are removed.
+    Seasons and dates of existing entries are kept.
+
+    Returns:
+        Counts of added/updated, unchanged, removed and failed files
+    """
+    files = {name: os.path.join(directory, name) for name in os.listdir(directory) if is_match_file(name)}
+    states = catalog.file_states()
+
+    removed = [name for name in states if name not in files]
+    for name in removed:
+        catalog.remove_match(name)
+
+    todo = []
+    for name, path in sorted(files.items()):
+        stat = os.stat(path)
+        if full or states.get(name) != (stat.st_size, stat.st_mtime_ns):
+            todo.append(path)
+
+    failed = 0
+
+    def store(path: str, record: Dict[str, Any]):
+        nonlocal failed
+        failed += 'error' in record
+        if os.path.exists(path):
+            catalog.add_match(path, record)
+        if log is not None:
+            status = f"error: {record['error']}" if 'error' in record else "ok"
+            print(f"{os.path.basename(path)}: {status}", file=log)
+
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(_describe_file, path): path for path in todo}
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # A worker that died (e.g. out of memory) only fails its own file
+                    record = {'error': f"{type(e).__name__}: {e}"}
+                store(futures[future], record)
+    else:
+        if analyzer is None:
+            from football_analysis import FootballMatchAnalyzer
+            analyzer = FootballMatchAnalyzer()
+        for path in todo:
+            store(path, _describe_file(path, analyzer))
+
+    summary = {'updated': len(todo), 'unchanged': len(files) - len(todo), 'removed': len(removed),
+               'failed': failed}
+    if log is not None:
+        print(f"Catalog: {summary['updated']} added or updated ({failed} failed), "
+              f"{summary['unchanged']} unchanged, {summary['removed']} removed", file=log)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the catalog of stored match files")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    rescan_parser = subparsers.add_parser('rescan', help="Add new and changed files, drop removed ones")
+    rescan_parser.add_argument("directory", help="Directory of match files, e.g. uploads/")
+    rescan_parser.add_argument("--db", default="match_catalog.sqlite", help="SQLite database path")
+    rescan_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    rescan_parser.add_argument("--full", action="store_true", help="Describe every file again")
+    args = parser.parse_args()
+
+    summary = rescan(MatchCatalog(args.db), args.directory, workers=args.workers, full=args.full)
+    raise SystemExit(1 if summary['failed'] else 0)
@@ -0,0 +1,352 @@
+"""
+Match Storage
+-------------
+Match files stored as plain or compressed JSON.
+
+StatsBomb JSON is repetitive and compresses roughly 10x. A match can be stored
+as ``<match>.json``, ``<match>.json.gz`` (gzip) or ``<match>.json.zst``
+(Zstandard, with the optional ``zstandard`` package). The compression follows
+from the suffix, and ``open_match`` decompresses while the parser reads, so the
+loaders stream compressed files exactly like plain ones. Less data has to come
+off disk, which matters most on slow or shared storage.
+
+Existing files are compressed in parallel with:
+    python match_storage.py compress uploads/ --format gzip --workers 8
+
+The command keeps each match's columnar copy (``.cols``) valid by rewriting
+it for the compressed file, and points the match's entries in the match
+catalog and season index (``--catalog``, ``--season-index``) at the new file.
+``--format none`` turns compressed files back into plain JSON.
+
+A running server keeps its in-memory caches of the old file names until they
+are evicted, and requests for an old name get 404; run the command while the
+server is stopped or idle.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import BinaryIO, Dict, Any, List, Optional, TextIO, Tuple
+import gzip
+import io
+import os
+import struct
+import sys
+import time
+
+# Stored suffix of each compression (None is plain JSON)
+MATCH_SUFFIXES = {None: '.json', 'gzip': '.json.gz', 'zstd': '.json.zst'}
+COMPRESSIONS = ('gzip', 'zstd')
+
+# Compression levels used when writing; gzip 6 is its default, zstd 10 compresses
+# StatsBomb JSON about as well as gzip 9 while staying fast to write
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 10}
+
+# Assumed size ratio of JSON to its compressed file when the original size isn't recorded
+ESTIMATED_COMPRESSION_RATIO = 10
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def match_compression(path: str) -> Optional[str]:
+    """Compression of a match file, from its suffix (None for plain JSON or unknown suffixes)."""
+    lower = path.lower()
+    for compression in COMPRESSIONS:
+        if lower.endswith(MATCH_SUFFIXES[compression]):
+            return compression
+    return None
+
+
+def is_match_file(name: str) -> bool:
+    """Whether a file name is a (plain or compressed) match file."""
+    return name.lower().endswith(tuple(MATCH_SUFFIXES.values()))
+
+
+def match_name(path: str) -> str:
+    """A match's file name as plain JSON, e.g. ``19802.json`` for ``uploads/19802.json.gz``."""
+    name = os.path.basename(path)
+    compression = match_compression(name)
+    return name[:-len(MATCH_SUFFIXES[compression])] + '.json' if compression else name
+
+
+def stored_path(directory: str, name: str, compression: Optional[str]) -> str:
+    """Path of match `name` (any suffix) stored in directory with the given compression."""
+    return os.path.join(directory, match_name(name)[:-len('.json')] + MATCH_SUFFIXES[compression])
+
+
+def match_variants(path: str) -> List[str]:
+    """Existing files of the same match with any compression, including path itself."""
+    directory = os.path.dirname(path)
+    return [variant for variant in (stored_path(directory, path, compression) for compression in MATCH_SUFFIXES)
+            if os.path.exists(variant)]
+
+
+def remove_match(path: str):
+    """Delete a match file and its columnar copy."""
+    from event_table import columns_path
+    for stale in (path, columns_path(path)):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+
+def check_compression(compression: Optional[str]) -> Optional[str]:
+    """
+    Validate a storage compression name ('none' or '' mean plain JSON).
+
+    Raises:
+        ValueError: If the name is unknown or its package isn't installed
+    """
+    if compression in (None, '', 'none'):
+        return None
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}', expected none, gzip or zstd")
+    if compression == 'zstd':
+        _zstandard()
+    return compression
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("Zstandard files need the zstandard package")
+    return zstandard
+
+
+def decompressing_reader(source: BinaryIO, compression: Optional[str]) -> BinaryIO:
+    """A binary reader of source's decompressed content."""
+    if compression is None:
+        return source
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=source, mode='rb')
+    if compression == 'zstd':
+        return _zstandard().ZstdDecompressor().stream_reader(source, read_size=CHUNK_SIZE)
+    raise ValueError(f"Unknown compression '{compression}'")
+
+
+def compressing_writer(sink: BinaryIO, compression: Optional[str], level: Optional[int] = None,
+                       size: Optional[int] = None) -> BinaryIO:
+    """
+    A binary writer that compresses into sink; closing it finishes the stream but leaves sink open.
+
+    ``size`` is the uncompressed size when known in advance, recorded in zstd frames.
+    """
+    if compression is None:
+        return _Unclosed(sink)
+    level = level if level is not None else DEFAULT_LEVELS[compression]
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=level, mtime=0)
+    if compression == 'zstd':
+        compressor = _zstandard().ZstdCompressor(level=level)
+        return compressor.stream_writer(sink, size=size if size is not None else -1, closefd=False)
+    raise ValueError(f"Unknown compression '{compression}'")
+
+
+class _Unclosed(io.RawIOBase):
+    """Writer passing data through to a file it doesn't close."""
+
+    def __init__(self, sink: BinaryIO):
+        self.sink = sink
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self.sink.write(data)
+
+
+def open_match(path: str) -> TextIO:
+    """Open a match file for reading as text, decompressing on the fly."""
+    compression = match_compression(path)
+    if compression is None:
+        return open(path, 'r', encoding='utf-8')
+    raw = open(path, 'rb')
+    try:
+        return io.TextIOWrapper(io.BufferedReader(decompressing_reader(raw, compression), CHUNK_SIZE),
+                                encoding='utf-8')
+    except BaseException:
+        raw.close()
+        raise
+
+
+def data_size(path: str) -> int:
+    """
+    Size of a match's JSON in bytes, which the analysis cost follows, without decompressing it.
+
+    Read from the gzip trailer or zstd frame header when recorded there, and
+    estimated from the compressed size otherwise.
+    """
+    file_bytes = os.path.getsize(path)
+    compression = match_compression(path)
+    if compression is None:
+        return file_bytes
+
+    recorded = -1
+    with open(path, 'rb') as f:
+        if compression == 'gzip' and file_bytes >= 18:
+            # ISIZE: the uncompressed size modulo 2**32, in the last four bytes
+            f.seek(-4, os.SEEK_END)
+            recorded, = struct.unpack('<I', f.read(4))
+        elif compression == 'zstd':
+            try:
+                recorded = _zstandard().frame_content_size(f.read(18))
+            except Exception:
+                recorded = -1
+    # A wrapped (over 4GB) or missing size is replaced by the estimate
+    estimate = file_bytes * ESTIMATED_COMPRESSION_RATIO
+    return recorded if recorded >= file_bytes else estimate
+
+
+def convert_match(path: str, compression: Optional[str], level: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Rewrite a match file with another compression and remove the original.
+
+    The new file is written next to the original and renamed into place, and
+    an up-to-date columnar copy is rewritten for it (from the memory-mapped
+    columns, without parsing the JSON again).
+
+    Returns:
+        Summary with the old and new path and the new file's size
+    """
+    from event_table import EventTable
+
+    target = stored_path(os.path.dirname(path), path, compression)
+    if target == path:
+        return {'file': path, 'target': path, 'stored_bytes': os.path.getsize(path), 'skipped': True}
+
+    table = EventTable.load_columns(path)
+    tmp_path = f"{target}.tmp{os.getpid()}"
+    try:
+        with open(path, 'rb') as raw, open(tmp_path, 'wb') as sink:
+            reader = decompressing_reader(raw, match_compression(path))
+            size = os.path.getsize(path) if match_compression(path) is None else None
+            with compressing_writer(sink, compression, level, size) as writer:
+                while True:
+                    chunk = reader.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if table is not None:
+        table.save_columns(target)
+        del table
+    remove_match(path)
+    return {'file': path, 'target': target, 'stored_bytes': os.path.getsize(target), 'skipped': False}
+
+
+def update_indexes(moved: List[Tuple[str, str]], catalog_db: Optional[str] = None,
+                   season_index_db: Optional[str] = None, log: TextIO = sys.stderr):
+    """
+    Point the match catalog and season index entries of moved match files at their new paths.
+
+    Databases that don't exist are skipped.
+    """
+    from match_catalog import MatchCatalog
+    from season_index import SeasonIndex
+
+    catalog = MatchCatalog(catalog_db) if catalog_db and os.path.exists(catalog_db) else None
+    season_index = SeasonIndex(season_index_db) if season_index_db and os.path.exists(season_index_db) else None
+    catalogued = 0
+    for old_path, new_path in moved:
+        if catalog is not None:
+            catalogued += catalog.move_match(os.path.basename(old_path), new_path)
+        if season_index is not None:
+            season_index.set_file_path(match_name(new_path), new_path)
+    if catalog is not None:
+        print(f"Updated {catalogued} catalog entries in {catalog_db}", file=log)
+    if season_index is not None:
+        print(f"Updated season index file paths in {season_index_db}", file=log)
+
+
+def _convert_file(path: str, compression: Optional[str], level: Optional[int]) -> Dict[str, Any]:
+    """Convert one file in a worker, returning an error record instead of raising."""
+    start = time.perf_counter()
+    original_bytes = os.path.getsize(path)
+    try:
+        record = convert_match(path, compression, level)
+    except Exception as e:
+        return {'file': path, 'error': f"{type(e).__name__}: {e}"}
+    record['original_bytes'] = original_bytes
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def convert_directory(files: List[str], compression: Optional[str], level: Optional[int] = None,
+                      workers: Optional[int] = None, log: TextIO = sys.stderr) -> Dict[str, Any]:
+    """
+    Convert match files to `compression` on a process pool.
+
+    Returns:
+        Summary with file counts, bytes before and after, elapsed time and the
+        (old path, new path) pairs of the files that were moved
+    """
+    workers = workers or os.cpu_count() or 1
+    converted = failed = 0
+    moved = []
+    before = after = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_convert_file, path, compression, level): path for path in files}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {'file': futures[future], 'error': f"{type(e).__name__}: {e}"}
+
+            done = converted + failed + 1
+            if 'error' in record:
+                failed += 1
+                print(f"[{done}/{len(files)}] error {record['file']}: {record['error']}", file=log)
+                continue
+            converted += 1
+            if not record['skipped']:
+                moved.append((record['file'], record['target']))
+            before += record['original_bytes']
+            after += record['stored_bytes']
+            status = 'unchanged' if record['skipped'] else f"-> {record['target']}"
+            print(f"[{done}/{len(files)}] {record['file']} {status} "
+                  f"({record['original_bytes'] / 1e6:.1f}MB -> {record['stored_bytes'] / 1e6:.1f}MB)", file=log)
+
+    summary = {
+        'files': len(files),
+        'converted': converted,
+        'failed': failed,
+        'bytes_before': before,
+        'bytes_after': after,
+        'seconds': round(time.perf_counter() - start, 3),
+        'moved': moved
+    }
+    ratio = f" ({after / before:.0%} of the original size)" if before else ""
+    print(f"Converted {converted} files ({failed} failed) in {summary['seconds']}s with {workers} workers: "
+          f"{before / 1e6:.1f}MB -> {after / 1e6:.1f}MB{ratio}", file=log)
+    return summary
+
+
+if __name__ == '__main__':
+    import argparse
+    from batch_analysis import find_match_files
+
+    parser = argparse.ArgumentParser(description="Convert stored match files between plain and compressed JSON")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compress = subparsers.add_parser('compress', help="Compress (or with --format none, decompress) match files")
+    compress.add_argument('target', help="Directory or glob pattern of match files")
+    compress.add_argument('--format', default='gzip', choices=('gzip', 'zstd', 'none'), help="Storage format")
+    compress.add_argument('--level', type=int, help="Compression level (default: gzip 6, zstd 10)")
+    compress.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+    compress.add_argument('--catalog', default='match_catalog.sqlite',
+                          help="Match catalog to update, if it exists (default: match_catalog.sqlite)")
+    compress.add_argument('--season-index', default='season_index.sqlite',
+                          help="Season index to update, if it exists (default: season_index.sqlite)")
+    args = parser.parse_args()
+
+    try:
+        target_compression = check_compression(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    summary = convert_directory(find_match_files(args.target), target_compression, args.level, args.workers)
+    update_indexes(summary['moved'], args.catalog, args.season_index)
+    raise SystemExit(1 if summary['failed'] else 0)
@@ -0,0 +1,155 @@
+"""
+Match Upload
+------------
+Stream an uploaded match file to disk with constant memory, whatever its size.
+
+The upload is read in fixed-size chunks and, for ``.json.gz`` and ``.json.zst``
+files, decompressed on the fly. The decompressed chunks are fed to the same
+incremental JSON array decoder the analyzer loads matches with, so the event
+array is validated while it arrives: the decoder holds only the current event
+and one chunk, and an event larger than ``MAX_EVENT_BYTES`` (far above any real
+StatsBomb event) fails the upload, so a malformed or hostile upload can't make
+the decoder buffer the rest of the body. Meanwhile the upload is written to a temporary file next to the
+destination in the storage format (see ``match_storage``), copying the
+uploaded bytes as they are when the formats match and (re)compressing them
+otherwise. The temporary file replaces the destination only once the whole
+array has been validated, so a failed upload never leaves a partial match
+behind.
+
+Only a raw request body (``PUT /api/upload/<filename>``) reaches
+``receive_match`` as it arrives. A multipart form upload is spooled by werkzeug
+to a temporary file while ``request.files`` is parsed, and streamed from there.
+"""
+
+from typing import BinaryIO, Optional, Tuple
+import gzip
+import io
+import os
+import tempfile
+import zlib
+
+from werkzeug.utils import secure_filename
+
+from event_table import iter_json_array
+from match_storage import check_compression, compressing_writer, decompressing_reader, match_compression, match_name
+
+# Size of the chunks read from the upload and decoded by the validator
+CHUNK_SIZE = 64 * 1024
+
+# Largest accepted single event (in characters of JSON); StatsBomb events are a few KB
+MAX_EVENT_BYTES = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised when an uploaded file isn't a valid (optionally compressed) JSON array of events."""
+
+
+class UploadTooLarge(UploadError):
+    """Raised when an upload's decompressed size exceeds the configured limit."""
+
+
+def upload_target(filename: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Match name (as plain JSON) and compression of an uploaded file name.
+
+    Returns None for names that aren't match files. The name is made safe for
+    the file system, e.g. ``"La Liga 1.json.gz"`` is match ``"La_Liga_1.json"``
+    uploaded with gzip.
+    """
+    name = secure_filename(filename or '')
+    plain_name = match_name(name)
+    if not plain_name.lower().endswith('.json') or len(plain_name) <= len('.json'):
+        return None
+    return plain_name, match_compression(name)
+
+
+def _decode_errors(compression: Optional[str]) -> Tuple[type, ...]:
+    # JSON and UTF-8 decoding errors are ValueErrors; truncated or corrupt archives raise the others
+    errors = (ValueError, EOFError, zlib.error, gzip.BadGzipFile)
+    if compression == 'zstd':
+        import zstandard
+        errors += (zstandard.ZstdError,)
+    return errors
+
+
+class _CopyingReader(io.RawIOBase):
+    """Binary reader that copies everything read from `source` to `sink` (if any), up to `max_bytes` in total."""
+
+    def __init__(self, source: BinaryIO, sink: Optional[BinaryIO], max_bytes: Optional[int]):
+        self.source = source
+        self.sink = sink
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.source.read(len(buffer))
+        if not data:
+            return 0
+        self.bytes_read += len(data)
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            raise UploadTooLarge(f"Match data exceeds the upload limit of {self.max_bytes} bytes")
+        if self.sink is not None:
+            self.sink.write(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def receive_match(source: BinaryIO, dest_path: str, compression: Optional[str] = None,
+                  max_bytes: Optional[int] = None, storage: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Stream an uploaded match to dest_path, validating it as it is written.
+
+    Args:
+        source: Binary stream of the upload (e.g. the request body or form file)
+        dest_path: Where the match is stored; replaced only on success
+        compression: Compression of the upload: None, 'gzip' or 'zstd'
+        max_bytes: Limit on the decompressed size (None for no limit)
+        storage: Compression of the stored file
+
+    Returns:
+        Tuple of the number of events and the decompressed size in bytes
+
+    Raises:
+        UploadTooLarge: If the decompressed match exceeds max_bytes
+        UploadError: If the upload isn't a valid JSON array of event objects, or
+            needs a compression package the server doesn't have
+    """
+    try:
+        check_compression(compression)
+        check_compression(storage)
+    except ValueError as e:
+        raise UploadError(str(e))
+
+    fd, temp_path = tempfile.mkstemp(prefix='.upload-', suffix='.part', dir=os.path.dirname(dest_path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as sink:
+            if storage == compression:
+                # Stored as uploaded: copy the raw bytes, decompressing only to validate
+                reader = _CopyingReader(decompressing_reader(_CopyingReader(source, sink, None), compression),
+                                        None, max_bytes)
+                writer = None
+            else:
+                writer = compressing_writer(sink, storage)
+                reader = _CopyingReader(decompressing_reader(source, compression), writer, max_bytes)
+            decode_errors = _decode_errors(compression)
+            text = io.TextIOWrapper(io.BufferedReader(reader, CHUNK_SIZE), encoding='utf-8')
+            try:
+                events = 0
+                # Strict decoding reads (and so stores) the upload to its end
+                for event in iter_json_array(text, CHUNK_SIZE, strict=True, max_element_size=MAX_EVENT_BYTES):
+                    if not isinstance(event, dict):
+                        raise UploadError(f"Element {events + 1} of the event array is not an object")
+                    events += 1
+            except decode_errors as e:
+                raise UploadError(f"Invalid match file: {e}")
+            if writer is not None:
+                writer.close()
+        os.replace(temp_path, dest_path)
+        return events, reader.bytes_read
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,88 @@
+"""
+Render Executor
+---------------
+Runs figure renders from rendering.py on a pool of worker processes.
+
+Matplotlib rendering is CPU-bound and holds the GIL, so the figures of one
+analysis (and renders for concurrent requests) only use several cores when
+they run in separate processes. A render job is a module-level function of
+rendering.py plus its arguments, which are the small, already filtered arrays
+and dicts the figure needs, never the events themselves.
+
+Workers are spawned rather than forked, so they never inherit the server's
+threads and locks, and they import matplotlib once when they start. A spawned
+worker re-runs the script that started the parent as ``__mp_main__``, so that
+script must not create servers, threads or stores at import time under that
+name (server.py skips its shared state there). The same
+function and arguments produce the same PNG bytes in any process, so results
+don't depend on which worker rendered them. With one worker (the default on a
+single-core machine) jobs run serially in the calling thread.
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+import multiprocessing
+import os
+import threading
+
+
+def _init_worker():
+    """Import the rendering stack once per worker process instead of on its first job."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.backends.backend_agg  # noqa: F401
+    import rendering  # noqa: F401
+
+
+class RenderExecutor:
+    """Process pool for render jobs, or serial rendering when there is a single worker."""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = max(1, workers if workers is not None else (os.cpu_count() or 1))
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def parallel(self) -> bool:
+        return self.workers > 1
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker)
+            return self._pool
+
+    def submit(self, func: Callable[..., Any], *args) -> Future:
+        """Start a render job; func must be a module-level function so it can be pickled."""
+        if not self.parallel:
+            future = Future()
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        pool = self._get_pool()
+        try:
+            return pool.submit(func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the pool once and retry
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False)
+            return self._get_pool().submit(func, *args)
+
+    def run(self, func: Callable[..., Any], *args) -> Any:
+        """Run a render job and wait for its result."""
+        return self.submit(func, *args).result()
+
+    def close(self):
+        """Shut down the worker processes, if any were started."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
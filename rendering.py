@@ -0,0 +1,332 @@
+"""
+Figure Rendering
+----------------
+Fast PNG rendering of the match overview, shot maps and player heatmaps.
+
+Figures are built with the object-oriented matplotlib API (a standalone Figure
+drawn by the Agg canvas), so rendering keeps no global pyplot state and is safe
+to run from several threads. What makes it fast:
+
+- The pitch is rasterized once per figure size and style and cached; every
+  pitch figure copies that raster into the Agg buffer and draws only the
+  match-specific artists on top, instead of rebuilding ~20 line and patch
+  artists.
+- Shots and events are drawn with one vectorized scatter call.
+- Figures use a fixed layout (titles are figure text at a fixed position)
+  instead of ``bbox_inches='tight'``, so each figure is laid out and drawn once.
+- Figures are opaque, so PNGs are encoded as RGB with a fast zlib level
+  (PNG_COMPRESS_LEVEL).
+- The overview has no axes at all; its text is placed in figure coordinates.
+
+The render functions take plain arrays and dicts, not events, so they can run
+anywhere the data can be sent (see football_analysis.py for the callers).
+"""
+
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+import base64
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+# Bump when a change here alters rendered output, so cached figures are re-rendered
+RENDERER_VERSION = 1
+
+PITCH_LENGTH, PITCH_WIDTH = 120, 80
+
+# Default heatmap grid (cells along the length and width) and smoothing
+HEATMAP_BINS = (12, 8)
+HEATMAP_SIGMA = 1.5
+
+# Visible pitch area in data coordinates, with a margin around the touchlines
+PITCH_XLIM = (-5, PITCH_LENGTH + 5)
+PITCH_YLIM = (-5, PITCH_WIDTH + 5)
+
+DPI = 100
+PNG_COMPRESS_LEVEL = 3
+PITCH_FIGSIZE = (10, 7)
+OVERVIEW_FIGSIZE = (10, 6)
+
+# Axes rectangles (left, bottom, width, height) in figure fractions; the heatmap
+# keeps the same pitch rectangle and puts its colorbar in the right margin
+PITCH_RECT = (0.04, 0.08, 0.84, 0.84)
+COLORBAR_RECT = (0.90, 0.08, 0.025, 0.84)
+TITLE_POSITION = (PITCH_RECT[0] + PITCH_RECT[2] / 2, PITCH_RECT[1] + PITCH_RECT[3] + 0.015)
+
+# Pitch rasters keyed by (figure size, dpi, axes rectangle, pitch color, line color)
+_backgrounds = {}
+_backgrounds_lock = threading.Lock()
+
+
+def _new_figure(**kwargs):
+    """Create a standalone figure that is not registered with pyplot."""
+    from matplotlib.figure import Figure
+    return Figure(**kwargs)
+
+
+def figure_to_png(fig, background: Optional[np.ndarray] = None) -> bytes:
+    """Draw a figure with the Agg renderer, optionally over a cached raster, and return PNG bytes."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from PIL import Image
+
+    canvas = FigureCanvasAgg(fig)
+    if background is None:
+        canvas.draw()
+        renderer = canvas.get_renderer()
+    else:
+        # Start from the cached pixels; the figure patch would paint over them
+        renderer = canvas.get_renderer()
+        np.asarray(renderer.buffer_rgba())[...] = background
+        fig.patch.set_visible(False)
+        fig.draw(renderer)
+
+    image = Image.frombuffer('RGBA', (int(renderer.width), int(renderer.height)),
+                             renderer.buffer_rgba(), 'raw', 'RGBA', 0, 1).convert('RGB')
+    with BytesIO() as buffer:
+        image.save(buffer, format='png', compress_level=PNG_COMPRESS_LEVEL)
+        return buffer.getvalue()
+
+
+def png_to_base64(png: bytes) -> str:
+    """Encode PNG bytes for embedding in HTML."""
+    return base64.b64encode(png).decode('utf-8')
+
+
+def style_hash(style: Dict[str, Any]) -> str:
+    """Hash of a visual style and the renderer version, for keying cached figures."""
+    payload = json.dumps([RENDERER_VERSION, sorted(style.items())], default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def draw_pitch(ax, pitch_color, line_color):
+    """Draw a football pitch on a matplotlib axis."""
+    from matplotlib.collections import LineCollection
+    from matplotlib.patches import Circle
+
+    ax.set_facecolor(pitch_color)
+
+    # Outline, halfway line, penalty areas and goal areas as a single collection
+    segments = [
+        [(0, 0), (0, PITCH_WIDTH), (PITCH_LENGTH, PITCH_WIDTH), (PITCH_LENGTH, 0), (0, 0)],
+        [(PITCH_LENGTH / 2, 0), (PITCH_LENGTH / 2, PITCH_WIDTH)]
+    ]
+    for goal_line, direction in ((0, 1), (PITCH_LENGTH, -1)):
+        for depth, top, bottom in ((16.5, 24, 56), (5.5, 36, 44)):
+            edge = goal_line + direction * depth
+            segments.append([(goal_line, top), (edge, top), (edge, bottom), (goal_line, bottom)])
+    ax.add_collection(LineCollection(segments, colors=[line_color]))
+
+    # Center circle, center spot and penalty spots
+    ax.add_patch(Circle((PITCH_LENGTH / 2, PITCH_WIDTH / 2), 9.15, color=line_color, fill=False))
+    for spot in ((PITCH_LENGTH / 2, PITCH_WIDTH / 2), (11, PITCH_WIDTH / 2), (PITCH_LENGTH - 11, PITCH_WIDTH / 2)):
+        ax.add_patch(Circle(spot, 0.5, color=line_color))
+
+    ax.set_xlim(*PITCH_XLIM)
+    ax.set_ylim(*PITCH_YLIM)
+    ax.axis('off')
+    return ax
+
+
+def pitch_background(pitch_color, line_color, figsize: Tuple[float, float] = PITCH_FIGSIZE,
+                     dpi: int = DPI, rect: Tuple[float, ...] = PITCH_RECT) -> np.ndarray:
+    """Return the cached RGBA raster of an empty pitch figure, rendering it on first use."""
+    key = (tuple(figsize), dpi, tuple(rect), pitch_color, line_color)
+    with _backgrounds_lock:
+        background = _backgrounds.get(key)
+    if background is not None:
+        return background
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = _new_figure(figsize=figsize, dpi=dpi, facecolor=pitch_color)
+    canvas = FigureCanvasAgg(fig)
+    draw_pitch(fig.add_axes(rect), pitch_color, line_color)
+    canvas.draw()
+    background = np.array(canvas.buffer_rgba())
+    background.flags.writeable = False
+
+    with _backgrounds_lock:
+        return _backgrounds.setdefault(key, background)
+
+
+def _pitch_figure(style: Dict[str, Any], title: Optional[str] = None):
+    """Create a pitch figure for drawing over the cached background; returns the figure and pitch axes."""
+    fig = _new_figure(figsize=PITCH_FIGSIZE, dpi=DPI, facecolor=style['pitch_color'])
+
+    # A transparent axes over the same rectangle keeps data coordinates aligned with the raster
+    ax = fig.add_axes(PITCH_RECT)
+    ax.patch.set_visible(False)
+    ax.set_xlim(*PITCH_XLIM)
+    ax.set_ylim(*PITCH_YLIM)
+    ax.axis('off')
+
+    if title:
+        fig.text(*TITLE_POSITION, title, ha='center', va='bottom',
+                 color=style['text_color'], fontsize=16, fontweight='bold')
+    return fig, ax
+
+
+def _pitch_png(fig, style: Dict[str, Any]) -> bytes:
+    """Render a figure created by _pitch_figure over the cached pitch raster."""
+    return figure_to_png(fig, pitch_background(style['pitch_color'], style['line_color']))
+
+
+def render_match_overview(match_details: Dict[str, Any], match_stats: Dict[str, Any],
+                          style: Dict[str, Any]) -> bytes:
+    """Render the score, formations and key statistics of a match."""
+    from matplotlib.lines import Line2D
+
+    home_team = match_details["home_team"]
+    away_team = match_details["away_team"]
+
+    fig = _new_figure(figsize=OVERVIEW_FIGSIZE, dpi=DPI, facecolor='white')
+
+    def text(x, y, value, **kwargs):
+        # Positions are fractions of the text area, which leaves a small margin around the figure
+        fig.text(0.05 + 0.9 * x, 0.02 + 0.96 * y, value, ha='center', **kwargs)
+
+    text(0.5, 0.85, f"{home_team} {match_stats['goals']['home']} - {match_stats['goals']['away']} {away_team}",
+         fontsize=18, weight='bold')
+    text(0.5, 0.75, f"Formations: {match_details['home_formation']} vs {match_details['away_formation']}",
+         fontsize=14)
+
+    stats = [
+        ("Possession", f"{match_stats['possession']['home']}%", f"{match_stats['possession']['away']}%", 0.65),
+        ("Shots", str(match_stats['shots']['home']), str(match_stats['shots']['away']), 0.55),
+        ("Expected Goals (xG)", f"{match_stats['xg']['home']}", f"{match_stats['xg']['away']}", 0.45),
+        ("Total Passes", str(match_stats['passes']['home']), str(match_stats['passes']['away']), 0.35),
+        ("Pass Completion", f"{match_stats['passes']['home_completion']}%",
+         f"{match_stats['passes']['away_completion']}%", 0.25)
+    ]
+    for label, home_val, away_val, y_pos in stats:
+        text(0.5, y_pos, label, fontsize=12)
+        text(0.3, y_pos - 0.05, home_val, fontsize=12, color=style['home_color'])
+        text(0.7, y_pos - 0.05, away_val, fontsize=12, color=style['away_color'])
+
+    fig.legend(handles=[
+        Line2D([0], [0], marker='o', color='w', markerfacecolor=style['home_color'], markersize=10, label=home_team),
+        Line2D([0], [0], marker='o', color='w', markerfacecolor=style['away_color'], markersize=10, label=away_team)
+    ], loc='lower center', bbox_to_anchor=(0.5, 0.03))
+
+    return figure_to_png(fig)
+
+
+def render_shot_map(team_name: str, x: np.ndarray, y: np.ndarray, xg: np.ndarray, goal: np.ndarray,
+                    style: Dict[str, Any]) -> bytes:
+    """Render a team's shots, sized by xG and colored by outcome."""
+    from matplotlib.lines import Line2D
+
+    fig, ax = _pitch_figure(style, f"{team_name} - Shot Map")
+
+    xg = np.asarray(xg, dtype=np.float64)
+    goal = np.asarray(goal, dtype=bool)
+    if len(x):
+        colors = np.where(goal, style['shot_goal_color'], style['shot_miss_color'])
+        ax.scatter(x, y, s=120 + xg * 1000, alpha=0.8, c=colors, edgecolors='white', linewidths=1.5)
+
+    # xG labels for significant chances
+    for label_x, label_y, label_xg in zip(*(np.asarray(v)[xg > 0.1].tolist() for v in (x, y, xg))):
+        ax.text(label_x, label_y, f"{label_xg:.2f}", ha='center', va='center',
+                color='white', fontsize=9, fontweight='bold')
+
+    legend = ax.legend(handles=[
+        Line2D([0], [0], marker='o', color='w', markerfacecolor=style['shot_goal_color'], markersize=10, label='Goal'),
+        Line2D([0], [0], marker='o', color='w', markerfacecolor=style['shot_miss_color'], markersize=10,
+               label='No Goal')
+    ], loc='lower center')
+    for text in legend.get_texts():
+        text.set_color(style['text_color'])
+
+    fig.text(0.5, 0.02, f"Total Shots: {len(x)} | Goals: {int(goal.sum())}",
+             ha="center", color=style['text_color'], fontsize=12)
+    return _pitch_png(fig, style)
+
+
+def heatmap_grid(x: np.ndarray, y: np.ndarray, bins: Tuple[int, int] = HEATMAP_BINS,
+                 sigma: float = HEATMAP_SIGMA) -> np.ndarray:
+    """Smoothed 2D histogram of event locations over the pitch."""
+    from scipy.ndimage import gaussian_filter
+    grid, _, _ = np.histogram2d(x, y, bins=bins, range=[[0, PITCH_LENGTH], [0, PITCH_WIDTH]])
+    return gaussian_filter(grid, sigma=sigma)
+
+
+def smooth_grids(counts: np.ndarray, sigma: float = HEATMAP_SIGMA) -> np.ndarray:
+    """
+    Smooth a stack of occupancy grids (shape (n, bins_x, bins_y)) in one call.
+
+    Each grid equals ``heatmap_grid`` of the same locations: the filter runs
+    along the two pitch axes only, never across grids.
+    """
+    from scipy.ndimage import gaussian_filter
+    return gaussian_filter(counts.astype(np.float64), sigma=(0, sigma, sigma))
+
+
+def _draw_level_bar(fig, levels: np.ndarray, colors: np.ndarray, label: str, style: Dict[str, Any]):
+    """
+    Draw a colorbar for filled contour levels in the COLORBAR_RECT margin.
+
+    A matplotlib colorbar builds a full Axes with tick machinery, which costs
+    more than the rest of the heatmap; this draws one band per level and a few
+    labels directly in figure coordinates.
+    """
+    from matplotlib.collections import LineCollection, PolyCollection
+    from matplotlib.ticker import MaxNLocator
+
+    left, bottom, width, height = COLORBAR_RECT
+    low, high = float(levels[0]), float(levels[-1])
+    span = (high - low) or 1.0
+
+    def to_y(value):
+        return bottom + (value - low) / span * height
+
+    bands = [[(left, to_y(a)), (left + width, to_y(a)), (left + width, to_y(b)), (left, to_y(b))]
+             for a, b in zip(levels[:-1], levels[1:])]
+    fig.add_artist(PolyCollection(bands, facecolors=colors, edgecolors='none', transform=fig.transFigure))
+
+    ticks = [t for t in MaxNLocator(nbins=6).tick_values(low, high) if low <= t <= high]
+    fig.add_artist(LineCollection([[(left + width, to_y(t)), (left + width + 0.006, to_y(t))] for t in ticks],
+                                  colors=style['text_color'], linewidths=0.8, transform=fig.transFigure))
+    for tick in ticks:
+        fig.text(left + width + 0.01, to_y(tick), f"{tick:g}", va='center', color=style['text_color'], fontsize=10)
+    fig.text(left + width + 0.06, bottom + height / 2, label, rotation=90, va='center', ha='center',
+             color=style['text_color'], fontsize=10)
+
+
+def render_player_heatmap(player_name: str, team_name: str, x: np.ndarray, y: np.ndarray, is_home: bool,
+                          style: Dict[str, Any], grid: Optional[np.ndarray] = None) -> bytes:
+    """
+    Render the position heatmap of one player.
+
+    ``grid`` is an already smoothed density grid (see heatmap_grid); it is
+    computed from x/y when not given.
+    """
+    team_color = style['home_color'] if is_home else style['away_color']
+
+    if len(x) == 0:
+        fig, ax = _pitch_figure(style)
+        ax.text(60, 40, f"No position data for {player_name}",
+                ha='center', va='center', color=style['text_color'], fontsize=16)
+        return _pitch_png(fig, style)
+
+    fig, ax = _pitch_figure(style, f"{player_name} - Position Heatmap")
+
+    if len(x) > 5:
+        if grid is None:
+            grid = heatmap_grid(x, y)
+        x_pos, y_pos = np.meshgrid(np.linspace(0, PITCH_LENGTH, grid.shape[0]),
+                                   np.linspace(0, PITCH_WIDTH, grid.shape[1]))
+        cmap = style['heatmap_home_cmap'] if is_home else style['heatmap_away_cmap']
+        contour = ax.contourf(x_pos, y_pos, grid.T, cmap=cmap, alpha=0.75, levels=20)
+
+        _draw_level_bar(fig, contour.levels, contour.get_facecolor(), 'Event Density', style)
+    else:
+        # Too few points for a density estimate; highlight the individual events
+        ax.scatter(x, y, c=team_color, s=100, alpha=0.7, edgecolors='white')
+        ax.text(60, 10, f"Limited data points ({len(x)})",
+                ha='center', va='center', color=style['text_color'], fontsize=10)
+
+    ax.scatter(x, y, c=team_color, s=30, alpha=0.5, edgecolors='white')
+    fig.text(0.5, 0.02, f"Events: {len(x)} | Team: {team_name}", ha="center", color=style['text_color'], fontsize=12)
+    return _pitch_png(fig, style)
+
@@ -0,0 +1,240 @@
+"""
+Season Aggregate Index
+----------------------
+Persistent SQLite store of per-match team and player rows (passes, completed
+passes, shots, goals, xG) for season totals and leaderboards.
+
+Each match is indexed once, when it is uploaded or replaced: its previous rows
+are deleted and the new ones inserted in a single transaction, so keeping the
+index current costs one match of work rather than a re-analysis of the season.
+Season queries only read the aggregate tables and never touch event files.
+"""
+
+from contextlib import closing
+from typing import Dict, Any, List, Optional
+import os
+import sqlite3
+import time
+
+from match_storage import match_name
+
+DEFAULT_SEASON = 'default'
+
+# Columns that can be summed and ranked, for both teams and players
+STAT_COLUMNS = ('passes', 'completed_passes', 'shots', 'goals', 'xg')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_key TEXT PRIMARY KEY,
+    season TEXT NOT NULL,
+    file_path TEXT,
+    home_team TEXT,
+    away_team TEXT,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS team_match_stats (
+    match_key TEXT NOT NULL,
+    season TEXT NOT NULL,
+    team TEXT NOT NULL,
+    is_home INTEGER NOT NULL,
+    possession REAL,
+    passes INTEGER,
+    completed_passes INTEGER,
+    shots INTEGER,
+    goals INTEGER,
+    goals_against INTEGER,
+    xg REAL,
+    PRIMARY KEY (match_key, team)
+);
+CREATE TABLE IF NOT EXISTS player_match_stats (
+    match_key TEXT NOT NULL,
+    season TEXT NOT NULL,
+    team TEXT NOT NULL,
+    player TEXT NOT NULL,
+    position TEXT,
+    passes INTEGER,
+    completed_passes INTEGER,
+    shots INTEGER,
+    goals INTEGER,
+    xg REAL,
+    PRIMARY KEY (match_key, team, player)
+);
+CREATE INDEX IF NOT EXISTS team_match_stats_season ON team_match_stats (season, team);
+CREATE INDEX IF NOT EXISTS player_match_stats_season ON player_match_stats (season, player);
+"""
+
+
+class SeasonIndex:
+    """Incrementally maintained per-match, per-team and per-player aggregates."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation keeps the index safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def index_match(self, match_key: str, analysis: Dict[str, Any], season: str = DEFAULT_SEASON,
+                    file_path: Optional[str] = None):
+        """
+        Store (or replace) the rows of one analysed match.
+
+        Args:
+            match_key: Stable identifier of the match, e.g. the uploaded filename
+            analysis: Output of FootballMatchAnalyzer.analyze_match_stats (or analyze_match)
+            season: Season label the match belongs to
+            file_path: Source file, kept for reference
+        """
+        details = analysis["match_details"]
+        stats = analysis["match_stats"]
+
+        team_rows = []
+        for side, other, is_home in (("home", "away", 1), ("away", "home", 0)):
+            team_rows.append((
+                match_key, season, details[f"{side}_team"], is_home,
+                stats["possession"][side],
+                stats["passes"][side],
+                stats["passes"][f"{side}_completed"],
+                stats["shots"][side],
+                stats["goals"][side],
+                stats["goals"][other],
+                stats["xg"][side]
+            ))
+
+        player_rows = []
+        for side in ("home", "away"):
+            for player in analysis[f"{side}_player_stats"]:
+                player_rows.append((
+                    match_key, season, details[f"{side}_team"], player["player_name"], player["position"],
+                    player["passes"], player["successful_passes"], player["shots"], player["goals"], player["xg"]
+                ))
+
+        with closing(self._connect()) as conn, conn:
+            self._delete(conn, match_key)
+            conn.execute(
+                "INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?)",
+                (match_key, season, file_path, details["home_team"], details["away_team"], time.time())
+            )
+            conn.executemany("INSERT INTO team_match_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", team_rows)
+            conn.executemany("INSERT INTO player_match_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", player_rows)
+
+    def set_file_path(self, match_key: str, file_path: str):
+        """Record a new source file for a match, e.g. after it was stored compressed."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE matches SET file_path = ? WHERE match_key = ?", (file_path, match_key))
+
+    def remove_match(self, match_key: str):
+        """Drop every row of a match."""
+        with closing(self._connect()) as conn, conn:
+            self._delete(conn, match_key)
+
+    def _delete(self, conn: sqlite3.Connection, match_key: str):
+        for table in ("matches", "team_match_stats", "player_match_stats"):
+            conn.execute(f"DELETE FROM {table} WHERE match_key = ?", (match_key,))
+
+    def seasons(self) -> List[str]:
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT season FROM matches ORDER BY season")]
+
+    def team_totals(self, season: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Season totals per team, ordered by team name."""
+        where, params = _season_filter(season)
+        query = f"""
+            SELECT team, COUNT(*) AS matches,
+                   SUM(passes) AS passes, SUM(completed_passes) AS completed_passes,
+                   SUM(shots) AS shots, SUM(goals) AS goals, SUM(goals_against) AS goals_against,
+                   ROUND(SUM(xg), 2) AS xg, ROUND(AVG(possession), 1) AS avg_possession
+            FROM team_match_stats {where}
+            GROUP BY team ORDER BY team
+        """
+        with closing(self._connect()) as conn:
+            return [_with_completion(dict(row)) for row in conn.execute(query, params)]
+
+    def player_totals(self, season: Optional[str] = None, team: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Season totals per player (optionally for one team), ordered by team and player."""
+        where, params = _season_filter(season)
+        if team is not None:
+            where += (" AND" if where else "WHERE") + " team = ?"
+            params.append(team)
+        query = f"""
+            SELECT player, team, COUNT(*) AS matches,
+                   SUM(passes) AS passes, SUM(completed_passes) AS completed_passes,
+                   SUM(shots) AS shots, SUM(goals) AS goals, ROUND(SUM(xg), 2) AS xg
+            FROM player_match_stats {where}
+            GROUP BY team, player ORDER BY team, player
+        """
+        with closing(self._connect()) as conn:
+            return [_with_completion(dict(row)) for row in conn.execute(query, params)]
+
+    def leaderboard(self, stat: str, season: Optional[str] = None, level: str = 'player',
+                    limit: int = 10) -> List[Dict[str, Any]]:
+        """Top players (or teams) by a summed statistic."""
+        if stat not in STAT_COLUMNS:
+            raise ValueError(f"Unknown statistic '{stat}', expected one of {', '.join(STAT_COLUMNS)}")
+        if level not in ('player', 'team'):
+            raise ValueError("level must be 'player' or 'team'")
+
+        where, params = _season_filter(season)
+        # stat and level are validated above, so they are safe to place in the query
+        group = "team, player" if level == 'player' else "team"
+        table = "player_match_stats" if level == 'player' else "team_match_stats"
+        total = f"ROUND(SUM({stat}), 2)" if stat == 'xg' else f"SUM({stat})"
+        query = f"""
+            SELECT {group}, COUNT(*) AS matches, {total} AS {stat}
+            FROM {table} {where}
+            GROUP BY {group} ORDER BY {stat} DESC, {group} LIMIT ?
+        """
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(query, params + [int(limit)])]
+
+
+def _season_filter(season: Optional[str]):
+    if season is None:
+        return "", []
+    return "WHERE season = ?", [season]
+
+
+def _with_completion(row: Dict[str, Any]) -> Dict[str, Any]:
+    passes = row.get("passes") or 0
+    row["pass_completion"] = round(row["completed_passes"] / passes * 100, 1) if passes else 0
+    return row
+
+
+def index_file(index: SeasonIndex, analyzer, file_path: str, season: str = DEFAULT_SEASON,
+               match_key: Optional[str] = None, events=None):
+    """Analyze one match file (statistics only) and store it in the index."""
+    if events is None:
+        events = analyzer.load_data(file_path)
+        if events is None:
+            raise ValueError(f"Failed to load match data from {file_path}")
+    analysis = analyzer.analyze_match_stats(events)
+    index.index_match(match_key or match_name(file_path), analysis, season=season, file_path=file_path)
+    return analysis
+
+
+if __name__ == "__main__":
+    # Backfill the index from existing match files
+    # Usage: python season_index.py uploads/ --season 2015/16 [--db season_index.sqlite]
+    import argparse
+    from batch_analysis import find_match_files
+    from football_analysis import FootballMatchAnalyzer
+
+    parser = argparse.ArgumentParser(description="Index match files into the season aggregate store")
+    parser.add_argument("target", help="Directory or glob pattern of match files")
+    parser.add_argument("--season", default=DEFAULT_SEASON, help="Season label for these matches")
+    parser.add_argument("--db", default="season_index.sqlite", help="SQLite database path")
+    args = parser.parse_args()
+
+    index = SeasonIndex(args.db)
+    analyzer = FootballMatchAnalyzer()
+    for path in find_match_files(args.target):
+        try:
+            index_file(index, analyzer, path, season=args.season)
+            print(f"Indexed {path}")
+        except Exception as e:
+            print(f"Failed to index {path}: {e}")
+    analyzer.close()
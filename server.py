@@ -6,31 +6,146 @@ stored in JSON format. The app provides both web UI and API endpoints for data a
 """
 
 # Import required libraries
-from flask import Flask, request, jsonify, send_from_directory, render_template, redirect, url_for
+from flask import Flask, Response, request, jsonify, send_from_directory, send_file, render_template, redirect, url_for, stream_with_context
 import os
-from football_analysis import FootballMatchAnalyzer
+import re
+import threading
+from football_analysis import FootballMatchAnalyzer, FIGURE_KINDS, OUTPUTS, DEFAULT_OUTPUTS
+from backends import CostModel, AUTO, DEFAULT_CALIBRATION_PATH
+from match_cache import MatchCache, ResultCache
+from figure_cache import FigureCache
+from render_executor import RenderExecutor
+from event_table import EventTable
+from season_index import SeasonIndex, DEFAULT_SEASON, index_file
+from analysis_jobs import JobManager, AdmissionError
+from instrumentation import metrics, format_metric, METRIC_PREFIX
+from match_upload import upload_target, receive_match, UploadError, UploadTooLarge
+from match_storage import check_compression, match_name, match_variants, remove_match, stored_path
+from live_matches import LiveMatchRegistry, LiveMatchError, LiveMatchLimitError, parse_ndjson, sse_stream
+from match_catalog import MatchCatalog, SORT_COLUMNS, DEFAULT_SORT, MAX_PAGE_SIZE, describe_match, parse_date, rescan
 
 # Configuration constants
 UPLOAD_FOLDER = 'uploads'  # Folder where uploaded JSON files will be stored
-ALLOWED_EXTENSIONS = {'json'}  # Only allow JSON file uploads
+LIVE_MATCH_ID = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')  # Ids of live matches used in URLs
 
 # Initialize Flask application
 app = Flask(__name__)
 # Configure application settings
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER  # Set the upload directory
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max upload size to prevent server overload
+# Largest accepted match (decompressed size) and request body; uploads are streamed to disk, so
+# memory per upload stays constant whatever the limit
+app.config['MAX_UPLOAD_BYTES'] = int(os.environ.get('MAX_UPLOAD_BYTES', 2 * 1024 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_UPLOAD_BYTES']
+# Format uploads are stored in: gzip, zstd (needs the zstandard package) or none for plain JSON
+app.config['UPLOAD_COMPRESSION'] = check_compression(os.environ.get('UPLOAD_COMPRESSION', 'gzip'))
+# Memory budget for parsed matches kept between requests (override with MATCH_CACHE_BYTES)
+app.config['MATCH_CACHE_BYTES'] = int(os.environ.get('MATCH_CACHE_BYTES', 256 * 1024 * 1024))
+# SQLite database holding per-match team and player aggregates for season queries
+app.config['SEASON_INDEX_DB'] = os.environ.get('SEASON_INDEX_DB', 'season_index.sqlite')
+# SQLite catalog of stored matches (teams, score, date, lineups) behind the index page and /list_files
+app.config['MATCH_CATALOG_DB'] = os.environ.get('MATCH_CATALOG_DB', 'match_catalog.sqlite')
+# Matches per page of the index page and default page size of /list_files
+app.config['CATALOG_PAGE_SIZE'] = int(os.environ.get('CATALOG_PAGE_SIZE', 50))
+# Catalog files added to or changed in the upload folder outside the server, in the background on start
+app.config['CATALOG_RESCAN_ON_START'] = os.environ.get('CATALOG_RESCAN_ON_START', '1').lower() in ('1', 'true', 'yes')
+# Number of analysed matches whose statistics are kept in the result cache
+app.config['RESULT_CACHE_MATCHES'] = int(os.environ.get('RESULT_CACHE_MATCHES', 32))
+# Directory and disk budget of the rendered figure cache
+app.config['FIGURE_CACHE_DIR'] = os.environ.get('FIGURE_CACHE_DIR', 'figure_cache')
+app.config['FIGURE_CACHE_BYTES'] = int(os.environ.get('FIGURE_CACHE_BYTES', 512 * 1024 * 1024))
+# Worker processes rendering figures in parallel (1 renders serially in the request thread)
+app.config['RENDER_WORKERS'] = int(os.environ.get('RENDER_WORKERS', os.cpu_count() or 1))
+# Admission control for background analyses: concurrent workers, queue length and memory budget
+app.config['ANALYSIS_WORKERS'] = int(os.environ.get('ANALYSIS_WORKERS', 2))
+app.config['ANALYSIS_QUEUE_LIMIT'] = int(os.environ.get('ANALYSIS_QUEUE_LIMIT', 16))
+app.config['ANALYSIS_MEMORY_BUDGET'] = int(os.environ.get('ANALYSIS_MEMORY_BUDGET', 1024 * 1024 * 1024))
+# How long synchronous API requests wait for their analysis job
+app.config['ANALYSIS_WAIT_SECONDS'] = float(os.environ.get('ANALYSIS_WAIT_SECONDS', 120))
+# How long the analysis pages wait before answering with a page that reloads until the job is done
+app.config['ANALYSIS_PAGE_WAIT_SECONDS'] = float(os.environ.get('ANALYSIS_PAGE_WAIT_SECONDS', 2))
+# Seconds finished jobs and their results are kept for /api/jobs/<job_id> (they also count against the budget)
+app.config['ANALYSIS_RESULT_TTL'] = float(os.environ.get('ANALYSIS_RESULT_TTL', 600))
+# Backend that loads and analyses matches: auto (cheapest by the calibrated cost model), python, numpy or spark
+app.config['ANALYSIS_BACKEND'] = os.environ.get('ANALYSIS_BACKEND', AUTO)
+# Cost model written by `python backends.py calibrate` (defaults are used until it exists)
+app.config['BACKEND_CALIBRATION'] = os.environ.get('BACKEND_CALIBRATION', DEFAULT_CALIBRATION_PATH)
+# Live matches tracked at once, and seconds between keepalive comments on their event streams
+app.config['LIVE_MATCH_LIMIT'] = int(os.environ.get('LIVE_MATCH_LIMIT', 16))
+app.config['LIVE_KEEPALIVE_SECONDS'] = float(os.environ.get('LIVE_KEEPALIVE_SECONDS', 15))
+# Record per-stage timings of every analysis for the /metrics endpoint
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
 
-# Create required directory structure
-# 'static' folder is used by Flask to serve static files like CSS, JavaScript, images
-os.makedirs('static', exist_ok=True)
+metrics.enabled = app.config['METRICS_ENABLED']
 
-# Initialize the analyzer that will process football match data
-analyzer = FootballMatchAnalyzer()
+# Helper function to bring the match catalog in line with the upload folder
+def rescan_catalog():
+    """
+    Describe match files that are missing from (or changed since) the catalog, and drop entries of deleted files
+    """
+    try:
+        summary = rescan(match_catalog, app.config['UPLOAD_FOLDER'], analyzer=analyzer, log=None)
+        app.logger.info(f"Match catalog rescanned: {summary}")
+    except Exception as e:
+        app.logger.warning(f"Could not rescan the match catalog: {e}")
+
+# Helper function to create the caches, stores, queues and background threads the endpoints share
+def init_services():
+    """
+    Create the server's shared state from app.config and start the background catalog rescan
+    """
+    global match_cache, result_cache, figure_cache, render_executor, analyzer
+    global season_index, match_catalog, job_manager, live_matches
+    
+    # Create required directory structure
+    # 'static' folder is used by Flask to serve static files like CSS, JavaScript, images
+    os.makedirs('static', exist_ok=True)
+    
+    # Cache of parsed matches so switching between match and player pages doesn't re-read the file
+    match_cache = MatchCache(app.config['MATCH_CACHE_BYTES'])
+    
+    # Cache of analysis statistics per file
+    result_cache = ResultCache(app.config['RESULT_CACHE_MATCHES'])
+    
+    # Rendered figures, served by the /figure endpoints and keyed by match content, kind and style
+    figure_cache = FigureCache(app.config['FIGURE_CACHE_DIR'], app.config['FIGURE_CACHE_BYTES'])
+    
+    # Worker processes that render figures; started on the first render
+    render_executor = RenderExecutor(app.config['RENDER_WORKERS'])
+    
+    # Initialize the analyzer that will process football match data
+    analyzer = FootballMatchAnalyzer(match_cache=match_cache, result_cache=result_cache, figure_cache=figure_cache,
+                                     render_executor=render_executor, backend=app.config['ANALYSIS_BACKEND'],
+                                     cost_model=CostModel.load(app.config['BACKEND_CALIBRATION']))
+    
+    # Season-level aggregates, updated one match at a time on upload
+    season_index = SeasonIndex(app.config['SEASON_INDEX_DB'])
+    
+    # Listing and search metadata of every stored match, updated on upload
+    match_catalog = MatchCatalog(app.config['MATCH_CATALOG_DB'])
+    
+    # Background analysis jobs; identical (file, player) requests in flight share one job
+    job_manager = JobManager(analyzer.analyze_match,
+                             max_workers=app.config['ANALYSIS_WORKERS'],
+                             max_queued=app.config['ANALYSIS_QUEUE_LIMIT'],
+                             memory_budget=app.config['ANALYSIS_MEMORY_BUDGET'],
+                             result_ttl=app.config['ANALYSIS_RESULT_TTL'])
+    
+    # Matches in progress, fed with event batches and streamed to browsers as they change
+    live_matches = LiveMatchRegistry(app.config['LIVE_MATCH_LIMIT'])
+    
+    if app.config['CATALOG_RESCAN_ON_START'] and os.path.isdir(app.config['UPLOAD_FOLDER']):
+        # Only new and changed files are analysed, so this is quick once the catalog is current
+        threading.Thread(target=rescan_catalog, name='catalog-rescan', daemon=True).start()
+
+# Render workers are spawned processes that re-run the script which started the server as
+# __mp_main__ (e.g. `python server.py`); they only render figures, so they skip the shared state
+if __name__ != '__mp_main__':
+    init_services()
 
 # Helper function to validate file extensions
 def allowed_file(filename):
     """
-    Check if the uploaded file has an allowed extension (.json)
+    Check if the uploaded file has an allowed extension (.json, .json.gz or .json.zst)
     
     Args:
         filename (str): Name of the uploaded file
@@ -38,20 +153,245 @@ def allowed_file(filename):
     Returns:
         bool: True if file extension is allowed, False otherwise
     """
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return upload_target(filename) is not None
+
+# Helper function to drop cached state for a file that is being replaced
+def invalidate_match(filepath):
+    """
+    Invalidation hook fired when an uploaded file overwrites an existing one
+    
+    Args:
+        filepath (str): Path of the match file being replaced
+    """
+    match_cache.invalidate(filepath)
+    result_cache.invalidate(filepath)
+
+# Helper function to write the binary columnar copy of an uploaded match
+def write_columns(filepath):
+    """
+    Convert an uploaded match file to the binary columnar format used by the analyzer
+    
+    Args:
+        filepath (str): Path of the uploaded JSON file
+        
+    Returns:
+        EventTable: The parsed match, or None if the file could not be parsed
+    """
+    try:
+        table = EventTable.from_file(filepath)
+        table.save_columns(filepath)
+        return table
+    except Exception as e:
+        # The JSON file is still analysed directly if the conversion fails
+        app.logger.warning(f"Could not write columnar copy of {filepath}: {e}")
+        return None
+
+# Helper function to add an uploaded match to the season index
+def update_season_index(filepath, table, season):
+    """
+    Store the team and player aggregates of one match in the season index
+    
+    Args:
+        filepath (str): Path of the uploaded JSON file
+        table (EventTable): Parsed match (loaded from disk if None)
+        season (str): Season label the match belongs to
+        
+    Returns:
+        dict: The match statistics, or None if the match could not be indexed
+    """
+    try:
+        return index_file(season_index, analyzer, filepath, season=season,
+                          match_key=match_name(filepath), events=table)
+    except Exception as e:
+        app.logger.warning(f"Could not index {filepath} in the season index: {e}")
+        return None
+
+# Helper function to add an uploaded match to the match catalog
+def update_catalog(filepath, table, analysis, season, match_date):
+    """
+    Store the listing metadata of one match (teams, formations, score, xG, event count, hash, lineups)
+    
+    Args:
+        filepath (str): Path of the stored match file
+        table (EventTable): Parsed match (loaded from disk if None)
+        analysis (dict): Its match statistics (computed if None)
+        season (str): Season label the match belongs to
+        match_date (str): Match date as YYYY-MM-DD (the upload day if None)
+    """
+    try:
+        record = describe_match(analyzer, filepath, events=table, analysis=analysis)
+        match_catalog.add_match(filepath, record, season=season, match_date=match_date)
+    except Exception as e:
+        app.logger.warning(f"Could not add {filepath} to the match catalog: {e}")
+
+# Helper function to store an uploaded match and update everything derived from it
+def store_upload(source, filename, season, match_date=None):
+    """
+    Stream an uploaded match into the upload folder, then refresh its caches, columnar copy, season rows
+    and catalog entry
+    
+    Args:
+        source (file-like): Binary stream of the upload, read in chunks
+        filename (str): Name of the uploaded file (.json, .json.gz or .json.zst)
+        season (str): Season label the match belongs to
+        match_date (str, optional): Match date as YYYY-MM-DD (event files carry no date)
+        
+    Returns:
+        tuple: Stored file name (with the UPLOAD_COMPRESSION suffix) and number of events
+        
+    Raises:
+        UploadTooLarge: If the decompressed match exceeds MAX_UPLOAD_BYTES
+        UploadError: If the file type or match date is invalid or the file isn't a valid event array
+    """
+    target = upload_target(filename)
+    if target is None:
+        raise UploadError('Invalid file type')
+    try:
+        match_date = parse_date(match_date)
+    except ValueError:
+        raise UploadError('Invalid match date, expected YYYY-MM-DD')
+    name, compression = target
+    storage = app.config['UPLOAD_COMPRESSION']
+    filepath = stored_path(app.config['UPLOAD_FOLDER'], name, storage)
+    replaced = match_variants(filepath)
+    # Written to a temporary file and validated as it arrives; the old file is only replaced on success
+    events, _ = receive_match(source, filepath, compression, app.config['MAX_UPLOAD_BYTES'], storage=storage)
+    # Drop cached data and results of a file that was just overwritten, and remove
+    # copies of the same match stored in another format
+    for path in replaced:
+        invalidate_match(path)
+        if path != filepath:
+            remove_match(path)
+            match_catalog.remove_match(os.path.basename(path))
+    # Store a binary columnar copy so later analyses can memory-map it
+    table = write_columns(filepath)
+    # Add (or replace) this match's rows in the season aggregates
+    analysis = update_season_index(filepath, table, season or DEFAULT_SEASON)
+    # List it in the catalog, reusing the statistics just computed for the season index
+    update_catalog(filepath, table, analysis, season or DEFAULT_SEASON, match_date)
+    return os.path.basename(filepath), events
+
+# Helper function to read catalog search parameters from the query string
+def catalog_query(args, per_page):
+    """
+    Search arguments of MatchCatalog.search from request arguments
+    
+    Args:
+        args (MultiDict): Query parameters (team, player, date_from, date_to, season, sort, order, page, per_page)
+        per_page (int): Page size used when per_page isn't given
+        
+    Returns:
+        dict: Keyword arguments for MatchCatalog.search
+        
+    Raises:
+        ValueError: If a date, sort, order or page number is invalid
+    """
+    sort = args.get('sort') or DEFAULT_SORT
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort '{sort}', expected one of {', '.join(SORT_COLUMNS)}")
+    order = args.get('order') or 'desc'
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'")
+    page = int(args.get('page') or 1)
+    per_page = int(args.get('per_page') or per_page)
+    if page < 1 or not 1 <= per_page <= MAX_PAGE_SIZE:
+        raise ValueError(f"page must be at least 1 and per_page between 1 and {MAX_PAGE_SIZE}")
+    return {
+        'team': args.get('team') or None,
+        'player': args.get('player') or None,
+        'date_from': parse_date(args.get('date_from')),
+        'date_to': parse_date(args.get('date_to')),
+        'season': args.get('season') or None,
+        'sort': sort,
+        'descending': order == 'desc',
+        'page': page,
+        'per_page': per_page
+    }
+
+# Helper function to run an analysis through the job queue
+def run_analysis(filepath, player_name, wait_seconds=None, **options):
+    """
+    Submit an analysis job and wait for it to finish
+    
+    Args:
+        filepath (str): Path of the match file
+        player_name (str): Optional player to focus analysis on
+        wait_seconds (float): Longest wait for the job (default ANALYSIS_WAIT_SECONDS)
+        **options: Extra arguments for analyze_match, e.g. outputs
+        
+    Returns:
+        AnalysisJob: The job, which may still be running if the wait timed out
+        
+    Raises:
+        AdmissionError: If the job queue or memory budget can't take the job
+    """
+    job = job_manager.submit(filepath, player_name, **options)
+    job.wait(app.config['ANALYSIS_WAIT_SECONDS'] if wait_seconds is None else wait_seconds)
+    return job
+
+# Helper function to run the statistics of an analysis page without holding the request thread for long
+def page_analysis(filepath, player_name):
+    """
+    Submit (or pick up) the statistics job of an analysis page and wait ANALYSIS_PAGE_WAIT_SECONDS at most
+    
+    A page reloading while its analysis runs passes the job id back in the job_id query
+    parameter, so it gets that job's result even once the job has finished.
+    
+    Args:
+        filepath (str): Path of the match file
+        player_name (str): Optional player to focus analysis on
+        
+    Returns:
+        AnalysisJob: The job, which may still be running
+        
+    Raises:
+        AdmissionError: If the job queue or memory budget can't take the job
+    """
+    wait_seconds = app.config['ANALYSIS_PAGE_WAIT_SECONDS']
+    job = job_manager.get(request.args.get('job_id', ''))
+    if job is None or job.file_path != filepath or job.player_name != player_name:
+        return run_analysis(filepath, player_name, wait_seconds, outputs=('stats',))
+    job.wait(wait_seconds)
+    return job
+
+# Helper function to answer a page request whose analysis is still running
+def analysis_pending(job, filename, player_name):
+    """
+    Render a page that reloads until the job is done, instead of holding the request thread
+    
+    Args:
+        job (AnalysisJob): Queued or running job
+        filename (str): Name of the match file
+        player_name (str): Optional player the analysis focuses on
+        
+    Returns:
+        HTML: Rendered analysis_pending.html with status code 202
+    """
+    refresh_url = url_for(request.endpoint, **dict(request.args.to_dict(), job_id=job.id))
+    return render_template('analysis_pending.html', job=job, filename=filename, player_name=player_name,
+                           refresh_seconds=2, refresh_url=refresh_url), 202
 
 # ENDPOINT: Home page
 @app.route('/')
 def index():
     """
-    Home page endpoint that displays a list of available JSON files for analysis
+    Home page endpoint that displays one page of the match catalog, with search and sorting
+    
+    Query Parameters:
+        team, player, date_from, date_to, season, sort, order, page: As for /list_files
     
     Returns:
-        HTML: Rendered index.html template with list of available files
+        HTML: Rendered index.html template with the page of matches
+        Error message with status code for invalid search parameters
     """
-    # Get list of available JSON files from the uploads folder
-    files = [f for f in os.listdir(app.config['UPLOAD_FOLDER']) if f.endswith('.json')]
-    return render_template('index.html', files=files)
+    # Read one indexed page from the catalog instead of listing the uploads folder
+    try:
+        query = catalog_query(request.args, app.config['CATALOG_PAGE_SIZE'])
+    except ValueError as e:
+        return str(e), 400
+    catalog_page = match_catalog.search(**query)
+    return render_template('index.html', catalog=catalog_page, query=query, sort_columns=list(SORT_COLUMNS),
+                           search=request.args.to_dict())
 
 # ENDPOINT: File upload handler
 @app.route('/upload', methods=['POST'])
@@ -59,6 +399,9 @@ def upload_file():
     """
     Handles file uploads from the web interface
     
+    Werkzeug spools the multipart body to a temporary file while request.files is parsed,
+    so the upload is streamed from that file; PUT /api/upload/<filename> streams as it arrives.
+    
     Returns:
         Redirect to index page on success
         Error message with status code on failure
@@ -75,14 +418,47 @@ def upload_file():
     
     # Validate and save the file
     if file and allowed_file(file.filename):
-        filename = file.filename
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        try:
+            store_upload(file.stream, file.filename, request.form.get('season'), request.form.get('match_date'))
+        except UploadTooLarge as e:
+            return str(e), 413
+        except UploadError as e:
+            return str(e), 400
         # Redirect back to the index page after successful upload
         return redirect(url_for('index'))
     
     return 'Invalid file type', 400
 
+# ENDPOINT: Streaming upload API
+@app.route('/api/upload/<filename>', methods=['PUT'])
+def api_upload(filename):
+    """
+    Store a match sent as the raw request body, streamed to disk chunk by chunk
+    
+    Unlike the form upload, the body is never spooled to a temporary file first,
+    so any size up to MAX_UPLOAD_BYTES can be sent, e.g. with
+    `curl -T match.json.gz http://localhost:5000/api/upload/match.json.gz`.
+    
+    Args:
+        filename (str): Name of the file (.json, or .json.gz/.json.zst to decompress on the fly)
+    
+    Query Parameters:
+        season (str, optional): Season label the match belongs to
+        match_date (str, optional): Match date as YYYY-MM-DD (default: the upload day)
+    
+    Returns:
+        JSON: Stored file name and number of events
+        JSON error object with status code on failure
+    """
+    try:
+        stored_name, events = store_upload(request.stream, filename, request.args.get('season'),
+                                           request.args.get('match_date'))
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'filename': stored_name, 'events': events})
+
 # ENDPOINT: Match analysis page
 @app.route('/analyze', methods=['GET'])
 def analyze():
@@ -92,9 +468,11 @@ def analyze():
     Query Parameters:
         filename (str): Name of the JSON file to analyze
         player_name (str, optional): Player to focus analysis on
+        job_id (str, optional): Job of an earlier request for this page, passed by its reloads
     
     Returns:
         HTML: Rendered analysis.html template with match statistics
+        HTML: Page reloading until the analysis is done (202) if it takes longer than ANALYSIS_PAGE_WAIT_SECONDS
         Error message with status code on failure
     """
     # Get query parameters
@@ -110,10 +488,17 @@ def analyze():
     if not os.path.exists(filepath):
         return 'File not found', 404
     
-    # Run analysis using the FootballMatchAnalyzer
-    result = analyzer.analyze_match(filepath, player_name)
-    if 'error' in result:
-        return result['error'], 500
+    # Run analysis using the FootballMatchAnalyzer on the background job queue; the page
+    # only needs the statistics, the browser fetches the figures from the /figure endpoints
+    try:
+        job = page_analysis(filepath, player_name)
+    except AdmissionError as e:
+        return str(e), 429
+    if not job.done:
+        return analysis_pending(job, filename, player_name)
+    if job.status == 'failed':
+        return job.error, 500
+    result = job.result
     
     # Return HTML visualization with all match data
     return render_template('analysis.html', 
@@ -123,7 +508,8 @@ def analyze():
                           match_stats=result['match_stats'],
                           home_players=result['home_player_stats'],
                           away_players=result['away_player_stats'],
-                          player_name=player_name)
+                          player_name=player_name,
+                          figure_version=figure_version(filepath))
 
 # ENDPOINT: Individual player analysis page
 @app.route('/player_analysis', methods=['GET'])
@@ -134,9 +520,11 @@ def player_analysis():
     Query Parameters:
         filename (str): Name of the JSON file to analyze
         player_name (str): Player to focus analysis on
+        job_id (str, optional): Job of an earlier request for this page, passed by its reloads
     
     Returns:
         HTML: Rendered player_analysis.html template with player-focused statistics
+        HTML: Page reloading until the analysis is done (202) if it takes longer than ANALYSIS_PAGE_WAIT_SECONDS
         Error message with status code on failure
     """
     # Get query parameters
@@ -152,16 +540,295 @@ def player_analysis():
     if not os.path.exists(filepath):
         return 'File not found', 404
     
-    # Run analysis with player focus using the FootballMatchAnalyzer
-    result = analyzer.analyze_match(filepath, player_name)
-    if 'error' in result:
-        return result['error'], 500
+    # Run analysis with player focus using the FootballMatchAnalyzer on the background job queue;
+    # the heatmap is fetched separately from the /figure endpoint
+    try:
+        job = page_analysis(filepath, player_name)
+    except AdmissionError as e:
+        return str(e), 429
+    if not job.done:
+        return analysis_pending(job, filename, player_name)
+    if job.status == 'failed':
+        return job.error, 500
+    result = job.result
     
     # Return HTML visualization focused on the specific player
     return render_template('player_analysis.html', 
                           result=result, 
                           filename=filename,
-                          player_name=player_name)
+                          player_name=player_name,
+                          figure_version=figure_version(filepath))
+
+# Helper function to version figure URLs by match content
+def figure_version(filepath):
+    """
+    Short content hash of a match file, added to figure URLs so browsers can cache them
+    until the file is replaced
+    
+    Args:
+        filepath (str): Path of the match file
+        
+    Returns:
+        str: Version string for the figure URLs
+    """
+    return figure_cache.content_hash(filepath)[:16]
+
+# ENDPOINT: Rendered figures
+@app.route('/figure/<filename>/<kind>', methods=['GET'])
+@app.route('/figure/<filename>/<kind>/<player_name>', methods=['GET'])
+def figure(filename, kind, player_name=None):
+    """
+    Serve one figure of a match as a PNG image, rendered once and then read from the figure cache
+    
+    Path Parameters:
+        filename (str): Name of the JSON match file
+        kind (str): overview, home_shots, away_shots or heatmap
+        player_name (str): Player of a heatmap (heatmap only)
+    
+    Query Parameters:
+        v (str, optional): Figure version from the analysis pages; a matching version
+            makes the response cacheable for a year
+    
+    Returns:
+        PNG image with ETag and Last-Modified headers (304 for a matching conditional GET)
+        Error message with status code on failure
+    """
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if not os.path.isfile(filepath):
+        return 'File not found', 404
+    if kind not in FIGURE_KINDS or (kind == 'heatmap') != (player_name is not None):
+        return 'Unknown figure', 404
+    
+    # The figure comes back already open, so evicting it from the cache meanwhile can't break the response
+    try:
+        figure_file = analyzer.figure_file(filepath, kind, player_name)
+    except ValueError as e:
+        return str(e), 500
+    if figure_file is None:
+        return 'Player not found in this match', 404
+    
+    # Versioned URLs change whenever the match does, so they can be cached without revalidation
+    # (send_file closes the file once the response is sent)
+    try:
+        versioned = request.args.get('v') == figure_version(filepath)
+        etag = os.path.splitext(os.path.basename(figure_file.name))[0]
+        response = send_file(figure_file, mimetype='image/png', etag=etag, conditional=True,
+                             last_modified=os.fstat(figure_file.fileno()).st_mtime,
+                             max_age=31536000 if versioned else 0)
+    except BaseException:
+        figure_file.close()
+        raise
+    if versioned:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# Helper function to read the outputs an API client asked for
+def requested_outputs(value):
+    """
+    Parse a comma-separated outputs selection such as "stats,shots,heatmap"
+    
+    Args:
+        value (str): The outputs parameter, or None for the default selection
+        
+    Returns:
+        tuple: Requested outputs in OUTPUTS order, so equal selections share one job
+        
+    Raises:
+        ValueError: If the selection names an unknown output or is empty
+    """
+    if value is None:
+        return DEFAULT_OUTPUTS
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names - set(OUTPUTS)
+    if unknown or not names:
+        raise ValueError(f"Invalid outputs '{value}', expected a comma-separated selection of {', '.join(OUTPUTS)}")
+    return tuple(name for name in OUTPUTS if name in names)
+
+# Helper function to read the backend an API client asked for
+def requested_backend(value):
+    """
+    Validate a per-request backend override such as "numpy"
+    
+    Args:
+        value (str): The backend parameter, or None for the server's ANALYSIS_BACKEND
+        
+    Returns:
+        str: The backend name, or None to use the server default
+        
+    Raises:
+        ValueError: If the backend is unknown or not available on this server
+    """
+    return analyzer.check_backend(value or None)
+
+# ENDPOINT: Precomputed player heatmap grids
+@app.route('/api/heatmaps', methods=['GET'])
+def api_heatmaps():
+    """
+    Return the smoothed heatmap grids of any or all players of a match
+    
+    All players' grids are computed together the first time a match is asked
+    for and kept while the match stays in the match cache.
+    
+    Query Parameters:
+        filename (str): Name of the JSON file
+        player_name (str, optional, repeatable): Only return these players
+        team (str, optional): Only return players of this team
+        bins (str, optional): Grid size as "<length>x<width>" cells (default 12x8)
+    
+    Returns:
+        JSON: Pitch size, grid size and per player the team, located event count, grid and maximum
+        JSON error object with status code on failure
+    """
+    filename = request.args.get('filename')
+    if not filename:
+        return jsonify({'error': 'Filename required'}), 400
+    
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if not os.path.exists(filepath):
+        return jsonify({'error': 'File not found'}), 404
+    
+    bins_param = request.args.get('bins', '12x8')
+    try:
+        bins = tuple(int(n) for n in bins_param.lower().split('x'))
+        if len(bins) != 2 or not (1 <= bins[0] <= 120 and 1 <= bins[1] <= 80):
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': f"Invalid bins '{bins_param}', expected e.g. 12x8 (at most 120x80)"}), 400
+    
+    player_names = request.args.getlist('player_name')
+    data = analyzer.player_grids_data(filepath, player_names, request.args.get('team'), bins)
+    if data is None:
+        return jsonify({'error': 'Failed to load match data.'}), 500
+    if player_names and not data['players']:
+        return jsonify({'error': 'Player not found'}), 404
+    return jsonify(data)
+
+# ENDPOINT: Minute-by-minute match timeline
+@app.route('/api/timeline', methods=['GET'])
+def api_timeline():
+    """
+    Return both teams' possession share, passes, completed passes, shots and xG per window of minutes
+    
+    Per-minute totals are computed once per loaded match; any window size is then
+    served from their cumulative sums without going over the events again.
+    
+    Query Parameters:
+        filename (str): Name of the JSON file
+        window (int, optional): Window length in minutes, 1-120 (default 1)
+    
+    Returns:
+        JSON: Period, start and end minute of every window, and per team the series and cumulative xG
+        JSON error object with status code on failure
+    """
+    filename = request.args.get('filename')
+    if not filename:
+        return jsonify({'error': 'Filename required'}), 400
+    
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if not os.path.exists(filepath):
+        return jsonify({'error': 'File not found'}), 404
+    
+    window_param = request.args.get('window', '1')
+    try:
+        window = int(window_param)
+        if not 1 <= window <= 120:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': f"Invalid window '{window_param}', expected whole minutes from 1 to 120"}), 400
+    
+    data = analyzer.match_timeline(filepath, window)
+    if data is None:
+        return jsonify({'error': 'Failed to load match data.'}), 500
+    return jsonify(data)
+
+# ENDPOINT: Append events to a live match
+@app.route('/api/live/<match_id>/events', methods=['POST'])
+def live_append(match_id):
+    """
+    Add a batch of new events to a match in progress, creating it on the first batch
+    
+    Team and player statistics and heatmap grids are updated from the batch alone,
+    and the resulting delta is pushed to every browser streaming the match.
+    
+    Args:
+        match_id (str): Id of the live match (letters, digits, '_', '-' and '.')
+    
+    Request Body:
+        StatsBomb events as newline-delimited JSON (one event object per line)
+    
+    Returns:
+        JSON: The delta of the batch (event count, match statistics, changed player rows and grids)
+        JSON error object with status code on failure
+    """
+    if not LIVE_MATCH_ID.match(match_id):
+        return jsonify({'error': 'Invalid match id'}), 400
+    try:
+        events = parse_ndjson(request.get_data().splitlines())
+        if not events:
+            return jsonify({'error': 'No events in request body'}), 400
+        delta = live_matches.append(match_id, events)
+    except LiveMatchLimitError as e:
+        return jsonify({'error': str(e)}), 429
+    except LiveMatchError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(delta)
+
+# ENDPOINT: Server-Sent Events stream of a live match
+@app.route('/api/live/<match_id>/stream', methods=['GET'])
+def live_stream(match_id):
+    """
+    Stream a live match to the browser as Server-Sent Events
+    
+    The stream opens with a `snapshot` event holding the full current state, then
+    sends a `delta` event per appended batch and an `end` event when the match ends.
+    Clients that reconnect (e.g. after falling behind) get a fresh snapshot.
+    
+    Args:
+        match_id (str): Id of the live match
+    
+    Returns:
+        text/event-stream response, or JSON error object with status code 404
+    """
+    match = live_matches.get(match_id)
+    if match is None:
+        return jsonify({'error': 'Live match not found'}), 404
+    stream = sse_stream(match, app.config['LIVE_KEEPALIVE_SECONDS'])
+    return Response(stream_with_context(stream), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ENDPOINT: Current state of a live match, or end it
+@app.route('/api/live/<match_id>', methods=['GET', 'DELETE'])
+def live_match(match_id):
+    """
+    Return the full current state of a live match (GET) or end it (DELETE)
+    
+    Args:
+        match_id (str): Id of the live match
+    
+    Returns:
+        JSON: Match details and statistics, both player tables and all heatmap grids;
+        or a confirmation once the match has ended and its streams are closed
+        JSON error object with status code 404 if there is no such live match
+    """
+    if request.method == 'DELETE':
+        if not live_matches.remove(match_id):
+            return jsonify({'error': 'Live match not found'}), 404
+        return jsonify({'match_id': match_id, 'ended': True})
+    match = live_matches.get(match_id)
+    if match is None:
+        return jsonify({'error': 'Live match not found'}), 404
+    return jsonify(match.snapshot())
+
+# ENDPOINT: List live matches
+@app.route('/api/live', methods=['GET'])
+def live_list():
+    """
+    List the live matches with their event counts and connected streams
+    
+    Returns:
+        JSON: List of live matches
+    """
+    return jsonify({'matches': live_matches.list(), 'limit': live_matches.max_matches})
 
 # ENDPOINT: API for programmatic access to analysis
 @app.route('/api/analyze', methods=['GET'])
@@ -172,10 +839,21 @@ def api_analyze():
     Query Parameters:
         filename (str): Name of the JSON file to analyze
         player_name (str, optional): Player to focus analysis on
+        outputs (str, optional): Comma-separated parts of the result to return (default "stats,figures"):
+            stats - match details, statistics, player tables and summaries
+            shots - both teams' shots as x, y, xG and goal arrays
+            heatmap - the player's event locations and smoothed density grid
+            figures - rendered figures as base64 PNGs (the only output that renders images)
+        timings (bool, optional): Add a timings block with the wall time, engine, event count
+            and memory peak of every analysis stage
+        backend (str, optional): Load the match with this backend (auto, python, numpy or spark)
+            instead of the server's ANALYSIS_BACKEND
+        async (bool, optional): Return the job id immediately instead of waiting
     
     Returns:
         JSON: Analysis results as JSON data
-        JSON error object with status code on failure
+        JSON job status with status code 202 when running asynchronously or still running
+        JSON error object with status code on failure (429 when the server is busy)
     """
     # Get query parameters
     filename = request.args.get('filename')
@@ -190,26 +868,247 @@ def api_analyze():
     if not os.path.exists(filepath):
         return jsonify({'error': 'File not found'}), 404
     
-    # Run analysis using the FootballMatchAnalyzer
-    result = analyzer.analyze_match(filepath, player_name)
-    if 'error' in result:
-        return jsonify({'error': result['error']}), 500
+    try:
+        outputs = requested_outputs(request.args.get('outputs'))
+        backend = requested_backend(request.args.get('backend'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    timings = request.args.get('timings', '').lower() in ('1', 'true', 'yes')
+    
+    # Queue the analysis; asynchronous clients poll /api/jobs/<job_id> for the result
+    try:
+        if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            job = job_manager.submit(filepath, player_name, outputs=outputs, timings=timings, backend=backend)
+        else:
+            job = run_analysis(filepath, player_name, outputs=outputs, timings=timings, backend=backend)
+    except AdmissionError as e:
+        return jsonify({'error': str(e)}), 429
+    
+    if not job.done:
+        return job_accepted(job)
+    if job.status == 'failed':
+        return jsonify({'error': job.error}), 500
     
     # Return the full analysis results as JSON for API clients
-    return jsonify(result)
+    return jsonify(job.result)
+
+# Helper function to answer with the status of a job that is still in progress
+def job_accepted(job):
+    """
+    Build a 202 response pointing the client at the job status endpoint
+    
+    Args:
+        job (AnalysisJob): Queued or running job
+        
+    Returns:
+        JSON: Job status with status code 202 and a Location header
+    """
+    status_url = url_for('job_status', job_id=job.id)
+    response = jsonify(dict(job.to_dict(include_result=False), status_url=status_url))
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+# ENDPOINT: Submit an analysis job
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a match analysis and return its job id immediately
+    
+    Parameters (form, JSON body or query string):
+        filename (str): Name of the JSON file to analyze
+        player_name (str, optional): Player to focus analysis on
+        outputs (str, optional): Parts of the result to compute, as for /api/analyze
+        backend (str, optional): Backend to load the match with, as for /api/analyze
+    
+    Returns:
+        JSON: Job status with status code 202
+        JSON error object with status code on failure (429 when the server is busy)
+    """
+    params = request.get_json(silent=True) or request.values
+    filename = params.get('filename')
+    player_name = params.get('player_name')
+    
+    if not filename:
+        return jsonify({'error': 'Filename required'}), 400
+    
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if not os.path.exists(filepath):
+        return jsonify({'error': 'File not found'}), 404
+    
+    try:
+        outputs = requested_outputs(params.get('outputs'))
+        backend = requested_backend(params.get('backend'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        job = job_manager.submit(filepath, player_name, outputs=outputs, backend=backend)
+    except AdmissionError as e:
+        return jsonify({'error': str(e)}), 429
+    return job_accepted(job)
+
+# ENDPOINT: Status and result of an analysis job
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Report the status of an analysis job, including the result once it is done
+    
+    Returns:
+        JSON: Job status (queued, running, done or failed) and result when done
+        JSON error object with status code 404 for an unknown job
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+# ENDPOINT: Job queue counters
+@app.route('/api/jobs', methods=['GET'])
+def job_queue_stats():
+    """
+    Report queue length, running jobs, reserved memory and admission counters
+    
+    Returns:
+        JSON: Job queue statistics
+    """
+    return jsonify(job_manager.stats())
 
 # ENDPOINT: API to list available files
 @app.route('/list_files', methods=['GET'])
 def list_files():
     """
-    API endpoint to list all available JSON files for analysis
+    API endpoint to list, search and page through the catalogued match files
+    
+    Query Parameters:
+        team (str, optional): Matches played by this team (exact name, any case)
+        player (str, optional): Matches this player appeared in (exact name, any case)
+        date_from, date_to (str, optional): Inclusive YYYY-MM-DD bounds of the match date
+        season (str, optional): Season label
+        sort (str, optional): date (default), filename, home_team, away_team, events, goals, xg or indexed
+        order (str, optional): desc (default) or asc
+        page (int, optional): Page number, from 1
+        per_page (int, optional): Matches per page (default CATALOG_PAGE_SIZE, at most 500)
+    
+    Returns:
+        JSON: Filenames and catalog entries of the page, with total, page, per_page and pages
+        JSON error object with status 400 for invalid parameters
+    """
+    try:
+        query = catalog_query(request.args, app.config['CATALOG_PAGE_SIZE'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    result = match_catalog.search(**query)
+    return jsonify(dict(result, files=[match['filename'] for match in result['matches']]))
+
+# ENDPOINT: Season totals per team
+@app.route('/api/season/teams', methods=['GET'])
+def season_teams():
+    """
+    Season totals per team, read from the aggregate index
+    
+    Query Parameters:
+        season (str, optional): Season label (all indexed matches if omitted)
+    
+    Returns:
+        JSON: Array of per-team totals
+    """
+    return jsonify(season_index.team_totals(request.args.get('season')))
+
+# ENDPOINT: Season totals per player
+@app.route('/api/season/players', methods=['GET'])
+def season_players():
+    """
+    Season totals per player, read from the aggregate index
+    
+    Query Parameters:
+        season (str, optional): Season label (all indexed matches if omitted)
+        team (str, optional): Only players of this team
+    
+    Returns:
+        JSON: Array of per-player totals
+    """
+    return jsonify(season_index.player_totals(request.args.get('season'), request.args.get('team')))
+
+# ENDPOINT: Season leaderboard
+@app.route('/api/season/leaderboard', methods=['GET'])
+def season_leaderboard():
+    """
+    Top players or teams by a statistic, read from the aggregate index
+    
+    Query Parameters:
+        stat (str): passes, completed_passes, shots, goals or xg
+        level (str, optional): 'player' (default) or 'team'
+        season (str, optional): Season label (all indexed matches if omitted)
+        limit (int, optional): Number of rows (default 10)
+    
+    Returns:
+        JSON: Ranked array of totals
+        JSON error object with status code 400 for an invalid stat or level
+    """
+    try:
+        rows = season_index.leaderboard(request.args.get('stat', 'goals'),
+                                        season=request.args.get('season'),
+                                        level=request.args.get('level', 'player'),
+                                        limit=request.args.get('limit', 10, type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(rows)
+
+# ENDPOINT: Prometheus metrics
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Export analysis stage metrics, cache counters and job queue gauges in the Prometheus text format
+    
+    Stage metrics (per stage and engine) are a duration histogram and counters of
+    processed events and errors; they are only recorded when METRICS_ENABLED is on.
+    
+    Returns:
+        text/plain: Prometheus exposition format, version 0.0.4
+    """
+    lines = metrics.render()
+    
+    caches = {'match': match_cache.stats(), 'result': result_cache.stats()['match'], 'figure': figure_cache.stats()}
+    for field, kind, suffix in (('hits', 'counter', '_total'), ('misses', 'counter', '_total'),
+                                ('evictions', 'counter', '_total'), ('entries', 'gauge', ''), ('bytes', 'gauge', '')):
+        samples = {(('cache', cache),): stats[field] for cache, stats in caches.items() if field in stats}
+        lines += format_metric(f'{METRIC_PREFIX}_cache_{field}{suffix}', kind, f'Cache {field}', samples)
+    
+    for field, value in job_manager.stats().items():
+        kind, suffix = ('counter', '_total') if field in ('rejected', 'collapsed') else ('gauge', '')
+        lines += format_metric(f'{METRIC_PREFIX}_jobs_{field}{suffix}', kind, f'Analysis job queue: {field}',
+                               {(): value})
+    
+    return app.response_class('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ENDPOINT: API to inspect the parsed-match cache
+@app.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    """
+    API endpoint exposing hit/miss counters and memory usage of the server caches
+    
+    Returns:
+        JSON: Parsed-match, result and figure cache counters
+    """
+    return jsonify({'matches': match_cache.stats(), 'results': result_cache.stats(),
+                    'figures': figure_cache.stats()})
+
+# ENDPOINT: API to inspect the analysis backends and their cost model
+@app.route('/api/backends', methods=['GET'])
+def backends_info():
+    """
+    API endpoint listing the analysis backends and how the server chooses between them
     
     Returns:
-        JSON: Array of filenames available in the uploads folder
+        JSON: Default backend, available backends, cost model coefficients and the
+        backend chosen for each range of file sizes
     """
-    # Get list of JSON files from uploads folder
-    files = [f for f in os.listdir(app.config['UPLOAD_FOLDER']) if f.endswith('.json')]
-    return jsonify(files)
+    return jsonify({
+        'default': analyzer.backend,
+        'available': [name for name, backend in analyzer.backends.items() if backend.available()],
+        'cost_model': analyzer.cost_model.describe()
+    })
 
 # Application entry point
 if __name__ == '__main__':
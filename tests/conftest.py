@@ -0,0 +1,48 @@
+"""Shared fixtures: the repository modules on sys.path and synthetic StatsBomb matches."""
+
+import gzip
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+
+from synthetic_match import write_match  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def match_dir(tmp_path_factory):
+    """A directory with two synthetic matches of different sizes and seeds."""
+    directory = tmp_path_factory.mktemp('matches')
+    write_match(str(directory / 'small.json'), 1500, seed=1)
+    write_match(str(directory / 'typical.json'), 3500, seed=0)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def match_files(match_dir):
+    return sorted(str(path) for path in match_dir.glob('*.json'))
+
+
+@pytest.fixture(scope='session')
+def gzip_match(match_dir, tmp_path_factory):
+    """The typical synthetic match stored as .json.gz."""
+    path = tmp_path_factory.mktemp('gzip') / 'typical.json.gz'
+    with open(match_dir / 'typical.json', 'rb') as source, gzip.open(path, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def columns_match(match_dir, tmp_path_factory):
+    """The typical synthetic match with a binary columnar copy next to it."""
+    from event_table import EventTable
+
+    path = tmp_path_factory.mktemp('columns') / 'typical.json'
+    shutil.copy(match_dir / 'typical.json', path)
+    EventTable.from_file(str(path)).save_columns(str(path))
+    return str(path)
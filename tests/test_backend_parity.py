@@ -0,0 +1,74 @@
+"""Every backend gives the same statistics, shots, heatmap grids and timeline as the Python reference."""
+
+import pytest
+
+from backends import CostModel, SparkBackend, compare_results, create_backends
+from football_analysis import FootballMatchAnalyzer
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    analyzer = FootballMatchAnalyzer()
+    yield analyzer
+    analyzer.close()
+
+
+def assert_parity(analyzer, file_path, backend):
+    expected = analyzer.parity_result(file_path, 'python')
+    actual = analyzer.parity_result(file_path, backend)
+    assert compare_results(expected, actual) == []
+
+
+def test_numpy_matches_python(analyzer, match_files):
+    for file_path in match_files:
+        assert_parity(analyzer, file_path, 'numpy')
+
+
+def test_numpy_columns_match_python(analyzer, columns_match):
+    # The numpy backend memory-maps the columnar copy instead of parsing the JSON
+    assert_parity(analyzer, columns_match, 'numpy')
+
+
+def test_compressed_match_parity(analyzer, gzip_match, match_dir):
+    assert_parity(analyzer, gzip_match, 'numpy')
+    assert compare_results(analyzer.parity_result(str(match_dir / 'typical.json'), 'python'),
+                           analyzer.parity_result(gzip_match, 'python')) == []
+
+
+def test_spark_matches_python(analyzer, match_files):
+    pytest.importorskip('pyspark')
+    for file_path in match_files:
+        assert_parity(analyzer, file_path, 'spark')
+
+
+def test_zstd_match_parity(analyzer, match_dir, tmp_path):
+    pytest.importorskip('zstandard')
+    from match_storage import compressing_writer
+
+    path = str(tmp_path / 'typical.json.zst')
+    with open(match_dir / 'typical.json', 'rb') as source, open(path, 'wb') as raw:
+        with compressing_writer(raw, 'zstd') as target:
+            target.write(source.read())
+    assert_parity(analyzer, path, 'numpy')
+
+
+@pytest.mark.parametrize('codec', [False, True])
+def test_large_zstd_match_goes_to_spark_only_with_codec(monkeypatch, tmp_path, codec):
+    # 15MB of JSON is past the default crossover (about 10MB) at which Spark becomes the cheapest backend
+    monkeypatch.setattr(SparkBackend, 'available', lambda self: True)
+    monkeypatch.setattr(SparkBackend, 'zstd_codec', lambda self: codec)
+    monkeypatch.setattr('backends.data_size', lambda path: 15 * 1000 * 1000)
+    backends = create_backends()
+    model = CostModel()
+
+    zstd_path = tmp_path / 'large.json.zst'
+    gzip_path = tmp_path / 'large.json.gz'
+    for path in (zstd_path, gzip_path):
+        path.write_bytes(b'\0' * 1024)
+    assert model.choose(str(zstd_path), backends.values()).name == ('spark' if codec else 'numpy')
+    assert model.choose(str(gzip_path), backends.values()).name == 'spark'
+
+
+def test_compare_results_reports_differences():
+    assert compare_results({'a': [1, 2]}, {'a': [1, 3]}) == ['/a[1]: 2 != 3']
+    assert compare_results({'a': 1}, {}) == ['/a: only in expected']
@@ -0,0 +1,77 @@
+"""Concurrent analyses on one shared analyzer and its caches give the same results as serial runs."""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+from figure_cache import FigureCache
+from football_analysis import FootballMatchAnalyzer
+from match_cache import MatchCache, ResultCache
+
+THREADS = 8
+REQUESTS = 32
+
+
+def canonical(result) -> str:
+    """Serialize a result so two analyses can be compared exactly."""
+    return json.dumps(result, sort_keys=True, default=str)
+
+
+def build_requests(analyzer, match_files):
+    """Every match with no player and with a home and an away player, and its serial result."""
+    variants = []
+    for path in match_files:
+        result = analyzer.analyze_match(path)
+        assert 'error' not in result
+        variants.append((path, None))
+        for side in ('home', 'away'):
+            variants.append((path, result[f'{side}_player_stats'][0]['player_name']))
+    return {request: canonical(analyzer.analyze_match(*request)) for request in variants}
+
+
+def run_concurrently(analyzer, expected):
+    variants = list(expected)
+    requests = [variants[i % len(variants)] for i in range(REQUESTS)]
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(lambda request: analyzer.analyze_match(*request), requests))
+    return [request for request, result in zip(requests, results) if canonical(result) != expected[request]]
+
+
+def test_concurrent_analyses_match_serial_results(match_files):
+    analyzer = FootballMatchAnalyzer()
+    try:
+        expected = build_requests(analyzer, match_files)
+        assert run_concurrently(analyzer, expected) == []
+    finally:
+        analyzer.close()
+
+
+def test_concurrent_analyses_with_shared_caches(match_files, tmp_path):
+    # Serial reference results come from an analyzer without caches
+    reference = FootballMatchAnalyzer()
+    try:
+        expected = build_requests(reference, match_files)
+    finally:
+        reference.close()
+
+    match_cache = MatchCache()
+    analyzer = FootballMatchAnalyzer(match_cache=match_cache, result_cache=ResultCache(),
+                                     figure_cache=FigureCache(str(tmp_path / 'figures')))
+    try:
+        # Cold caches: every request misses at once; then warm caches
+        assert run_concurrently(analyzer, expected) == []
+        assert run_concurrently(analyzer, expected) == []
+    finally:
+        analyzer.close()
+
+
+def test_shared_match_cache_loads_each_match_once(match_files):
+    match_cache = MatchCache()
+    analyzer = FootballMatchAnalyzer(match_cache=match_cache)
+    try:
+        paths = [match_files[i % len(match_files)] for i in range(REQUESTS)]
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            tables = list(pool.map(analyzer._load_events, paths))
+        assert all(table is not None for table in tables)
+        assert match_cache.stats()['misses'] == len(match_files)
+    finally:
+        analyzer.close()
@@ -0,0 +1,74 @@
+"""Live matches replayed in NDJSON batches end with the same totals as a full analysis of the file."""
+
+import json
+import queue
+
+import pytest
+
+from live_matches import LiveMatch, LiveMatchError, compare_with_analysis, parse_ndjson, replay_batches, sse_stream
+
+BATCH_SIZE = 250
+
+
+def ndjson_lines(batch):
+    return [json.dumps(event).encode('utf-8') + b'\n' for event in batch]
+
+
+def drain(subscriber):
+    messages = []
+    while True:
+        try:
+            messages.append(subscriber.get_nowait())
+        except queue.Empty:
+            return messages
+
+
+def test_replay_matches_full_analysis(match_files):
+    for file_path in match_files:
+        match = LiveMatch('replay')
+        subscriber = match.subscribe()
+        batches = 0
+        for batch in replay_batches(file_path, BATCH_SIZE):
+            delta = match.append(parse_ndjson(ndjson_lines(batch)))
+            batches += 1
+            assert delta['seq'] == batches and delta['batch'] == len(batch)
+
+        messages = drain(subscriber)
+        assert messages[0][0] == 'snapshot'
+        deltas = messages[1:]
+        assert [(event, seq) for event, seq, _ in deltas] == [('delta', seq) for seq in range(1, batches + 1)]
+        assert deltas[-1][2]['events'] == match.total_events
+        assert compare_with_analysis(match.snapshot(), file_path) == []
+
+
+def test_malformed_batch_leaves_state_unchanged(match_files):
+    batches = replay_batches(match_files[0], BATCH_SIZE)
+    match = LiveMatch('replay')
+    match.append(next(batches))
+    before = match.snapshot()
+    subscriber = match.subscribe()
+    drain(subscriber)
+
+    batch = [dict(event) for event in next(batches)]
+    batch[-1]['location'] = ['left', 'wing']
+    with pytest.raises(LiveMatchError):
+        match.append(batch)
+    with pytest.raises(LiveMatchError):
+        parse_ndjson(ndjson_lines(batch[:3]) + [b'{"type": '])
+
+    assert match.snapshot() == before
+    assert drain(subscriber) == []
+
+
+def test_sse_stream_sends_snapshot_deltas_and_end(match_files):
+    match = LiveMatch('replay')
+    stream = sse_stream(match, keepalive_seconds=0.01)
+    assert next(stream).startswith('id: 0\nevent: snapshot\n')
+
+    match.append(next(replay_batches(match_files[0], BATCH_SIZE)))
+    assert next(stream).startswith('id: 1\nevent: delta\n')
+    match.close()
+    assert next(stream).startswith('id: 1\nevent: end\n')
+    with pytest.raises(StopIteration):
+        next(stream)
+    assert match.subscriber_count == 0
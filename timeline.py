@@ -0,0 +1,139 @@
+"""
+Match Timeline
+--------------
+Per-minute team statistics of a match, and window series derived from them.
+
+``MinuteTimeline.from_columns`` bins a match's events by (period, minute)
+and team with one ``np.bincount`` per measure: possession (events in
+possession), passes, completed passes, shots and xG. The per-minute totals
+are then summed cumulatively once, and the totals of any window are the
+difference of two cumulative sums, so a new window size costs a few array
+lookups and never touches the events again.
+
+Minutes follow the StatsBomb match clock, which keeps running across periods
+(the second half starts at minute 45). Buckets are kept per period, so
+first-half stoppage time does not merge with the start of the second half,
+and windows restart at the start of each period.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Per-minute totals kept for every team; all but xG count events
+MEASURES = ('possession', 'passes', 'completed', 'shots', 'xg')
+
+
+class MinuteTimeline:
+    """Per-team, per-minute totals of one match with their cumulative sums."""
+
+    def __init__(self, team_names: List[str], periods: np.ndarray, start_minutes: np.ndarray,
+                 lengths: np.ndarray, totals: Dict[str, np.ndarray]):
+        self.team_names = list(team_names)
+        self.periods = periods  # period numbers in match order
+        self.start_minutes = start_minutes  # first minute of each period
+        self.lengths = lengths  # minutes (buckets) in each period
+        self.offsets = (np.cumsum(lengths) - lengths).astype(np.int64)
+        self.totals = totals  # measure -> (teams, buckets) array
+        self._team_index = {name: code for code, name in enumerate(self.team_names)}
+        # A leading zero column makes the sum over buckets [a, b) cumulative[:, b] - cumulative[:, a]
+        self._cumulative = {
+            measure: np.concatenate([np.zeros((len(self.team_names), 1), dtype=values.dtype),
+                                     np.cumsum(values, axis=1)], axis=1)
+            for measure, values in totals.items()
+        }
+
+    @classmethod
+    def from_columns(cls, team_names: List[str], period: np.ndarray, minute: np.ndarray,
+                     team: np.ndarray, possession_team: np.ndarray, passes: np.ndarray,
+                     completed: np.ndarray, shots: np.ndarray, xg: np.ndarray,
+                     events: Optional[np.ndarray] = None) -> 'MinuteTimeline':
+        """
+        Bin per-row columns into per-minute team totals.
+
+        Rows are single events or groups of events with the same clock and
+        teams: ``team`` and ``possession_team`` are codes into team_names
+        (negative for none), the measures are the row's totals, and ``events``
+        is the number of events the row stands for (1 each by default).
+        """
+        period = np.asarray(period, dtype=np.int64)
+        minute = np.asarray(minute, dtype=np.int64)
+        valid = (period >= 1) & (minute >= 0)
+        period, minute = period[valid], minute[valid]
+
+        periods = np.unique(period)
+        period_index = np.searchsorted(periods, period)
+        start_minutes = np.full(len(periods), np.iinfo(np.int64).max, dtype=np.int64)
+        end_minutes = np.full(len(periods), -1, dtype=np.int64)
+        np.minimum.at(start_minutes, period_index, minute)
+        np.maximum.at(end_minutes, period_index, minute)
+        lengths = end_minutes - start_minutes + 1
+        offsets = np.cumsum(lengths) - lengths
+        bucket = offsets[period_index] + minute - start_minutes[period_index]
+
+        n_teams, n_buckets = len(team_names), int(lengths.sum())
+
+        def per_team(codes, weights, dtype):
+            codes = np.asarray(codes, dtype=np.int64)[valid]
+            weights = np.asarray(weights, dtype=np.float64)[valid]
+            has_team = codes >= 0
+            binned = np.bincount(codes[has_team] * n_buckets + bucket[has_team], weights=weights[has_team],
+                                 minlength=n_teams * n_buckets).reshape(n_teams, n_buckets)
+            return np.rint(binned).astype(dtype) if dtype is np.int64 else binned
+
+        if events is None:
+            events = np.ones(len(valid))
+        totals = {
+            'possession': per_team(possession_team, events, np.int64),
+            'passes': per_team(team, passes, np.int64),
+            'completed': per_team(team, completed, np.int64),
+            'shots': per_team(team, shots, np.int64),
+            'xg': per_team(team, xg, np.float64)
+        }
+        return cls(team_names, periods, start_minutes, lengths, totals)
+
+    @property
+    def n_buckets(self) -> int:
+        return int(self.lengths.sum())
+
+    def team_totals(self, team_name: str) -> Dict[str, np.ndarray]:
+        """Per-minute totals of a team (zeros for a team without events)."""
+        code = self._team_index.get(team_name)
+        if code is None:
+            return {measure: np.zeros(self.n_buckets, dtype=values.dtype) for measure, values in self.totals.items()}
+        return {measure: values[code] for measure, values in self.totals.items()}
+
+    def windows(self, window: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Period, first minute, and first and past-the-end bucket of every window of `window` minutes."""
+        if window < 1:
+            raise ValueError("Window must be at least one minute")
+        per_period = -(-self.lengths // window)
+        period_of = np.repeat(np.arange(len(self.periods)), per_period)
+        # Position of each window within its period
+        k = np.arange(int(per_period.sum())) - np.repeat(np.cumsum(per_period) - per_period, per_period)
+        starts = self.offsets[period_of] + k * window
+        ends = np.minimum(starts + window, (self.offsets + self.lengths)[period_of])
+        return self.periods[period_of], self.start_minutes[period_of] + k * window, starts, ends
+
+    def series(self, team_name: str, window: int = 1) -> Dict[str, np.ndarray]:
+        """A team's totals per window, plus its cumulative xG at the end of each window."""
+        _, _, starts, ends = self.windows(window)
+        code = self._team_index.get(team_name)
+        result = {}
+        for measure, cumulative in self._cumulative.items():
+            if code is None:
+                result[measure] = np.zeros(len(starts), dtype=cumulative.dtype)
+            else:
+                result[measure] = cumulative[code, ends] - cumulative[code, starts]
+        result['cumulative_xg'] = (self._cumulative['xg'][code, ends] if code is not None
+                                   else np.zeros(len(starts)))
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Clock layout and every team's per-minute totals, e.g. to compare backends."""
+        return {
+            'periods': self.periods,
+            'start_minutes': self.start_minutes,
+            'lengths': self.lengths,
+            'teams': {team_name: self.team_totals(team_name) for team_name in self.team_names
+                      if any(values.any() for values in self.team_totals(team_name).values())}
+        }